@@ -0,0 +1,174 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from columnar_export import METRIC_COLUMNS, to_typed_frame
+from region_hierarchy import load_hierarchy
+
+
+# 可以直接求和的总量列
+SUM_COLUMNS = [
+    'Population',
+    'E-waste Generated (kt)', 'EEE Put on Market (kt)', 'E-waste Formally Collected (kt)',
+    'E-waste Imported (kt)', 'E-waste Exported (kt)',
+]
+# 人均列：按人口加权平均
+PER_CAPITA_COLUMNS = ['E-waste Generated (kg/capita)', 'EEE Put on Market (kg/capita)']
+RATE_COLUMN = 'E-waste Collection Rate (%)'
+AGGREGATE_LEVELS = ('Region', 'Continent')
+
+
+def aggregate_countries(country_records, hierarchy=None):
+    """由国家记录计算区域 / 大洲的汇总记录
+
+    - 总量 (kt) 与人口：组内求和 (全部缺失时为 None)；
+    - 人均 (kg/capita)：以人口为权重的加权平均 (只计有人均值的国家)；
+    - 回收率：正规回收量之和 / 产生量之和 (只计两者都有值的国家)。
+    返回 (汇总记录列表, 对照表中找不到的国家名称列表)。
+    """
+    hierarchy = load_hierarchy() if hierarchy is None else hierarchy
+    if not country_records:
+        return [], []
+    df = to_typed_frame(country_records)[['Name', 'Year'] + METRIC_COLUMNS]
+    df['Name'] = df['Name'].astype(str)
+    unmatched = sorted(set(df['Name']) - set(hierarchy['Name']))
+    df = df.merge(hierarchy, on='Name', how='inner')
+
+    # 预先算好加权所需的列，之后每个层级只需要一次 groupby().sum()
+    pop = df['Population']
+    for col in PER_CAPITA_COLUMNS:
+        df[col + ' *pop'] = df[col] * pop
+        df[col + ' pop'] = pop.where(df[col].notna())
+    both = df['E-waste Formally Collected (kt)'].notna() & df['E-waste Generated (kt)'].notna()
+    df['rate collected'] = df['E-waste Formally Collected (kt)'].where(both)
+    df['rate generated'] = df['E-waste Generated (kt)'].where(both)
+    value_columns = SUM_COLUMNS + [c + s for c in PER_CAPITA_COLUMNS for s in (' *pop', ' pop')] + \
+        ['rate collected', 'rate generated']
+
+    records = []
+    for level in AGGREGATE_LEVELS:
+        grouped = df.groupby([level, 'Year'], observed=True, sort=False)
+        sums = grouped[value_columns].sum(min_count=1)
+        sums['countries'] = grouped.size()
+        for col in PER_CAPITA_COLUMNS:
+            sums[col] = sums[col + ' *pop'] / sums[col + ' pop']
+        sums[RATE_COLUMN] = sums['rate collected'] / sums['rate generated'].replace(0, np.nan) * 100
+        sums = sums.round(2)
+        for (name, year), row in sums.iterrows():
+            record = {'Category': level, 'Name': name, 'Year': str(year)}
+            for col in METRIC_COLUMNS:
+                value = row[col]
+                record[col] = None if pd.isna(value) else float(value)
+            record['Source URL'] = f"derived:{int(row['countries'])} countries"
+            records.append(record)
+    return records, unmatched
+
+
+def compare_with_site(computed, crawled):
+    """逐指标比较计算值与站点自身的汇总值，返回明细 DataFrame (含相对误差)"""
+    if not computed or not crawled:
+        return pd.DataFrame(columns=['Category', 'Name', 'Year', 'Metric', 'Computed', 'Site', 'Relative Error'])
+    keys = ['Category', 'Name', 'Year']
+    ours = to_typed_frame(computed)[keys + METRIC_COLUMNS].astype({'Category': str, 'Name': str})
+    site = to_typed_frame(crawled)[keys + METRIC_COLUMNS].astype({'Category': str, 'Name': str})
+    merged = ours.merge(site, on=keys, suffixes=(' computed', ' site'))
+    frames = []
+    for col in METRIC_COLUMNS:
+        part = merged[keys].copy()
+        part['Metric'] = col
+        part['Computed'] = merged[col + ' computed']
+        part['Site'] = merged[col + ' site']
+        frames.append(part)
+    detail = pd.concat(frames, ignore_index=True).dropna(subset=['Computed', 'Site'])
+    detail['Relative Error'] = (detail['Computed'] - detail['Site']).abs() / detail['Site'].abs().replace(0, np.nan)
+    return detail.reset_index(drop=True)
+
+
+def divergence_summary(detail):
+    """按指标汇总相对误差：样本数、中位数、p90、最大值、误差在 1% 以内的比例"""
+    summary = {}
+    for metric, group in detail.groupby('Metric', sort=False):
+        err = group['Relative Error'].dropna()
+        if err.empty:
+            continue
+        summary[metric] = {
+            'pairs': int(len(err)),
+            'median_rel_error': round(float(err.median()), 6),
+            'p90_rel_error': round(float(err.quantile(0.9)), 6),
+            'max_rel_error': round(float(err.max()), 6),
+            'within_1pct': round(float((err <= 0.01).mean()), 4),
+        }
+    return summary
+
+
+def collect_with_aggregates(collector, base_url, method='sequential', validation_fraction=0.2, seed=0,
+                            hierarchy=None, sink=None, keep_records=True, **crawl_kwargs):
+    """汇总模式：完整抓取国家页面，区域 / 大洲由国家记录在本地计算
+
+    区域 / 大洲页面只抓取随机抽取的 validation_fraction 比例作为验证集 (以及对照表中无法推导的项目)；
+    被抓取的项目输出站点自身的记录，其余输出计算得到的记录 (Source URL 为 "derived:<N> countries")。
+    汇总记录在国家抓取结束后才交给 sink；为了计算汇总，国家记录始终保留在内存中。
+    返回 (记录列表, 验证报告 dict)。
+    """
+    hierarchy = load_hierarchy() if hierarchy is None else hierarchy
+    soup = collector._get_page_data(base_url)
+    if not soup:
+        print("错误：无法获取基础页面，收集终止。")
+        return [], {}
+    names = {'Continent': [], 'Region': [], 'Country': []}
+    for category, name, _ in collector._iter_entities(soup):
+        names[category].append(name)
+
+    derivable = {'Region': set(hierarchy['Region']), 'Continent': set(hierarchy['Continent'])}
+    rng = random.Random(seed)
+    targets = {'Country': names['Country']}
+    sampled = {}
+    for level in ('Continent', 'Region'):
+        candidates = [n for n in names[level] if n in derivable[level]]
+        k = min(len(candidates), max(1, round(len(candidates) * validation_fraction))) if candidates else 0
+        chosen = set(rng.sample(candidates, k))
+        sampled[level] = [n for n in names[level] if n in chosen]
+        # 无法推导的项目照常抓取
+        targets[level] = [n for n in names[level] if n in chosen or n not in derivable[level]]
+    skipped = sum(len(names[level]) - len(targets[level]) for level in AGGREGATE_LEVELS)
+    print(f"汇总模式：抓取 {len(names['Country'])} 个国家，验证集 {sampled}，跳过 {skipped} 个区域/大洲页面。")
+
+    country_rows, site_rows = [], []
+
+    def capture(record):
+        (country_rows if record['Category'] == 'Country' else site_rows).append(record)
+        if sink is not None:
+            sink(record)
+
+    crawl = {
+        'sequential': collector.collect_data,
+        'async': collector.collect_data_async,
+        'pipeline': collector.collect_data_pipeline,
+    }[method]
+    all_data = crawl(base_url, sink=capture, keep_records=keep_records, targets=targets, **crawl_kwargs)
+
+    computed, unmatched = aggregate_countries(country_rows, hierarchy)
+    crawled_entities = {(level, n) for level in AGGREGATE_LEVELS for n in targets[level]}
+    derived = [r for r in computed
+               if (r['Category'], r['Name']) not in crawled_entities and r['Name'] in names[r['Category']]]
+    for record in derived:
+        if sink is not None:
+            sink(record)
+    if keep_records:
+        all_data.extend(derived)
+
+    detail = compare_with_site(computed, site_rows)
+    report = {
+        'countries': len(names['Country']),
+        'aggregate_pages_skipped': skipped,
+        'validation_entities': sampled,
+        'derived_records': len(derived),
+        'unmatched_countries': unmatched,
+        'divergence': divergence_summary(detail),
+    }
+    print(f"本地计算了 {len(derived)} 条区域/大洲记录；{len(unmatched)} 个国家不在对照表中。")
+    for metric, stats in report['divergence'].items():
+        print(f"  {metric}: 中位相对误差 {stats['median_rel_error']:.2%}，最大 {stats['max_rel_error']:.2%}，"
+              f"1% 以内 {stats['within_1pct']:.0%} ({stats['pairs']} 对)")
+    return all_data, report
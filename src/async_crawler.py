@@ -0,0 +1,307 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup
+
+from fast_extract import parse_year_html
+from record_table import RecordTable
+
+try:
+    import aiohttp
+except ImportError: # aiohttp 为可选依赖，只有异步模式需要
+    aiohttp = None
+
+
+RETRY_STATUS = (500, 502, 504) # 与同步会话的 status_forcelist 保持一致，429/503 由限速器处理
+
+
+class _HostGate:
+    """单个主机的礼貌性控制：限制同时在途请求数，并保证相邻请求之间的最小间隔"""
+    def __init__(self, max_in_flight, min_interval):
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._last_start = 0.0
+
+    async def wait_turn(self):
+        """等待到允许向该主机发出下一个请求的时刻"""
+        if self.min_interval <= 0:
+            return
+        async with self._lock:
+            delay = self._last_start + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_start = time.monotonic()
+
+
+class AsyncCrawler:
+    """基于 asyncio + aiohttp 的并发抓取引擎
+
+    复用 EwasteDataCollector 的链接解析与页面提取逻辑，因此产出的记录
+    (内容与顺序) 与顺序抓取的 collect_data 完全一致，只是把等待时间重叠起来。
+    请求节奏由 collector.rate_limiter 统一控制，与同步模式共享同一套限速状态。
+    """
+    def __init__(self, collector, concurrency=16, per_host=4, host_delay=0.0,
+                 timeout=20, max_retries=5, backoff_factor=1):
+        if aiohttp is None:
+            raise ImportError("异步抓取模式需要安装 aiohttp: pip install aiohttp")
+        self.collector = collector
+        self.concurrency = concurrency # 全局同时在途的请求上限
+        self.per_host = per_host       # 单个主机同时在途的请求上限
+        self.host_delay = host_delay   # 同一主机相邻请求的最小间隔 (秒)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._host_gates = {}
+        self._reset_output()
+        self._total = 0
+
+    def _reset_output(self, sink=None, keep_records=True):
+        self._sink = sink
+        self._keep_records = keep_records
+        self._pending = {}   # 已完成但前面还有未完成项目的结果，等待按顺序输出
+        self._next_index = 0 # 下一个应输出的项目序号
+        self._emitted = RecordTable() # 已按顺序输出 (且需要保留) 的记录
+        self._done = 0
+        self.record_count = 0
+
+    def _finish_entity(self, index, records):
+        """登记一个项目的结果，并按 collect_data 的顺序把可以输出的记录交给 sink"""
+        self._pending[index] = records
+        self._done += 1
+        while self._next_index in self._pending:
+            ready = self._pending.pop(self._next_index)
+            self._next_index += 1
+            self.record_count += len(ready)
+            if self.collector.telemetry is not None:
+                self.collector.telemetry.add_records(len(ready))
+            if self._sink is not None:
+                for record in ready:
+                    self._sink(record)
+            if self._keep_records:
+                self._emitted.extend(ready)
+
+    def _gate_for(self, url):
+        host = urlsplit(url).netloc
+        gate = self._host_gates.get(host)
+        if gate is None:
+            gate = _HostGate(self.per_host, self.host_delay)
+            self._host_gates[host] = gate
+        return gate
+
+    async def _fetch_text(self, session, url, kind='page'):
+        """获取页面文本 (逻辑同 collector._fetch_html)；429/503 交给共享限速器降速后重试，其余 5xx 按指数退避重试"""
+        if self.collector.replay is not None:
+            return self.collector.replay.get_text(url)
+        cache = self.collector.cache
+        if cache is not None and cache.cache_only:
+            return cache.lookup_offline(url)
+        entry = cache.get(url) if cache is not None else None
+        headers = dict(self.collector.headers, **cache.conditional_headers(entry)) if entry else self.collector.headers
+
+        gate = self._gate_for(url)
+        limiter = self.collector.rate_limiter
+        telemetry = self.collector.telemetry
+        for attempt in range(self.max_retries + 1):
+            delay = 0
+            try:
+                async with self._semaphore, gate.semaphore:
+                    await gate.wait_turn()
+                    await limiter.acquire_async()
+                    start = time.monotonic()
+                    try:
+                        async with session.get(url, headers=headers) as response:
+                            body = await response.read()
+                            encoding = response.get_encoding()
+                            text = body.decode(encoding, errors='replace')
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        latency = time.monotonic() - start
+                        limiter.record(None, latency)
+                        if telemetry is not None:
+                            telemetry.observe_request(kind, None, latency)
+                        raise
+                    latency = time.monotonic() - start
+                    throttled = limiter.record(response.status, latency, response.headers.get('Retry-After'))
+                    if telemetry is not None:
+                        telemetry.observe_request(kind, response.status, latency, len(body))
+                    if attempt < self.max_retries and (throttled or response.status in RETRY_STATUS):
+                        if telemetry is not None:
+                            telemetry.observe_retry('throttled' if throttled else 'server_error')
+                        if not throttled: # 限流的等待由限速器负责
+                            delay = self.backoff_factor * (2 ** attempt)
+                    elif response.status == 304 and entry is not None:
+                        text = cache.revalidated_text(entry)
+                        self.collector._archive_response(url, 200, response.headers, text.encode('utf-8'), 'utf-8')
+                        return text
+                    else:
+                        self.collector._archive_response(url, response.status, response.headers, body, encoding)
+                        response.raise_for_status()
+                        if cache is not None:
+                            cache.store(url, response.headers, text)
+                        return text
+            except aiohttp.ClientResponseError as e: # 404/403 等不可重试的错误
+                print(f"  错误：获取页面数据失败 {url}, 错误: {e}")
+                return None
+            except asyncio.TimeoutError:
+                if attempt >= self.max_retries:
+                    print(f"  错误：请求超时 {url}")
+                    return None
+                delay = self.backoff_factor * (2 ** attempt)
+                if telemetry is not None:
+                    telemetry.observe_retry('network')
+            except aiohttp.ClientError as e:
+                if attempt >= self.max_retries:
+                    print(f"  错误：获取页面数据失败 {url}, 错误: {e}")
+                    return None
+                delay = self.backoff_factor * (2 ** attempt)
+                if telemetry is not None:
+                    telemetry.observe_retry('network')
+
+            if delay:
+                await asyncio.sleep(delay)
+        return None
+
+    async def _get_soup(self, session, url):
+        text = await self._fetch_text(session, url)
+        if text is None:
+            return None
+        try:
+            start = time.perf_counter()
+            soup = BeautifulSoup(text, 'html.parser')
+            if self.collector.telemetry is not None:
+                self.collector.telemetry.observe_parse('page', time.perf_counter() - start)
+            return soup
+        except Exception as e:
+            print(f"  错误：解析页面时发生未知错误 {url}: {e}")
+            return None
+
+    async def _crawl_year(self, session, url, category, name, year):
+        journal = self.collector.journal
+        if journal is not None:
+            done, record = journal.get_unit(category, name, year)
+            if done:
+                return record
+        text = await self._fetch_text(session, url, kind='year')
+        if text is None:
+            return None
+        telemetry = self.collector.telemetry
+        digest, unchanged, record = self.collector._unchanged_year_record(text, url, category, name, year)
+        if not unchanged: # 正文与上次相同时直接使用上次的记录，跳过解析
+            try:
+                start = time.perf_counter()
+                soup = parse_year_html(text, self.collector.extract_backend)
+                parsed = time.perf_counter()
+                record = self.collector._parse_year_page(soup, url, category, name, year)
+                if telemetry is not None:
+                    telemetry.observe_parse('year', parsed - start)
+                    telemetry.observe_parse('extract', time.perf_counter() - parsed)
+            except Exception as e:
+                print(f"    错误：处理 {category}-{name} 年份 {year} ({url}) 时出错: {e}")
+                return None
+            if digest is not None:
+                self.collector.changes.remember_page(url, digest, record)
+        if journal is not None:
+            journal.record_unit(category, name, year, url, record)
+        return record
+
+    async def _crawl_listed_year(self, session, soup, planned, reuse_year, url, category, name, year):
+        """详情页列出的年份：优先用按模板已获取的结果，其次复用详情页的解析结果，最后才请求年份页面"""
+        planned_url, planned_record = planned.get(year, (None, None))
+        if planned_record and planned_url == url:
+            return planned_record
+        if year == reuse_year:
+            record = self.collector._reuse_detail_record(soup, url, category, name, year)
+            if record is not None:
+                return record
+        return await self._crawl_year(session, url, category, name, year)
+
+    async def _crawl_entity(self, session, index, category, name, detail_url, target_years):
+        """抓取一个项目的详情页及其全部 (或指定) 年份页面"""
+        resumed = self.collector._resume_entity(category, name, target_years)
+        if resumed is not None:
+            self._finish_entity(index, resumed)
+            return
+        started = time.monotonic()
+        planner = self.collector.planner
+        # 规划器已学到年份 URL 模板时，直接请求目标年份页面，跳过详情页
+        direct_links = planner.direct_links(detail_url, target_years) if planner is not None else None
+        planned = {}
+        if direct_links:
+            records = await asyncio.gather(*[
+                self._crawl_year(session, year_url, category, name, year)
+                for year, year_url in direct_links
+            ])
+            if all(records):
+                if self.collector.telemetry is not None:
+                    self.collector.telemetry.observe_entity(time.monotonic() - started)
+                self._finish_entity(index, list(records))
+                print(f"  ({self._done}/{self._total}) 完成 {category}-{name}，获取到 {len(records)} 条记录")
+                return
+            planned = {year: (url, record) for (year, url), record in zip(direct_links, records)}
+            planner.record_fallback() # 模板未命中：回退到详情页流程
+
+        soup = await self._get_soup(session, detail_url)
+        if not soup:
+            self._finish_entity(index, [])
+            return
+        try:
+            year_links = self.collector._get_year_links(soup, category, name, target_years)
+            reuse_year = planner.reusable_year(detail_url, year_links, soup) if planner is not None else None
+            records = await asyncio.gather(*[
+                self._crawl_listed_year(session, soup, planned, reuse_year, year_url, category, name, year)
+                for year, year_url in year_links
+            ])
+            self.collector._checkpoint_entity(category, name, year_links, target_years)
+            self.collector._learn_year_urls(soup, detail_url, category, name, year_links,
+                                            {year: r for (year, _), r in zip(year_links, records) if r})
+        except Exception as e:
+            print(f"  严重错误：处理 {category}-{name} ({detail_url}) 数据时发生意外错误: {e}")
+            records = []
+        # gather 保持输入顺序，因此年份顺序与页面上的链接顺序一致
+        records = [r for r in records if r]
+        if self.collector.telemetry is not None:
+            self.collector.telemetry.observe_entity(time.monotonic() - started)
+        self._finish_entity(index, records)
+        print(f"  ({self._done}/{self._total}) 完成 {category}-{name}，获取到 {len(records)} 条记录")
+
+    async def crawl(self, base_url, targets=None, target_years=None):
+        """并发抓取全部项目 (或 targets 指定的项目)，返回与顺序抓取一致的记录列表"""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host,
+                                         keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            soup = await self._get_soup(session, base_url)
+            if not soup:
+                print("错误：无法获取基础页面，收集终止。")
+                return []
+            entities = list(self.collector._iter_entities(soup, targets))
+            self._total = len(entities)
+            print(f"总共需要处理约 {self._total} 个项目 (并发上限 {self.concurrency}，单主机上限 {self.per_host})。")
+            # URL 规划器仍在学习时，先抓取用于学习的前几个项目，其余项目才能用上学到的规律
+            planner = self.collector.planner
+            first = planner.learn_entities if planner is not None and planner.learning else 0
+            for start, stop in ((0, first), (first, len(entities))):
+                await asyncio.gather(*[
+                    self._crawl_entity(session, i, category, name, url, target_years)
+                    for i, (category, name, url) in enumerate(entities[start:stop], start=start)
+                ])
+        return self._flatten()
+
+    def _flatten(self):
+        """已按顺序输出的记录 + 中断时仍在等待前序项目的记录"""
+        all_data = self._emitted
+        if self._keep_records:
+            for index in sorted(self._pending):
+                all_data.extend(self._pending[index])
+        return all_data
+
+    def run(self, base_url, targets=None, target_years=None, sink=None, keep_records=True):
+        """同步入口；sink 按与 collect_data 相同的顺序收到记录。用户中断时返回已完成项目的记录"""
+        self._reset_output(sink, keep_records)
+        try:
+            return asyncio.run(self.crawl(base_url, targets, target_years))
+        except KeyboardInterrupt:
+            print("\n用户中断操作。")
+            return self._flatten()
@@ -0,0 +1,171 @@
+"""抓取吞吐量基准测试
+
+在本地替身站点 (stand_in_site.py) 上运行 collect_data / run_test_scrape 等抓取方式，
+报告 页/秒、客户端请求延迟 p50/p99、重试次数与总耗时。替身站点可以注入延迟、
+429 与 5xx 错误，用于在上线前发现抓取性能的退化。
+
+示例：
+  python benchmarks/bench_crawl.py --modes test,full --latency 0.02 --jitter 0.03
+  python benchmarks/bench_crawl.py --modes full,async --rate-429 0.02 --rate-5xx 0.02 --json bench.json
+  python benchmarks/bench_crawl.py --baseline bench.json --tolerance 0.2   # 吞吐量下降超过 20% 时返回非零
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import data_collector
+from crawl_telemetry import CrawlTelemetry
+from data_collector import EwasteDataCollector, run_test_scrape
+from rate_limiter import AdaptiveRateLimiter
+from stand_in_site import StandInSite
+
+
+MODES = ('test', 'full', 'async', 'pipeline')
+
+
+class RecordingRateLimiter(AdaptiveRateLimiter):
+    """在限速器的 record 回调中记录每次请求的客户端延迟与状态码"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        self.statuses = {}
+
+    def record(self, status, latency, retry_after=None):
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        return super().record(status, latency, retry_after)
+
+
+def percentile(values, pct):
+    """最近秩法求百分位数 (values 为空时返回 None)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_mode(mode, site, args):
+    """在替身站点上运行一种抓取方式，返回统计结果"""
+    limiter = RecordingRateLimiter(initial_rate=args.rate, max_rate=args.max_rate, burst=args.burst)
+    telemetry = CrawlTelemetry() # 只在内存中统计，用于读取客户端实际发起的重试次数
+    collector = EwasteDataCollector(rate_limiter=limiter, extract_backend=args.extract_backend, telemetry=telemetry)
+    site.reset_stats()
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        if mode == 'test':
+            records = run_test_scrape(collector, site.base_url)
+        elif mode == 'full':
+            records = collector.collect_data(site.base_url)
+        elif mode == 'async':
+            records = collector.collect_data_async(site.base_url, concurrency=args.concurrency,
+                                                   per_host=args.concurrency)
+        else:
+            records = collector.collect_data_pipeline(site.base_url, fetch_workers=args.concurrency)
+    elapsed = time.perf_counter() - start
+    server = site.stats()
+    pages = server['requests'] - server['injected_429'] - server['injected_5xx']
+    return {
+        'mode': mode,
+        'records': len(records),
+        'pages': pages,
+        'requests': server['requests'],
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 1) if elapsed > 0 else None,
+        'p50_ms': round(percentile(limiter.latencies, 50) * 1000, 1) if limiter.latencies else None,
+        'p99_ms': round(percentile(limiter.latencies, 99) * 1000, 1) if limiter.latencies else None,
+        'retries': sum(telemetry.retries.values()), # 客户端实际重试次数 (限流重试 + 会话层对 5xx / 网络错误的重试)
+        'retries_by_reason': dict(telemetry.retries),
+        'throttles': limiter.throttles,
+        'injected_429': server['injected_429'],
+        'injected_5xx': server['injected_5xx'],
+        'bytes': server['bytes_sent'],
+    }
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """与之前保存的结果比较，返回吞吐量下降超过 tolerance 的抓取方式列表"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {r['mode']: r for r in json.load(f)['results']}
+    regressions = []
+    for r in results:
+        old = baseline.get(r['mode'])
+        if not old or not old.get('pages_per_sec') or not r['pages_per_sec']:
+            continue
+        change = r['pages_per_sec'] / old['pages_per_sec'] - 1
+        flag = '  <-- 退化' if change < -tolerance else ''
+        print(f"  {r['mode']:<10}{old['pages_per_sec']:>10} -> {r['pages_per_sec']:<10}({change:+.1%}){flag}")
+        if change < -tolerance:
+            regressions.append(r['mode'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在本地替身站点上测试抓取吞吐量。")
+    parser.add_argument("--modes", default="test,full", help=f"要测试的抓取方式，逗号分隔 (可选: {', '.join(MODES)})。")
+    parser.add_argument("--extra-countries", type=int, default=0, help="额外生成的国家数量，用于扩大抓取规模。")
+    parser.add_argument("--latency", type=float, default=0.01, help="替身站点每个响应的基础延迟 (秒)。")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟的上限 (秒)。")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回 429 的概率。")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="返回 500/502/503/504 的概率。")
+    parser.add_argument("--retry-after", type=float, default=None, help="429 响应附带的 Retry-After 秒数。")
+    parser.add_argument("--seed", type=int, default=0, help="错误注入的随机种子。")
+    parser.add_argument("--rate", type=float, default=50.0, help="客户端限速器的初始速率 (请求/秒)。")
+    parser.add_argument("--max-rate", type=float, default=200.0, help="客户端限速器的速率上限 (请求/秒)。")
+    parser.add_argument("--burst", type=int, default=10, help="客户端限速器的突发额度。")
+    parser.add_argument("--concurrency", type=int, default=8, help="async / pipeline 模式的并发数。")
+    parser.add_argument("--extract-backend", default="full", help="年份页面的解析后端。")
+    parser.add_argument("--json", dest="json_path", help="把结果写入 JSON 文件 (可作为之后的 --baseline)。")
+    parser.add_argument("--baseline", help="之前保存的 JSON 结果，用于检测吞吐量退化。")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的吞吐量下降比例。")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"未知的抓取方式: {', '.join(unknown)}")
+
+    site = StandInSite(extra_countries=args.extra_countries, latency=args.latency, jitter=args.jitter,
+                       rate_429=args.rate_429, rate_5xx=args.rate_5xx, retry_after=args.retry_after,
+                       seed=args.seed)
+    results = []
+    with site:
+        data_collector.BASE_DOMAIN = site.base_domain # 让站内相对链接指向替身站点
+        print(f"替身站点: {site.base_url} (完整抓取 {site.page_count()} 个页面，延迟 {args.latency}s"
+              f" + 抖动 {args.jitter}s，429 {args.rate_429:.0%}，5xx {args.rate_5xx:.0%})")
+        for mode in modes:
+            result = run_mode(mode, site, args)
+            results.append(result)
+            print(f"  {mode}: {result['pages']} 页 / {result['records']} 条记录，{result['seconds']}s")
+
+    print(f"\n{'方式':<10}{'页/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'重试':>8}{'限流':>8}{'耗时(秒)':>12}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['pages_per_sec']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['retries']:>8}{r['throttles']:>8}{r['seconds']:>12}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.json_path}")
+
+    if args.baseline:
+        print(f"\n与基线 {args.baseline} 比较 (允许下降 {args.tolerance:.0%}):")
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"吞吐量退化: {', '.join(regressions)}")
+            sys.exit(1)
+        print("没有发现吞吐量退化。")
+
+
+if __name__ == "__main__":
+    main()
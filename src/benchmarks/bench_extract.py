@@ -0,0 +1,211 @@
+"""指标提取微基准测试：原手写 _extract_metrics 与声明式 metric_spec 的单页耗时对比
+
+只测量 "已解析的 soup -> 指标字典" 这一步 (不含网络与 HTML 解析)，并校验两种实现的结果完全一致。
+
+语料来源 (可组合，都不指定时使用本地替身站点生成的页面)：
+  --corpus DIR   目录下的 *.html / *.htm 文件
+  --cache FILE   data_collector.py 生成的 HTTP 缓存 (output_data/http_cache.sqlite3)
+
+示例：
+  python benchmarks/bench_extract.py --repeat 20
+  python benchmarks/bench_extract.py --cache output_data/http_cache.sqlite3 --backend fast
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_parse import load_corpus
+from fast_extract import EXTRACT_BACKENDS, check_backend, parse_year_html
+from metric_spec import COMPILED_SPEC
+from stand_in_site import StandInSite
+
+
+class LegacyExtractor:
+    """改造前的提取实现 (逐字保留，仅去掉注释掉的调试输出)，作为对照基线"""
+    def _extract_number(self, text):
+        """从文本中提取数字，处理 'n/a' 和潜在错误"""
+        if not text:
+            return None
+        text_cleaned = text.strip().lower()
+        if text_cleaned == 'n/a':
+            return 'n/a' # 保留 n/a 作为一个明确的值
+        text_cleaned = text_cleaned.replace(',', '')
+        try:
+            num_str = ''.join(filter(lambda x: x.isdigit() or x == '.', text_cleaned))
+            if num_str: # 确保过滤后还有内容
+                if num_str.count('.') <= 1:
+                    return float(num_str)
+                else:
+                    parts = num_str.split('.')
+                    valid_num_str = parts[0] + '.' + parts[1] if len(parts) > 1 else parts[0]
+                    return float(valid_num_str)
+
+            else: # 如果过滤后为空 (例如只有 '%')
+                 return None
+
+        except ValueError:
+             return None # 解析失败返回 None
+        except Exception as e:
+            print(f"  警告：提取数字时发生意外错误 '{text}': {e}")
+            return None
+
+    def _extract_metrics(self, soup, data):
+        """从页面中提取各个指标数据"""
+        processed_titles = set()
+
+        upper_part = soup.find('div', class_='upper-part')
+        bottom_part = soup.find('div', class_='bottom-part upper-part row')
+
+        if upper_part:
+            data_blocks = upper_part.find_all('div', class_=['single-data', 'single-data small-margin'])
+
+            for i, item in enumerate(data_blocks):
+
+                title_element = item.find('h3')
+                if not title_element:
+                    continue
+
+                title_text_raw = title_element.text.strip()
+                title_text_lower = title_text_raw.lower()
+
+                if 'e-waste collection rate' in title_text_lower and title_text_raw not in processed_titles:
+                    percent_element = item.find('text', class_='circle-chart__percent')
+                    if percent_element:
+                        data['E-waste Collection Rate (%)'] = self._extract_number(percent_element.text)
+                        processed_titles.add(title_text_raw)
+                    else:
+                        pass
+                    continue
+
+                value_element = item.find('p', class_=['num bignum', 'num middlenum', 'num bignum pomEEE', 'num middlenum pomEEE'])
+                if not value_element:
+                    continue
+
+                unit_elements = item.find_all('p', class_='num')
+                unit_text = ""
+                item_text_lower = item.text.lower()
+
+                if len(unit_elements) > 0:
+                    next_p = value_element.find_next_sibling('p', class_='num') if value_element else None
+                    if next_p:
+                        unit_text = next_p.text.strip().lower()
+                    elif len(unit_elements) > 1:
+                        unit_text = unit_elements[-1].text.strip().lower()
+
+                value_text = value_element.text.strip()
+                numeric_value = self._extract_number(value_text)
+
+                if title_text_raw in processed_titles:
+                    continue
+
+                if 'e-waste generated' in title_text_lower:
+                    data['E-waste Generated (kt)'] = numeric_value
+                    processed_titles.add(title_text_raw)
+                elif 'eee put on market' in title_text_lower:
+                    data['EEE Put on Market (kt)'] = numeric_value
+                    processed_titles.add(title_text_raw)
+                elif 'e-waste formally collected' in title_text_lower:
+                    data['E-waste Formally Collected (kt)'] = numeric_value
+                    processed_titles.add(title_text_raw)
+                elif 'e-waste imported' in title_text_lower:
+                    data['E-waste Imported (kt)'] = numeric_value
+                    processed_titles.add(title_text_raw)
+                elif 'e-waste exported' in title_text_lower:
+                    data['E-waste Exported (kt)'] = numeric_value
+                    processed_titles.add(title_text_raw)
+
+        if bottom_part:
+            data_blocks = bottom_part.find_all('div', class_='single-data')
+
+            for i, item in enumerate(data_blocks):
+
+                title_element = item.find('h3')
+                if not title_element:
+                    continue
+
+                title_text_raw = title_element.text.strip()
+                title_text_lower = title_text_raw.lower()
+
+                value_element = item.find('p', class_=['num bignum', 'num middlenum', 'num bignum pomEEE', 'num middlenum pomEEE'])
+                if not value_element:
+                    continue
+
+                unit_elements = item.find_all('p', class_='num')
+                unit_text = ""
+                item_text_lower = item.text.lower()
+
+                if len(unit_elements) > 0:
+                    next_p = value_element.find_next_sibling('p', class_='num') if value_element else None
+                    if next_p:
+                        unit_text = next_p.text.strip().lower()
+                    elif len(unit_elements) > 1:
+                        unit_text = unit_elements[-1].text.strip().lower()
+
+                value_text = value_element.text.strip()
+                numeric_value = self._extract_number(value_text)
+
+                if 'e-waste generated' in title_text_lower:
+                    data['E-waste Generated (kg/capita)'] = numeric_value
+                elif 'eee put on market' in title_text_lower:
+                    data['EEE Put on Market (kg/capita)'] = numeric_value
+
+
+def stand_in_corpus():
+    """替身站点的全部年份页面 (直接渲染，不启动服务器)"""
+    site = StandInSite()
+    return [(f'{category}/{name}/{year}', site._year_page(category, name, year))
+            for category, names in site.entities.items() for name in names for year in site.years]
+
+
+def time_extractor(extract, soups, repeat):
+    """返回 (每页平均微秒数, 第一轮的结果列表)"""
+    results = []
+    start = time.perf_counter()
+    for i in range(repeat):
+        for soup in soups:
+            data = {}
+            extract(soup, data)
+            if i == 0:
+                results.append(data)
+    elapsed = time.perf_counter() - start
+    return elapsed / (len(soups) * repeat) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较原手写指标提取与声明式指标规格的单页耗时。")
+    parser.add_argument("--corpus", help="保存的 HTML 页面所在目录。")
+    parser.add_argument("--cache", help="HTTP 缓存文件 (http_cache.sqlite3)。")
+    parser.add_argument("--backend", default="full", help=f"解析后端 (可选: {', '.join(EXTRACT_BACKENDS)})。")
+    parser.add_argument("--repeat", type=int, default=10, help="重复提取整个语料的次数。")
+    args = parser.parse_args()
+
+    check_backend(args.backend)
+    pages = load_corpus(args.corpus, args.cache) if args.corpus or args.cache else stand_in_corpus()
+    if not pages:
+        print("错误：语料中没有任何页面。")
+        return
+    soups = [parse_year_html(text, args.backend) for _, text in pages]
+    print(f"语料共 {len(pages)} 个页面 (后端 {args.backend})，每种实现重复 {args.repeat} 次。")
+
+    legacy = LegacyExtractor()
+    before_us, before = time_extractor(legacy._extract_metrics, soups, args.repeat)
+    after_us, after = time_extractor(COMPILED_SPEC.extract, soups, args.repeat)
+
+    print(f"\n{'实现':<12}{'微秒/页':>12}")
+    print(f"{'手写分支':<12}{before_us:>12.1f}")
+    print(f"{'声明式规格':<12}{after_us:>12.1f}")
+    print(f"提速 {before_us / after_us:.2f}x")
+
+    mismatches = [page_id for (page_id, _), a, b in zip(pages, before, after) if a != b]
+    if mismatches:
+        print(f"\n警告：{len(mismatches)} 个页面的提取结果不一致，例如: {mismatches[:5]}")
+        sys.exit(1)
+    print("\n两种实现的提取结果完全一致。")
+
+
+if __name__ == "__main__":
+    main()
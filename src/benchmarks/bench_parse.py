@@ -0,0 +1,130 @@
+"""年份页面解析吞吐量基准测试
+
+在一组已保存的页面上比较 fast_extract.EXTRACT_BACKENDS 中各个解析后端的
+吞吐量 (页/秒) 与峰值内存 (RSS)，并校验各后端提取出的记录完全一致。
+
+语料来源 (二选一)：
+  --corpus DIR   目录下的 *.html / *.htm 文件
+  --cache FILE   data_collector.py 生成的 HTTP 缓存 (output_data/http_cache.sqlite3)
+
+示例：
+  python benchmarks/bench_parse.py --cache output_data/http_cache.sqlite3 --repeat 3
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import EwasteDataCollector
+from fast_extract import EXTRACT_BACKENDS, check_backend, parse_year_html
+from http_cache import HttpCache
+
+
+def load_corpus(corpus_dir=None, cache_path=None):
+    """返回 [(页面标识, HTML 文本), ...]"""
+    pages = []
+    if corpus_dir:
+        paths = sorted(glob.glob(os.path.join(corpus_dir, '*.html')) + glob.glob(os.path.join(corpus_dir, '*.htm')))
+        for path in paths:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append((os.path.basename(path), f.read()))
+    if cache_path:
+        cache = HttpCache(cache_path, cache_only=True)
+        pages.extend((entry.url, entry.text) for entry in cache.iter_entries())
+        cache.close()
+    return pages
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存 (MB)；macOS 上 ru_maxrss 单位为字节，Linux 上为 KB"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def run_backend(backend, pages, repeat):
+    """在当前进程中测试一个后端，返回统计结果与记录摘要"""
+    collector = EwasteDataCollector(extract_backend=backend)
+    baseline_rss = peak_rss_mb()
+    digest = hashlib.sha256()
+    start = time.perf_counter()
+    for i in range(repeat):
+        for page_id, text in pages:
+            soup = parse_year_html(text, backend)
+            record = collector._parse_year_page(soup, page_id, 'Bench', page_id, '0')
+            if i == 0:
+                digest.update(json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    elapsed = time.perf_counter() - start
+    parsed = len(pages) * repeat
+    return {
+        'backend': backend,
+        'pages': parsed,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(parsed / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'baseline_rss_mb': round(baseline_rss, 1),
+        'records_sha256': digest.hexdigest(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较年份页面解析后端的吞吐量与峰值内存。")
+    parser.add_argument("--corpus", help="保存的 HTML 页面所在目录。")
+    parser.add_argument("--cache", help="HTTP 缓存文件 (http_cache.sqlite3)。")
+    parser.add_argument("--backends", default=",".join(EXTRACT_BACKENDS), help="要测试的后端，逗号分隔。")
+    parser.add_argument("--repeat", type=int, default=1, help="每个后端重复解析整个语料的次数。")
+    parser.add_argument("--worker", help=argparse.SUPPRESS) # 内部使用：在子进程中测试单个后端
+    args = parser.parse_args()
+
+    if not args.corpus and not args.cache:
+        parser.error("请通过 --corpus 或 --cache 指定页面语料。")
+
+    pages = load_corpus(args.corpus, args.cache)
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, pages, args.repeat)))
+        return
+
+    if not pages:
+        print("错误：语料中没有任何页面。")
+        return
+    print(f"语料共 {len(pages)} 个页面，每个后端重复 {args.repeat} 次。")
+
+    # 每个后端在独立子进程中运行，保证峰值 RSS 互不影响
+    results = []
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        try:
+            check_backend(backend)
+        except ImportError as e:
+            print(f"跳过后端 {backend}: {e}")
+            continue
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', backend, '--repeat', str(args.repeat)]
+        if args.corpus:
+            cmd += ['--corpus', args.corpus]
+        if args.cache:
+            cmd += ['--cache', args.cache]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"\n{'后端':<8}{'页/秒':>12}{'耗时(秒)':>12}{'峰值RSS(MB)':>14}  记录摘要")
+    for r in results:
+        print(f"{r['backend']:<8}{r['pages_per_sec']:>12}{r['seconds']:>12}{r['peak_rss_mb']:>14}  {r['records_sha256'][:12]}")
+
+    if len({r['records_sha256'] for r in results}) > 1:
+        print("\n警告：各后端提取出的记录不一致！")
+    elif results:
+        print("\n所有后端提取出的记录完全一致。")
+        base = next((r for r in results if r['backend'] == 'full'), None)
+        if base:
+            for r in results:
+                if r is not base and base['pages_per_sec']:
+                    print(f"  {r['backend']} 相对 full 提速 {r['pages_per_sec'] / base['pages_per_sec']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
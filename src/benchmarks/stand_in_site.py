@@ -0,0 +1,209 @@
+"""本地替身站点：模拟 globalewaste.org 的页面结构，供抓取基准测试使用
+
+- /country-sheets/ 基础页面：#continent-list / #region-list / #country-list 三个列表；
+- /country-sheets/<类别>/<名称>/ 详情页：a.yclick 年份链接 + 最新年份的数据；
+- /country-sheets/<类别>/<名称>/<年份>/ 年份页面：p.pop-number、div.upper-part、
+  div.bottom-part.upper-part.row，结构与 _extract_metrics 解析的真实页面一致。
+
+页面内容由 (路径, 年份) 决定，同一站点多次运行返回完全相同的数据；
+可按比例注入延迟、429 (可带 Retry-After) 与 5xx 错误。
+"""
+import http.server
+import random
+import threading
+import time
+from urllib.parse import quote, unquote
+
+
+# 默认实体：包含 run_test_scrape 的全部测试目标，便于同时测试两种抓取方式
+DEFAULT_ENTITIES = {
+    'Continent': ['Africa', 'Americas', 'Asia', 'Europe', 'Oceania'],
+    'Region': ['Australia and New Zealand', 'Eastern Asia', 'South-Eastern Asia', 'Western Europe'],
+    'Country': ['Brazil', 'China', 'France', 'Germany', 'India', 'Japan', 'Nigeria', 'United States of America'],
+}
+DEFAULT_YEARS = [str(y) for y in range(2022, 2009, -1)]
+_LIST_IDS = {'Continent': 'continent-list', 'Region': 'region-list', 'Country': 'country-list'}
+_SERVER_ERRORS = (500, 502, 503, 504)
+
+
+class StandInSite:
+    """在 127.0.0.1 上运行的替身站点 (独立线程，支持 with 语句)"""
+    def __init__(self, entities=None, years=None, extra_countries=0, latency=0.0, jitter=0.0,
+                 rate_429=0.0, rate_5xx=0.0, retry_after=None, seed=0, port=0):
+        self.entities = {cat: list(names) for cat, names in (entities or DEFAULT_ENTITIES).items()}
+        self.entities['Country'] += [f'Country {i:04d}' for i in range(extra_countries)] # 扩大抓取规模
+        self.years = list(years or DEFAULT_YEARS)
+        self.latency = latency       # 每个响应的基础延迟 (秒)
+        self.jitter = jitter         # 额外的随机延迟上限 (秒)
+        self.rate_429 = rate_429     # 返回 429 的概率
+        self.rate_5xx = rate_5xx     # 返回 500/502/503/504 的概率
+        self.retry_after = retry_after # 429 响应附带的 Retry-After (秒)，None 表示不附带
+        self.port = port
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self.reset_stats()
+
+    # --- 生命周期 ---
+    def start(self):
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True # 避免 Nagle + 延迟确认给每个响应额外增加约 40ms
+            wbufsize = -1                  # 响应头与正文合并发送
+
+            def do_GET(self):
+                site._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        threading.Thread(target=self._server.serve_forever, name='stand-in-site', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    @property
+    def base_domain(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    @property
+    def base_url(self):
+        return self.base_domain + '/country-sheets/'
+
+    def page_count(self, target_years=None):
+        """完整抓取需要的页面数 (基础页 + 详情页 + 年份页，不含重试)"""
+        years = [y for y in self.years if not target_years or y in target_years]
+        entities = sum(len(names) for names in self.entities.values())
+        return 1 + entities * (1 + len(years))
+
+    # --- 统计 ---
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.status_counts = {}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'bytes_sent': self.bytes_sent,
+                'injected_429': self.status_counts.get(429, 0),
+                'injected_5xx': sum(n for s, n in self.status_counts.items() if s in _SERVER_ERRORS),
+                'status_counts': dict(sorted(self.status_counts.items())),
+            }
+
+    # --- 请求处理 ---
+    def _pick_status(self):
+        with self._lock:
+            roll = self._random.random()
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if roll < self.rate_429:
+                return 429, delay
+            if roll < self.rate_429 + self.rate_5xx:
+                return self._random.choice(_SERVER_ERRORS), delay
+        return 200, delay
+
+    def _handle(self, handler):
+        status, delay = self._pick_status()
+        if delay:
+            time.sleep(delay)
+        headers = {}
+        body = None
+        if status == 200:
+            body = self._render(handler.path)
+            if body is None:
+                status = 404
+        if status == 429 and self.retry_after is not None:
+            headers['Retry-After'] = str(self.retry_after)
+        if body is None:
+            body = f'<html><body><h1>{status}</h1></body></html>'
+        payload = body.encode('utf-8')
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(payload)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += len(payload)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def _render(self, path):
+        parts = [unquote(p) for p in path.split('?')[0].split('/') if p]
+        if parts == ['country-sheets']:
+            return self._base_page()
+        if len(parts) not in (3, 4) or parts[0] != 'country-sheets':
+            return None
+        category = parts[1].capitalize()
+        if category not in self.entities or parts[2] not in self.entities[category]:
+            return None
+        if len(parts) == 3:
+            return self._year_page(category, parts[2], self.years[0]) # 详情页显示最新年份
+        if parts[3] not in self.years:
+            return None
+        return self._year_page(category, parts[2], parts[3])
+
+    def _detail_path(self, category, name):
+        return f'/country-sheets/{category.lower()}/{quote(name)}/'
+
+    def _base_page(self):
+        html = ['<html><body>']
+        for category, list_id in _LIST_IDS.items():
+            items = ''.join(f'<li><a href="{self._detail_path(category, n)}">{n}</a></li>'
+                            for n in self.entities.get(category, []))
+            html.append(f'<ul id="{list_id}">{items}</ul>')
+        html.append('</body></html>')
+        return ''.join(html)
+
+    def _year_page(self, category, name, year):
+        rng = random.Random(f'{category}/{name}/{year}')
+        path = self._detail_path(category, name)
+
+        def value(low, high):
+            return 'n/a' if rng.random() < 0.1 else f'{rng.uniform(low, high):,.2f}'
+
+        def block(title, css, number, unit, extra=''):
+            return (f'<div class="single-data{extra}"><h3>{title}</h3>'
+                    f'<p class="{css}">{number}</p><p class="num">{unit}</p></div>')
+
+        year_links = ''.join(f'<a class="yclick" href="{path}{y}/">{y}</a>' for y in self.years)
+        return ''.join([
+            f'<html><head><title>{name} {year}</title></head><body>',
+            f'<nav class="years">{year_links}</nav>',
+            '<div class="filler">', '<p>Lorem ipsum dolor sit amet.</p>' * 40, '</div>', # 与真实页面类似的无关内容
+            f'<div class="population"><p class="pop-number">{rng.randint(10_000, 1_500_000_000):,}</p></div>',
+            '<div class="upper-part">',
+            block('E-waste generated', 'num bignum', value(1, 10_000), 'kt'),
+            block('EEE put on market', 'num bignum pomEEE', value(1, 10_000), 'kt', ' small-margin'),
+            block('E-waste formally collected', 'num middlenum', value(0, 5_000), 'kt'),
+            '<div class="single-data"><h3>E-waste collection rate</h3><svg>'
+            f'<text class="circle-chart__percent">{rng.uniform(0, 90):.1f}%</text></svg></div>',
+            block('E-waste imported', 'num middlenum', value(0, 500), 'kt'),
+            block('E-waste exported', 'num middlenum', value(0, 500), 'kt'),
+            '</div>',
+            '<div class="bottom-part upper-part row">',
+            block('E-waste generated', 'num middlenum', value(0.1, 30), 'kg/capita'),
+            block('EEE put on market', 'num middlenum pomEEE', value(0.1, 40), 'kg/capita'),
+            '</div>',
+            '</body></html>',
+        ])
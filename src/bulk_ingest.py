@@ -0,0 +1,168 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from columnar_export import METRIC_COLUMNS
+
+
+# 规范化后的表头 -> 输出列 (规范化规则见 _normalize)
+COLUMN_ALIASES = {
+    'category': 'Category', 'level': 'Category',
+    'name': 'Name', 'country': 'Name', 'country name': 'Name', 'entity': 'Name', 'area': 'Name',
+    'year': 'Year', 'reference year': 'Year',
+    'population': 'Population', 'pop': 'Population',
+    'ewaste generated kt': 'E-waste Generated (kt)', 'ewg kt': 'E-waste Generated (kt)',
+    'eee put on market kt': 'EEE Put on Market (kt)', 'eee pom kt': 'EEE Put on Market (kt)',
+    'pom kt': 'EEE Put on Market (kt)',
+    'ewaste formally collected kt': 'E-waste Formally Collected (kt)',
+    'ewaste collected kt': 'E-waste Formally Collected (kt)',
+    'ewaste collection rate %': 'E-waste Collection Rate (%)', 'collection rate %': 'E-waste Collection Rate (%)',
+    'collection rate': 'E-waste Collection Rate (%)',
+    'ewaste generated kg/capita': 'E-waste Generated (kg/capita)', 'ewg kg/capita': 'E-waste Generated (kg/capita)',
+    'eee put on market kg/capita': 'EEE Put on Market (kg/capita)', 'eee pom kg/capita': 'EEE Put on Market (kg/capita)',
+    'pom kg/capita': 'EEE Put on Market (kg/capita)',
+    'ewaste imported kt': 'E-waste Imported (kt)',
+    'ewaste exported kt': 'E-waste Exported (kt)',
+}
+# 长表 (每行一个指标) 的指标名列与数值列
+INDICATOR_ALIASES = ('indicator', 'metric', 'variable', 'series')
+VALUE_ALIASES = ('value', 'obs value', 'amount')
+KEY_COLUMNS = ['Category', 'Name', 'Year']
+
+
+def _normalize(header):
+    """'E-waste Generated (kt)' / 'e_waste_generated_kt' / 'E-Waste generated [kt]' -> 'ewaste generated kt'"""
+    text = str(header).strip().lower().replace('_', ' ')
+    text = re.sub(r'[()\[\],;:]', ' ', text)
+    text = re.sub(r'\be[\s-]?waste\b', 'ewaste', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def read_bulk_file(path, sheet=None):
+    """读取 CSV / XLSX 原始表格 (全部按字符串读取，保留 'n/a' 以便与缺失区分)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xlsm', '.xls'):
+        try:
+            return pd.read_excel(path, sheet_name=sheet or 0, dtype=str, keep_default_na=False, na_values=[''])
+        except ImportError as e:
+            raise ImportError("读取 Excel 文件需要安装 openpyxl: pip install openpyxl") from e
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''], encoding='utf-8-sig',
+                       sep=None, engine='python')
+
+
+def map_columns(columns, column_map=None):
+    """返回 {原始表头: 输出列}；column_map ({原始表头: 输出列}) 优先于内置别名"""
+    mapping = {}
+    explicit = dict(column_map or {})
+    for col in columns:
+        if col in explicit:
+            mapping[col] = explicit[col]
+        elif col in KEY_COLUMNS + METRIC_COLUMNS:
+            mapping[col] = col
+        elif _normalize(col) in COLUMN_ALIASES:
+            mapping[col] = COLUMN_ALIASES[_normalize(col)]
+    return mapping
+
+
+def _pivot_long(raw, column_map):
+    """长表 -> 宽表：按 (键列) 把指标名列展开为各指标列；指标名同样经过别名映射"""
+    normalized = {_normalize(c): c for c in raw.columns}
+    indicator = next(normalized[a] for a in INDICATOR_ALIASES if a in normalized)
+    value = next(normalized[a] for a in VALUE_ALIASES if a in normalized)
+    keys = {c: m for c, m in map_columns([c for c in raw.columns if c not in (indicator, value)], column_map).items()
+            if m in KEY_COLUMNS}
+    metric_names = map_columns(raw[indicator].dropna().unique(), column_map)
+    long = raw[list(keys) + [indicator, value]].rename(columns=keys)
+    long['__metric'] = long[indicator].map(metric_names)
+    long = long.dropna(subset=['__metric'])
+    wide = long.pivot_table(index=list(keys.values()), columns='__metric', values=value, aggfunc='first')
+    wide.columns.name = None
+    unmapped = sorted(set(raw[indicator].dropna().unique()) - set(metric_names))
+    return wide.reset_index(), unmapped
+
+
+def _metric_values(raw):
+    """一次向量化转换：数值 -> float，'n/a' 保留为字符串，其余无法解析的值与空值 -> None"""
+    text = raw.astype('string').str.strip()
+    is_na = text.str.lower().eq('n/a').fillna(False)
+    numbers = pd.to_numeric(text.str.replace(r'[,\s%]', '', regex=True), errors='coerce').astype('float64')
+    out = numbers.astype(object).where(numbers.notna(), None)
+    out[is_na.to_numpy()] = 'n/a'
+    return out
+
+
+def load_bulk_dataset(path, sheet=None, column_map=None, category='Country'):
+    """把批量数据文件转换为与 save_data 相同 schema 的 DataFrame，并做基本校验
+
+    返回 (DataFrame (列顺序同 COLUMN_ORDER)，校验报告 dict)。
+    没有类别列时所有行使用 category；Year 保存为字符串 (与抓取得到的记录一致)。
+    """
+    from data_collector import COLUMN_ORDER
+    raw = read_bulk_file(path, sheet)
+    normalized = {_normalize(c) for c in raw.columns}
+    long_format = any(a in normalized for a in INDICATOR_ALIASES) and any(a in normalized for a in VALUE_ALIASES)
+    if long_format:
+        table, unmapped = _pivot_long(raw, column_map)
+    else:
+        mapping = map_columns(raw.columns, column_map)
+        unmapped = [c for c in raw.columns if c not in mapping]
+        duplicated = sorted({m for m in mapping.values() if list(mapping.values()).count(m) > 1})
+        if duplicated:
+            raise ValueError(f"多个原始列映射到了同一输出列: {', '.join(duplicated)}，请用 column_map 指定")
+        table = raw[list(mapping)].rename(columns=mapping)
+
+    missing_keys = [c for c in ('Name', 'Year') if c not in table.columns]
+    if missing_keys:
+        raise ValueError(f"批量文件中找不到必需的列: {', '.join(missing_keys)} (可用 column_map 指定)")
+    present_metrics = [c for c in METRIC_COLUMNS if c in table.columns]
+    if not present_metrics:
+        raise ValueError("批量文件中没有可识别的指标列 (可用 column_map 指定)")
+
+    df = pd.DataFrame(index=table.index)
+    df['Category'] = table['Category'].astype('string').str.strip().str.title() if 'Category' in table.columns else category
+    df['Name'] = table['Name'].astype('string').str.strip()
+    years = pd.to_numeric(table['Year'].astype('string').str.strip(), errors='coerce')
+    bad_rows = df['Name'].isna() | years.isna() | (years != years.round())
+    df['Year'] = years.where(~bad_rows).astype('Int64').astype('string') # 非整数年份先剔除，再转换
+    for col in METRIC_COLUMNS:
+        df[col] = _metric_values(table[col]) if col in table.columns else None
+    df['Source URL'] = f"bulk:{os.path.basename(path)}"
+
+    dupes = df.duplicated(subset=KEY_COLUMNS, keep='first') & ~bad_rows
+    numeric = df[present_metrics].apply(pd.to_numeric, errors='coerce')
+    rate = numeric.get('E-waste Collection Rate (%)')
+    report = {
+        'source': os.path.abspath(path),
+        'layout': 'long' if long_format else 'wide',
+        'rows_read': int(len(raw)),
+        'rows_loaded': int((~bad_rows & ~dupes).sum()),
+        'rows_missing_key': int(bad_rows.sum()),
+        'duplicate_keys': int(dupes.sum()),
+        'metrics_mapped': present_metrics,
+        'metrics_missing': [c for c in METRIC_COLUMNS if c not in present_metrics],
+        'unmapped_columns': [str(c) for c in unmapped],
+        'negative_values': {c: int(n) for c, n in (numeric < 0).sum().items() if n},
+        'collection_rate_over_100': int((rate > 100).sum()) if rate is not None else 0,
+        'entities': int(df.loc[~bad_rows, 'Name'].nunique()),
+        'years': sorted(df.loc[~bad_rows, 'Year'].dropna().unique().tolist()),
+    }
+    df = df[~bad_rows & ~dupes].astype({'Category': object, 'Name': object, 'Year': object})
+    df = df.replace({np.nan: None})
+    return df.reindex(columns=COLUMN_ORDER).reset_index(drop=True), report
+
+
+def ingest_bulk(path, sheet=None, column_map=None, category='Country', sink=None, keep_records=True):
+    """批量导入：加载并校验文件，把记录交给 sink (含义同 collect_data)；返回 (记录列表, 校验报告)"""
+    print(f"开始从批量文件导入数据: {path}")
+    df, report = load_bulk_dataset(path, sheet=sheet, column_map=column_map, category=category)
+    records = df.to_dict(orient='records')
+    if sink is not None:
+        for record in records:
+            sink(record)
+    print(f"导入 {report['rows_loaded']} 条记录 ({report['entities']} 个项目，年份 {', '.join(report['years'])})；"
+          f"跳过缺少名称/年份的行 {report['rows_missing_key']} 条、重复的行 {report['duplicate_keys']} 条。")
+    if report['unmapped_columns']:
+        print(f"  注意：以下列未映射，已忽略: {', '.join(report['unmapped_columns'])}")
+    return (records if keep_records else []), report
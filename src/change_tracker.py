@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from columnar_export import METRIC_COLUMNS
+
+
+def content_digest(data):
+    """内容哈希 (blake2b-128，十六进制)；data 为 str 或 bytes"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def record_digest(record):
+    """记录的内容哈希：只覆盖各指标的值 (Source URL 等元数据变化不算数据变化)"""
+    return content_digest(json.dumps([record.get(col) for col in METRIC_COLUMNS], ensure_ascii=False))
+
+
+class ChangeTracker:
+    """基于内容哈希的变更检测 (SQLite，跨运行保存)
+
+    - 页面级：保存每个年份页面正文的哈希及其提取结果。正文与上次完全相同时，
+      lookup_page 直接返回上次的记录，调用方跳过 HTML 解析；
+    - 记录级：保存每个 (类别, 名称, 年份) 记录的指标值与哈希。observe 可直接作为 sink，
+      哈希变化时逐指标比较，生成 changed / appeared / vanished 变更；
+    - finish() 找出本次抓取过的项目中没有再出现的年份记录 (vanished)，返回本次运行的变更日志。
+    """
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                   url TEXT PRIMARY KEY,
+                   digest TEXT NOT NULL,
+                   record TEXT,
+                   checked_at REAL NOT NULL
+               )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS records (
+                   category TEXT NOT NULL,
+                   name TEXT NOT NULL,
+                   year TEXT NOT NULL,
+                   digest TEXT NOT NULL,
+                   record TEXT NOT NULL,
+                   run_id INTEGER NOT NULL,
+                   PRIMARY KEY (category, name, year)
+               )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS runs (
+                   run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   started_at REAL NOT NULL,
+                   finished_at REAL,
+                   changes INTEGER
+               )"""
+        )
+        self.run_id = self._conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),)).lastrowid
+        self._conn.commit()
+        self.changes = []        # 本次运行的变更 (按发现顺序)
+        self._entities = set()   # 本次运行中出现过记录的 (类别, 名称)
+        self._years = set()      # 本次运行中出现过的年份
+        # 运行统计
+        self.pages_unchanged = 0 # 正文未变，跳过解析的页面数
+        self.pages_changed = 0   # 新页面或正文已变化的页面数
+        self.records_unchanged = 0
+        self.records_changed = 0
+        self.records_new = 0
+
+    # --- 页面级 ---
+    def lookup_page(self, url, digest, category, name, year):
+        """页面正文哈希与上次相同时返回 (True, 上次的记录)；否则返回 (False, None)，需要重新解析"""
+        with self._lock:
+            row = self._conn.execute("SELECT digest, record FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or row[0] != digest:
+            self.pages_changed += 1
+            return False, None
+        record = json.loads(row[1]) if row[1] else None
+        if record is not None and (record.get('Category'), record.get('Name'), record.get('Year')) != (category, name, year):
+            self.pages_changed += 1 # 同一 URL 被用于其他项目，不能复用
+            return False, None
+        self.pages_unchanged += 1
+        return True, record
+
+    def remember_page(self, url, digest, record):
+        """保存页面正文哈希与解析结果 (页面无有效数据时 record 为 None)"""
+        payload = json.dumps(record, ensure_ascii=False) if record else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, digest, record, checked_at) VALUES (?, ?, ?, ?)",
+                (url, digest, payload, time.time())
+            )
+            self._conn.commit()
+
+    # --- 记录级 ---
+    def observe(self, record):
+        """登记一条本次得到的记录 (可直接作为 sink)，与上次保存的值比较并记录变更"""
+        key = (record['Category'], record['Name'], str(record['Year']))
+        digest = record_digest(record)
+        with self._lock:
+            self._entities.add(key[:2])
+            self._years.add(key[2])
+            row = self._conn.execute(
+                "SELECT digest, record FROM records WHERE category = ? AND name = ? AND year = ?", key
+            ).fetchone()
+            if row is not None and row[0] == digest:
+                self._conn.execute(
+                    "UPDATE records SET run_id = ? WHERE category = ? AND name = ? AND year = ?", (self.run_id,) + key
+                )
+                self.records_unchanged += 1
+            else:
+                previous = json.loads(row[1]) if row is not None else {}
+                self._diff(key, previous, record)
+                if row is None:
+                    self.records_new += 1
+                else:
+                    self.records_changed += 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO records (category, name, year, digest, record, run_id) VALUES (?, ?, ?, ?, ?, ?)",
+                    key + (digest, json.dumps(record, ensure_ascii=False), self.run_id)
+                )
+            self._conn.commit()
+
+    def baseline_records(self):
+        """上次保存的全部记录 (按类别、名称、年份排列)，用于补全本次没有重新抓取的单元"""
+        with self._lock:
+            rows = self._conn.execute("SELECT record FROM records ORDER BY category, name, year").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def _diff(self, key, old, new):
+        """逐指标比较两条记录 (任一方可为空 dict)，把差异追加到 self.changes"""
+        for col in METRIC_COLUMNS:
+            before, after = old.get(col), new.get(col)
+            if before == after:
+                continue
+            if before is None:
+                change = 'appeared'
+            elif after is None:
+                change = 'vanished'
+            else:
+                change = 'changed'
+            self.changes.append({
+                'Category': key[0], 'Name': key[1], 'Year': key[2],
+                'Metric': col, 'Change': change, 'Old': before, 'New': after,
+            })
+
+    def finish(self):
+        """结束本次运行：找出没有再出现的记录并从基线中删除，返回变更日志 dict
+
+        只检查本次出现过的项目、在本次出现过的年份中缺少了哪些记录；本次完全没有出现的
+        项目或年份 (获取失败、只抓取部分年份的测试模式、中断) 不视为消失，其基线保持不变。
+        """
+        with self._lock:
+            stale = self._conn.execute(
+                "SELECT category, name, year, record FROM records WHERE run_id != ?", (self.run_id,)
+            ).fetchall()
+            vanished = [(c, n, y, r) for c, n, y, r in stale if (c, n) in self._entities and y in self._years]
+            for category, name, year, payload in vanished:
+                self._diff((category, name, year), json.loads(payload), {})
+            self._conn.executemany(
+                "DELETE FROM records WHERE category = ? AND name = ? AND year = ?",
+                [(c, n, y) for c, n, y, _ in vanished]
+            )
+            self._conn.execute(
+                "UPDATE runs SET finished_at = ?, changes = ? WHERE run_id = ?",
+                (time.time(), len(self.changes), self.run_id)
+            )
+            self._conn.commit()
+        counts = {'changed': 0, 'appeared': 0, 'vanished': 0}
+        for change in self.changes:
+            counts[change['Change']] += 1
+        return {
+            'run_id': self.run_id,
+            'summary': dict(counts, records_vanished=len(vanished), **self.stats()),
+            'changed_entities': sorted({(c['Category'], c['Name']) for c in self.changes}),
+            'changes': self.changes,
+        }
+
+    def stats(self):
+        return {
+            'pages_unchanged': self.pages_unchanged,
+            'pages_changed': self.pages_changed,
+            'records_unchanged': self.records_unchanged,
+            'records_changed': self.records_changed,
+            'records_new': self.records_new,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
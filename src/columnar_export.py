@@ -0,0 +1,121 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError: # pyarrow 为可选依赖，只有列式导出需要
+    pa = None
+
+
+# 数值列 (原始数据中可能为浮点数、None 或字符串 'n/a')
+METRIC_COLUMNS = [
+    'Population',
+    'E-waste Generated (kt)', 'EEE Put on Market (kt)',
+    'E-waste Formally Collected (kt)', 'E-waste Collection Rate (%)',
+    'E-waste Generated (kg/capita)', 'EEE Put on Market (kg/capita)',
+    'E-waste Imported (kt)', 'E-waste Exported (kt)',
+]
+NA_SUFFIX = ' n/a' # 掩码列后缀：网站明确标注为 'n/a' 时为 True (与"页面上没有该指标"区分)
+PARTITION_COLUMNS = ['Category', 'Year']
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("列式导出需要安装 pyarrow: pip install pyarrow")
+
+
+def arrow_schema():
+    """列式输出的显式 schema"""
+    _require_pyarrow()
+    fields = [
+        pa.field('Category', pa.dictionary(pa.int8(), pa.string())),
+        pa.field('Name', pa.dictionary(pa.int16(), pa.string())),
+        pa.field('Year', pa.int16()),
+    ]
+    fields += [pa.field(col, pa.float64()) for col in METRIC_COLUMNS]
+    fields += [pa.field(col + NA_SUFFIX, pa.bool_()) for col in METRIC_COLUMNS]
+    fields.append(pa.field('Source URL', pa.string()))
+    return pa.schema(fields)
+
+
+def _partitioning():
+    """分区目录 Category=<...>/Year=<...>；目录名中的值按普通字符串 / 整数解析"""
+    return ds.partitioning(pa.schema([('Category', pa.string()), ('Year', pa.int16())]), flavor='hive')
+
+
+def to_typed_frame(data):
+    """把记录列表或 save_data 格式的 DataFrame 转为强类型 DataFrame
+
+    - 指标列为 float64，'n/a' 变为 NaN，并在 "<列名> n/a" 布尔列中标记；
+    - Category / Name 为 category 类型，Year 为 int16。
+    """
+    if hasattr(data, 'to_typed_frame'): # RecordTable：直接使用其列数组
+        return data.to_typed_frame()
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    typed = pd.DataFrame(index=df.index)
+    typed['Category'] = df['Category'].astype('category')
+    typed['Name'] = df['Name'].astype('category')
+    typed['Year'] = pd.to_numeric(df['Year'], errors='coerce').astype('int16')
+    masks = {}
+    for col in METRIC_COLUMNS:
+        raw = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        masks[col + NA_SUFFIX] = raw.astype(str).str.strip().str.lower().eq('n/a')
+        typed[col] = pd.to_numeric(raw.mask(masks[col + NA_SUFFIX]), errors='coerce').astype('float64')
+    for name, mask in masks.items():
+        typed[name] = mask.astype(bool)
+    typed['Source URL'] = df['Source URL'].astype('string') if 'Source URL' in df.columns else pd.NA
+    return typed
+
+
+def typed_frame_from_csv(csv_path):
+    """读取 save_data / 流式写入器生成的 CSV 并转换为强类型 DataFrame
+
+    必须关闭 pandas 默认的缺失值识别，否则字符串 'n/a' 会被直接读成 NaN，
+    无法与 "页面上没有该指标" 区分。
+    """
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, na_values=[''], encoding='utf-8-sig')
+    return to_typed_frame(df)
+
+
+def write_parquet_dataset(data, root_dir):
+    """写出按 Category / Year 分区的 Parquet 数据集 (hive 风格目录)，返回写入的行数
+
+    同一分区会被整体替换，因此可以反复导出而不会产生重复数据。
+    """
+    _require_pyarrow()
+    typed = to_typed_frame(data)
+    if typed.empty:
+        print("没有数据可导出。")
+        return 0
+    table = pa.Table.from_pandas(typed, schema=arrow_schema(), preserve_index=False)
+    os.makedirs(root_dir, exist_ok=True)
+    ds.write_dataset(
+        table, root_dir, format='parquet',
+        partitioning=_partitioning(),
+        existing_data_behavior='delete_matching',
+    )
+    print(f"列式数据已写入: {root_dir} ({len(typed)} 行，按 {' / '.join(PARTITION_COLUMNS)} 分区)")
+    return len(typed)
+
+
+def read_parquet_dataset(root_dir, categories=None, years=None, columns=None):
+    """按需读取分区数据集：只扫描命中的分区，只加载需要的列"""
+    _require_pyarrow()
+    dataset = ds.dataset(root_dir, format='parquet', partitioning=_partitioning())
+    condition = None
+    if categories:
+        condition = ds.field('Category').isin(list(categories))
+    if years:
+        year_filter = ds.field('Year').isin([int(y) for y in years])
+        condition = year_filter if condition is None else condition & year_filter
+    df = dataset.to_table(columns=columns, filter=condition).to_pandas()
+    if 'Category' in df.columns:
+        df['Category'] = df['Category'].astype('category')
+    return df
+
+
+def na_mask(df):
+    """返回 {指标列: 'n/a' 布尔掩码}，便于下游区分 'n/a' 与缺失"""
+    return {col: df[col + NA_SUFFIX] for col in METRIC_COLUMNS if col + NA_SUFFIX in df.columns}
@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class CrawlJournal:
+    """抓取检查点日志 (SQLite)
+
+    每完成一个 (类别, 名称, 年份) 工作单元就立即写入一行并提交，
+    其中保存提取出的记录 (页面无有效数据时记录为空)。进程崩溃、被抢占
+    或重启后，使用 resume=True 重新打开即可跳过已完成的单元。
+    获取失败的单元不会写入，因此续跑时会被重新抓取。
+    """
+    def __init__(self, path, resume=False):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS units (
+                   seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                   category TEXT NOT NULL,
+                   name TEXT NOT NULL,
+                   year TEXT NOT NULL,
+                   url TEXT,
+                   record TEXT,
+                   finished_at REAL NOT NULL,
+                   UNIQUE (category, name, year)
+               )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entities (
+                   category TEXT NOT NULL,
+                   name TEXT NOT NULL,
+                   years TEXT NOT NULL,
+                   finished_at REAL NOT NULL,
+                   PRIMARY KEY (category, name)
+               )"""
+        )
+        if not resume:
+            self._conn.execute("DELETE FROM units")
+            self._conn.execute("DELETE FROM entities")
+        self._conn.commit()
+        self.resumed_units = 0 # 本次运行中直接从日志取回的单元数
+
+    def unit_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM units").fetchone()[0]
+
+    def get_unit(self, category, name, year):
+        """查询一个单元：返回 (是否已完成, 记录)；页面无有效数据时记录为 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM units WHERE category = ? AND name = ? AND year = ?", (category, name, year)
+            ).fetchone()
+        if row is None:
+            return False, None
+        self.resumed_units += 1
+        return True, (json.loads(row[0]) if row[0] else None)
+
+    def completed_years(self, category, name):
+        """返回某个项目已完成的年份集合"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT year FROM units WHERE category = ? AND name = ?", (category, name)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def record_unit(self, category, name, year, url, record):
+        """记录一个已完成的单元并立即提交"""
+        payload = json.dumps(record, ensure_ascii=False) if record else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO units (category, name, year, url, record, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (category, name, year, url, payload, time.time())
+            )
+            self._conn.commit()
+
+    def is_entity_done(self, category, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM entities WHERE category = ? AND name = ?", (category, name)
+            ).fetchone()
+        return row is not None
+
+    def mark_entity_done(self, category, name, years):
+        """某个项目的全部年份单元都已完成；years 为页面上年份链接的顺序"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entities (category, name, years, finished_at) VALUES (?, ?, ?, ?)",
+                (category, name, json.dumps(list(years)), time.time())
+            )
+            self._conn.commit()
+
+    def entity_records(self, category, name):
+        """按页面上的年份顺序返回某个已完成项目的全部有效记录"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT years FROM entities WHERE category = ? AND name = ?", (category, name)
+            ).fetchone()
+            rows = dict(self._conn.execute(
+                "SELECT year, record FROM units WHERE category = ? AND name = ?", (category, name)
+            ).fetchall())
+        years = json.loads(row[0]) if row else sorted(rows)
+        self.resumed_units += len(rows)
+        return [json.loads(rows[y]) for y in years if rows.get(y)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,185 @@
+import json
+import os
+import time
+
+from record_table import RecordTable
+
+
+CATEGORIES = ('Continent', 'Region', 'Country')
+
+
+class EntityIndex:
+    """站点项目索引 (JSON 文件)：类别 -> 名称 -> 详情页 URL 与已知的 {年份: 年份页面 URL}
+
+    名称按站点列表中的顺序保存。索引由基础页面 (refresh_entities) 和抓取到的记录
+    (observe，可直接作为 sink) 逐步补全，目标抓取据此跳过基础页面与详情页。
+    path 为 None 时只在内存中使用，save() 不写文件。
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.entities = {}
+        self.updated_at = None
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entities = data.get('entities', {})
+            self.updated_at = data.get('updated_at')
+        self._dirty = False
+
+    def __len__(self):
+        return sum(len(names) for names in self.entities.values())
+
+    def detail_url(self, category, name):
+        entry = self.entities.get(category, {}).get(name)
+        return entry['url'] if entry else None
+
+    def year_urls(self, category, name):
+        entry = self.entities.get(category, {}).get(name)
+        return dict(entry['years']) if entry else {}
+
+    def names(self, category):
+        return list(self.entities.get(category, {}))
+
+    def refresh_entities(self, entities):
+        """用基础页面上的 [(类别, 名称, 详情页URL)] 更新索引；站点上已不存在的项目被移除"""
+        fresh = {}
+        for category, name, url in entities:
+            old = self.entities.get(category, {}).get(name)
+            years = old['years'] if old and old['url'] == url else {}
+            fresh.setdefault(category, {})[name] = {'url': url, 'years': years}
+        self.entities = fresh
+        self._dirty = True
+
+    def observe(self, record):
+        """从记录中学习年份页面 URL (可直接作为 sink)"""
+        entry = self.entities.get(record['Category'], {}).get(record['Name'])
+        url = record.get('Source URL')
+        if entry is None or not url or url.startswith('derived:'):
+            return
+        if entry['years'].get(str(record['Year'])) != url:
+            entry['years'][str(record['Year'])] = url
+            self._dirty = True
+
+    def save(self):
+        """原子地写回索引文件 (没有变化时不写)"""
+        if not self._dirty or self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.updated_at = time.time()
+        partial = self.path + '.partial'
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': self.updated_at, 'entities': self.entities}, f, ensure_ascii=False, indent=1)
+        os.replace(partial, self.path)
+        self._dirty = False
+
+
+class CrawlPlan:
+    """目标抓取计划：类别、名称与年份均可省略 (省略表示不限)
+
+    names 按不区分大小写的完整名称匹配；resolve() 按 (计划中的类别顺序, 站点顺序) 给出目标项目。
+    """
+    def __init__(self, categories=None, names=None, years=None):
+        self.categories = list(categories) if categories else list(CATEGORIES)
+        unknown = [c for c in self.categories if c not in CATEGORIES]
+        if unknown:
+            raise ValueError(f"未知的类别: {', '.join(unknown)} (可选: {', '.join(CATEGORIES)})")
+        self.names = list(names) if names else None
+        self.years = [str(y) for y in years] if years else None
+        self._targets = None # {类别: [名称]}，由 from_targets 设置
+
+    @classmethod
+    def from_targets(cls, targets, years=None):
+        """由 {类别: [名称, ...]} 构造 (run_test_scrape 的写法)；每个类别只匹配自己列出的名称"""
+        plan = cls(list(targets), [n for names in targets.values() for n in names], years)
+        plan._targets = {category: list(names) for category, names in targets.items()}
+        return plan
+
+    @classmethod
+    def from_args(cls, category=None, names=None, years=None):
+        """由命令行参数构造：category 与 names、years 均为逗号分隔的字符串"""
+        def split(text):
+            return [part.strip() for part in text.split(',') if part.strip()] if text else None
+        return cls(split(category), split(names), split(years))
+
+    def _wanted(self, category):
+        if self._targets is not None:
+            return {n.lower() for n in self._targets.get(category, [])}
+        return {n.lower() for n in self.names} if self.names is not None else None
+
+    def resolve(self, site_names):
+        """site_names 为 {类别: [名称 (站点顺序)]}；返回 ([(类别, 名称)], 没有匹配到任何项目的名称列表)"""
+        resolved, matched = [], set()
+        for category in self.categories:
+            wanted = self._wanted(category)
+            for name in site_names.get(category, []):
+                if wanted is None or name.lower() in wanted:
+                    resolved.append((category, name))
+                    matched.add(name.lower())
+        unmatched = [n for n in (self.names or []) if n.lower() not in matched]
+        return resolved, unmatched
+
+    def describe(self):
+        return (f"类别: {', '.join(self.categories)}；名称: {', '.join(self.names) if self.names else '全部'}；"
+                f"年份: {', '.join(self.years) if self.years else '全部'}")
+
+
+def run_crawl_plan(collector, base_url, plan, index=None, sink=None, keep_records=True, refresh=False, label='目标'):
+    """按计划只抓取需要的页面，返回记录列表 (sink/keep_records 的含义同 collect_data)
+
+    - 索引中已有全部目标项目时不请求基础页面 (refresh=True 或有名称匹配不到时才刷新索引)；
+    - 指定了年份且索引中已知这些年份的页面 URL 时，直接请求年份页面，不请求详情页；
+    - 其余情况按原有流程请求详情页 (同时把新的年份 URL 记入索引)。
+    """
+    all_data = RecordTable()
+    record_count = 0
+    print(f"开始从 {base_url} 进行{label}数据收集 ({plan.describe()})...")
+
+    need_base = index is None or refresh or not len(index)
+    if not need_base:
+        resolved, unmatched = plan.resolve({category: index.names(category) for category in CATEGORIES})
+        need_base = bool(unmatched) or not resolved # 有名称匹配不到时，可能是索引已过期
+    if need_base:
+        soup = collector._get_page_data(base_url)
+        if not soup:
+            print(f"错误：无法获取基础页面，{label}抓取终止。")
+            return all_data
+        entities = list(collector._iter_entities(soup))
+        if index is None:
+            index = EntityIndex() # 只在内存中使用
+        index.refresh_entities(entities)
+        resolved, unmatched = plan.resolve({category: index.names(category) for category in CATEGORIES})
+    if unmatched:
+        print(f"警告：站点上没有找到这些名称: {', '.join(unmatched)}")
+
+    for i, (category_name, name) in enumerate(resolved, start=1):
+        url = index.detail_url(category_name, name)
+        known = index.year_urls(category_name, name)
+        print(f"  ({i}/{len(resolved)}) [{label}] 正在获取 {category_name}-{name} 的数据"
+              f"{' (年份: ' + ', '.join(plan.years) + ')' if plan.years else ''}...")
+        try:
+            if plan.years and all(year in known for year in plan.years):
+                # 索引中已知全部目标年份的 URL：直接请求年份页面，跳过详情页
+                order = list(known) # 年份按首次见到时的页面顺序
+                data = [r for r in (collector._extract_year_data(known[year], category_name, name, year)
+                                    for year in sorted(plan.years, key=order.index))
+                        if r]
+            else:
+                data = collector._process_detail_page(url, category_name, name, target_years=plan.years)
+            if data:
+                record_count += collector._emit(data, all_data, sink, keep_records)
+                for record in data:
+                    index.observe(record)
+            else:
+                print(f"  [{label}] 注意：未从 {category_name}-{name} 获取到数据。")
+        except KeyboardInterrupt:
+            print(f"\n用户中断{label}操作。")
+            break
+        except Exception as e:
+            print(f"  [{label}] 严重错误：处理 {category_name}-{name} ({url}) 时发生意外错误: {e}")
+            continue
+
+    index.save()
+    print(f"\n{label}数据收集完毕，共收集到 {record_count} 条记录。")
+    return all_data
@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+
+# 直方图桶上限 (秒)；与 Prometheus 默认桶相近，覆盖本地缓存命中到慢速重试
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+ENTITY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+METRIC_PREFIX = 'ewaste_crawl'
+
+
+class Histogram:
+    """固定桶直方图：内存占用与观测次数无关，可直接导出为 Prometheus histogram"""
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # 最后一个为 +Inf 桶
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """按桶内线性插值估计分位数 (落在 +Inf 桶时返回最大的有限桶上限)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= target:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (target - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': _round(self.quantile(0.5)),
+            'p90': _round(self.quantile(0.9)),
+            'p99': _round(self.quantile(0.99)),
+        }
+
+    def cumulative(self):
+        """[(桶上限字符串, 累计次数), ...]，含 +Inf"""
+        result, total = [], 0
+        for bound, n in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += n
+            result.append((str(bound), total))
+        return result
+
+
+def _round(value):
+    return None if value is None else round(value, 6)
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}' if labels else ''
+
+
+class CrawlTelemetry:
+    """抓取过程的结构化指标
+
+    - 请求：按页面类型 (page / year) 统计延迟直方图、状态码、传输字节数；
+    - 重试：按原因 (throttled / server_error / network) 计数，含 urllib3 在会话内部完成的重试；
+    - 解析：按阶段 (page / year / extract) 统计耗时直方图；
+    - 项目耗时、记录数与记录/秒。
+    start() 后每隔 interval 秒把快照写入 <path>.json 与 <path>.prom (Prometheus 文本格式)，
+    close() 时写入最终结果。所有方法都是线程安全的，可在线程池与事件循环中调用。
+    """
+    def __init__(self, path=None, interval=30.0):
+        self.path = path # 不带扩展名的输出路径；None 表示只在内存中统计
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+        self.request_latency = {}  # 页面类型 -> Histogram
+        self.parse_time = {}       # 解析阶段 -> Histogram
+        self.entity_time = Histogram(ENTITY_BUCKETS)
+        self.status_counts = {}    # (页面类型, 状态码) -> 次数
+        self.bytes_received = {}   # 页面类型 -> 字节数
+        self.retries = {}          # 原因 -> 次数
+        self.records = 0
+        self.entities = 0
+
+    # --- 观测 ---
+    def observe_request(self, kind, status, latency, nbytes=0):
+        """记录一次 HTTP 请求 (status 为 None 表示连接错误或超时)"""
+        with self._lock:
+            self.request_latency.setdefault(kind, Histogram(LATENCY_BUCKETS)).observe(latency)
+            key = (kind, 'error' if status is None else str(status))
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+            self.bytes_received[kind] = self.bytes_received.get(kind, 0) + nbytes
+
+    def observe_retry(self, reason, count=1):
+        if count:
+            with self._lock:
+                self.retries[reason] = self.retries.get(reason, 0) + count
+
+    def observe_parse(self, stage, seconds):
+        with self._lock:
+            self.parse_time.setdefault(stage, Histogram(PARSE_BUCKETS)).observe(seconds)
+
+    def observe_entity(self, seconds):
+        with self._lock:
+            self.entity_time.observe(seconds)
+            self.entities += 1
+
+    def add_records(self, count):
+        with self._lock:
+            self.records += count
+
+    # --- 导出 ---
+    def snapshot(self):
+        """返回可直接序列化为 JSON 的指标快照"""
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            requests = sum(self.status_counts.values())
+            return {
+                'elapsed_seconds': round(elapsed, 3),
+                'requests': requests,
+                'requests_per_second': round(requests / elapsed, 3) if elapsed > 0 else None,
+                'records': self.records,
+                'records_per_second': round(self.records / elapsed, 3) if elapsed > 0 else None,
+                'entities': self.entities,
+                'bytes_received': dict(self.bytes_received),
+                'status_counts': {f'{kind}:{status}': n for (kind, status), n in sorted(self.status_counts.items())},
+                'retries': dict(self.retries),
+                'request_latency_seconds': {k: h.summary() for k, h in sorted(self.request_latency.items())},
+                'parse_seconds': {k: h.summary() for k, h in sorted(self.parse_time.items())},
+                'entity_seconds': self.entity_time.summary(),
+            }
+
+    def prometheus_text(self):
+        """Prometheus 文本格式 (可供 node_exporter 的 textfile collector 读取)"""
+        p = METRIC_PREFIX
+        lines = []
+
+        def histogram(name, help_text, histograms, label):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} histogram')
+            for key, h in sorted(histograms.items()):
+                labels = {label: key} if label else {}
+                for bound, total in h.cumulative():
+                    lines.append(f'{p}_{name}_bucket{_labels(**labels, le=bound)} {total}')
+                lines.append(f'{p}_{name}_sum{_labels(**labels)} {h.sum:.6f}')
+                lines.append(f'{p}_{name}_count{_labels(**labels)} {h.count}')
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{p}_{name}{_labels(**labels)} {value}')
+
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            metric('requests_total', 'counter', 'HTTP requests by page kind and status.',
+                   [({'kind': k, 'status': s}, n) for (k, s), n in sorted(self.status_counts.items())])
+            metric('response_bytes_total', 'counter', 'Response body bytes received.',
+                   [({'kind': k}, n) for k, n in sorted(self.bytes_received.items())])
+            metric('retries_total', 'counter', 'Request retries by reason.',
+                   [({'reason': r}, n) for r, n in sorted(self.retries.items())])
+            metric('records_total', 'counter', 'Records extracted.', [({}, self.records)])
+            metric('entities_total', 'counter', 'Entities (detail pages) processed.', [({}, self.entities)])
+            metric('elapsed_seconds', 'gauge', 'Seconds since the crawl started.', [({}, f'{elapsed:.3f}')])
+            metric('records_per_second', 'gauge', 'Average records extracted per second.',
+                   [({}, f'{self.records / elapsed:.3f}' if elapsed > 0 else 0)])
+            histogram('request_duration_seconds', 'HTTP request latency by page kind.', self.request_latency, 'kind')
+            histogram('parse_duration_seconds', 'Page parse time by stage.', self.parse_time, 'stage')
+            histogram('entity_duration_seconds', 'Wall time per entity.', {'': self.entity_time}, None)
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """原子地写出 <path>.json 与 <path>.prom"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        outputs = {
+            self.path + '.json': json.dumps(self.snapshot(), ensure_ascii=False, indent=2),
+            self.path + '.prom': self.prometheus_text(),
+        }
+        for path, content in outputs.items():
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(path + '.tmp', path)
+
+    # --- 周期写出 ---
+    def start(self):
+        """开始计时，并在后台线程中定期写出指标"""
+        self._started = time.monotonic()
+        if self.path and self.interval and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='crawl-telemetry', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"  警告：写入指标文件失败: {e}")
+
+    def close(self):
+        """停止后台线程并写出最终指标"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+        if self.path:
+            print(f"抓取指标已写入: {self.path}.json / {self.path}.prom")
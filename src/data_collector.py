@@ -8,13 +8,50 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import os
 import argparse # Import argparse for command-line arguments
+from rate_limiter import AdaptiveRateLimiter
+from http_cache import HttpCache
+from crawl_journal import CrawlJournal
+from fast_extract import EXTRACT_BACKENDS, check_backend, parse_year_html
+from streaming_writer import StreamingRecordWriter
+from page_archive import PageArchive, PageArchiveWriter
+from crawl_telemetry import CrawlTelemetry
+from url_planner import YearUrlPlanner
+from metric_spec import COMPILED_SPEC, parse_number
+from change_tracker import ChangeTracker, content_digest
+from recrawl_scheduler import FreshnessPolicy, RecrawlScheduler, parse_duration
+from crawl_plan import CrawlPlan, EntityIndex, run_crawl_plan
+from record_table import RecordTable
+
+BASE_DOMAIN = "https://globalewaste.org"
+
+# 输出文件的列顺序 (save_data 与流式写入器共用)
+COLUMN_ORDER = [
+    'Category', 'Name', 'Year', 'Population',
+    'E-waste Generated (kt)', 'EEE Put on Market (kt)',
+    'E-waste Formally Collected (kt)', 'E-waste Collection Rate (%)',
+    'E-waste Generated (kg/capita)', 'EEE Put on Market (kg/capita)',
+    'E-waste Imported (kt)', 'E-waste Exported (kt)',
+    'Source URL'
+]
 
 class EwasteDataCollector:
-    # --- (Keep the EwasteDataCollector class exactly as it was in the previous "production" version) ---
-    # --- (No changes needed inside this class) ---
-    def __init__(self):
+    # 抓取 globalewaste.org 国家/地区数据：顺序、异步、流水线、分片与调度等抓取方式共用的页面获取与解析逻辑
+    def __init__(self, rate_limiter=None, max_throttle_retries=5, cache=None, journal=None,
+                 extract_backend='full', recorder=None, replay=None, telemetry=None, planner=None, changes=None):
         """初始化数据收集器"""
         self.session = self._create_session()
+        # 所有请求 (同步/异步、完整/测试模式) 都经过同一个自适应限速器
+        self.rate_limiter = rate_limiter if rate_limiter is not None else AdaptiveRateLimiter()
+        self.max_throttle_retries = max_throttle_retries
+        self.cache = cache # 可选的 HttpCache，为 None 时每次都完整下载
+        self.journal = journal # 可选的 CrawlJournal，记录已完成的 (类别, 名称, 年份) 单元
+        check_backend(extract_backend)
+        self.extract_backend = extract_backend # 年份页面的解析后端，见 fast_extract.EXTRACT_BACKENDS
+        self.recorder = recorder # 可选的 PageArchiveWriter，录制所有原始响应
+        self.replay = replay     # 可选的 PageArchive，设置后所有页面都从归档回放
+        self.telemetry = telemetry # 可选的 CrawlTelemetry，记录请求延迟、字节数、重试与解析耗时
+        self.planner = planner # 可选的 YearUrlPlanner，学习年份 URL 规律后跳过重复的页面请求
+        self.changes = changes # 可选的 ChangeTracker，年份页面正文未变化时跳过解析
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3', # 使用常见的 User-Agent
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -25,12 +62,12 @@ class EwasteDataCollector:
         }
 
     def _create_session(self):
-        """创建带有重试机制的会话"""
+        """创建带有重试机制的会话 (429/503 交给限速器处理，以便它据此降速)"""
         session = requests.Session()
         retry = Retry(
             total=5,              # 总重试次数
             backoff_factor=1,     # 重试间隔时间指数增长因子 (1s, 2s, 4s, 8s, 16s)
-            status_forcelist=[429, 500, 502, 503, 504], # 增加 429 Too Many Requests
+            status_forcelist=[500, 502, 504],
             allowed_methods=frozenset(['GET', 'POST']) # 明确允许的方法
         )
         adapter = HTTPAdapter(max_retries=retry)
@@ -39,135 +76,422 @@ class EwasteDataCollector:
         return session
 
     def _extract_number(self, text):
-        """从文本中提取数字，处理 'n/a' 和潜在错误"""
-        if not text:
-            return None
-        text_cleaned = text.strip().lower()
-        if text_cleaned == 'n/a':
-            return 'n/a' # 保留 n/a 作为一个明确的值
-        text_cleaned = text_cleaned.replace(',', '')
-        try:
-            # 尝试提取浮点数
-            num_str = ''.join(filter(lambda x: x.isdigit() or x == '.', text_cleaned))
-            if num_str: # 确保过滤后还有内容
-                 # 检查是否只有一个小数点
-                if num_str.count('.') <= 1:
-                    return float(num_str)
-                else:
-                    # 如果有多个小数点，可能是错误数据，尝试只取第一部分
-                    parts = num_str.split('.')
-                    valid_num_str = parts[0] + '.' + parts[1] if len(parts) > 1 else parts[0]
-                    return float(valid_num_str)
-
-            else: # 如果过滤后为空 (例如只有 '%')
-                 return None
+        """从文本中提取数字，处理 'n/a' 和潜在错误 (见 metric_spec.parse_number)"""
+        return parse_number(text)
 
-        except ValueError:
-             # print(f"  警告：无法将文本 '{text}' 解析为数字。") # 在生产模式中可以注释掉详细警告
-             return None # 解析失败返回 None
-        except Exception as e:
-            print(f"  警告：提取数字时发生意外错误 '{text}': {e}")
-            return None
 
-
-    def _get_page_data(self, url):
-        """获取并解析页面数据"""
+    def _request(self, url, extra_headers=None, kind='page'):
+        """经限速器发送 GET 请求；被限流 (429/503) 时由限速器降速后重试"""
+        headers = dict(self.headers, **extra_headers) if extra_headers else self.headers
+        telemetry = self.telemetry
+        for attempt in range(self.max_throttle_retries + 1):
+            self.rate_limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = self.session.get(url, headers=headers, timeout=20) # 增加超时时间
+            except requests.exceptions.RequestException:
+                latency = time.monotonic() - start
+                self.rate_limiter.record(None, latency)
+                if telemetry is not None:
+                    telemetry.observe_request(kind, None, latency)
+                raise
+            latency = time.monotonic() - start
+            throttled = self.rate_limiter.record(response.status_code, latency,
+                                                 response.headers.get('Retry-After'))
+            if telemetry is not None:
+                telemetry.observe_request(kind, response.status_code, latency, len(response.content))
+                self._observe_session_retries(response)
+                if throttled:
+                    telemetry.observe_retry('throttled')
+            if not throttled:
+                break
+            print(f"  注意：请求被限流 ({response.status_code})，降速后重试 {url} -> {self.rate_limiter}")
+        return response
+
+    def _observe_session_retries(self, response):
+        """统计 urllib3 在会话内部完成的重试 (500/502/504 与连接错误)，这些重试不会经过 _request 的循环"""
+        retries = getattr(response.raw, 'retries', None)
+        for attempt in getattr(retries, 'history', None) or ():
+            self.telemetry.observe_retry('server_error' if attempt.status else 'network')
+
+    def _fetch_html(self, url, kind='page'):
+        """获取页面 HTML 文本；启用缓存时先做条件请求，304 直接使用缓存正文"""
+        if self.replay is not None: # 回放模式：只从归档读取，不访问网络
+            return self.replay.get_text(url)
+        if self.cache is not None and self.cache.cache_only:
+            return self.cache.lookup_offline(url)
+
+        entry = self.cache.get(url) if self.cache is not None else None
         try:
-            response = self.session.get(url, headers=self.headers, timeout=20) # 增加超时时间
-            response.raise_for_status() # 检查 HTTP 错误 (如 404, 403)
+            response = self._request(url, self.cache.conditional_headers(entry) if entry else None, kind)
+            if response.status_code == 304 and entry is not None:
+                text = self.cache.revalidated_text(entry)
+                self._archive_response(url, 200, response.headers, text.encode('utf-8'), 'utf-8')
+                return text
             # 显式指定编码，如果网站未正确声明
             response.encoding = response.apparent_encoding if response.encoding is None else response.encoding
-            return BeautifulSoup(response.text, 'html.parser')
+            self._archive_response(url, response.status_code, response.headers, response.content, response.encoding)
+            response.raise_for_status() # 检查 HTTP 错误 (如 404, 403)
+            text = response.text
         except requests.exceptions.Timeout:
              print(f"  错误：请求超时 {url}")
              return None
         except requests.exceptions.RequestException as e:
             print(f"  错误：获取页面数据失败 {url}, 错误: {e}")
             return None
+
+        if self.cache is not None:
+            self.cache.store(url, response.headers, text)
+        return text
+
+    def _archive_response(self, url, status, headers, body, encoding):
+        """录制模式下把响应写入归档 (304 时写入缓存中的正文，保证归档可以独立回放)"""
+        if self.recorder is not None:
+            self.recorder.record(url, status, headers, body, encoding)
+
+    def _get_page_data(self, url):
+        """获取并解析页面数据"""
+        text = self._fetch_html(url)
+        if text is None:
+            return None
+        try:
+            start = time.perf_counter()
+            soup = BeautifulSoup(text, 'html.parser')
+            if self.telemetry is not None:
+                self.telemetry.observe_parse('page', time.perf_counter() - start)
+            return soup
         except Exception as e:
              print(f"  错误：解析页面时发生未知错误 {url}: {e}")
              return None
 
-    def collect_data(self, base_url):
-        """收集所有类别、所有项目、所有年份的电子废弃物数据 (生产模式)"""
-        all_data = []
-        print(f"开始从 {base_url} 收集数据 (完整模式)...")
-        soup = self._get_page_data(base_url)
-        if not soup:
-            print("错误：无法获取基础页面，收集终止。")
-            return all_data
+    def _parse_year_text(self, text, url):
+        """按 extract_backend 解析年份页面 (fast/lxml 只解析需要的子树)"""
+        try:
+            start = time.perf_counter()
+            soup = parse_year_html(text, self.extract_backend)
+            if self.telemetry is not None:
+                self.telemetry.observe_parse('year', time.perf_counter() - start)
+            return soup
+        except Exception as e:
+             print(f"  错误：解析页面时发生未知错误 {url}: {e}")
+             return None
 
-        # 获取所有分类
-        categories = {
+    def _unchanged_year_record(self, text, url, category, name, year):
+        """变更检测：返回 (正文哈希, 是否未变化, 上次的记录)；未启用 changes 时哈希为 None"""
+        if self.changes is None:
+            return None, False, None
+        digest = content_digest(text)
+        unchanged, record = self.changes.lookup_page(url, digest, category, name, year)
+        return digest, unchanged, record
+
+    def _absolute_url(self, href):
+        """将站内相对链接补全为绝对 URL"""
+        if href.startswith('http'):
+            return href
+        if not href.startswith('/'):
+            href = '/' + href
+        return BASE_DOMAIN + href
+
+    def _get_category_lists(self, soup):
+        """从基础页面中找到 Continent/Region/Country 三个列表元素 (可能为 None)"""
+        return {
             'Continent': soup.find('ul', id='continent-list'),
             'Region': soup.find('ul', id='region-list'),
             'Country': soup.find('ul', id='country-list')
         }
 
-        total_items_to_process = sum(len(lst.find_all('a')) for lst in categories.values() if lst)
-        processed_items_count = 0
-        print(f"总共需要处理约 {total_items_to_process} 个项目。")
-
-
-        for category_name, category_list in categories.items():
+    def _iter_entities(self, soup, targets=None):
+        """按 collect_data 的顺序列出 (类别, 名称, 详情页URL)"""
+        for category_name, category_list in self._get_category_lists(soup).items():
             if not category_list:
                 print(f"未找到类别列表: {category_name}")
                 continue
-
-            links = category_list.find_all('a')
-            print(f"\n正在处理 {category_name}，共找到 {len(links)} 个项目")
-
-            for i, link in enumerate(links):
-                processed_items_count += 1
+            if targets is not None and category_name not in targets:
+                continue
+            for link in category_list.find_all('a'):
                 name = link.text.strip()
+                if targets is not None and name not in targets[category_name]:
+                    continue
                 detail_url = link.get('href')
-
                 if not detail_url:
-                     print(f"  警告：跳过项目 '{name}'，因为链接为空。")
-                     continue
+                    print(f"  警告：跳过项目 '{name}'，因为链接为空。")
+                    continue
+                yield category_name, name, self._absolute_url(detail_url)
+
+    def _emit(self, records, all_data, sink=None, keep_records=True):
+        """把一个项目的记录交给 sink (如流式写入器)，并按需累积到 all_data；返回记录数"""
+        if sink is not None:
+            for record in records:
+                sink(record)
+        if keep_records:
+            all_data.extend(records)
+        if self.telemetry is not None:
+            self.telemetry.add_records(len(records))
+        return len(records)
+
+    def collect_data(self, base_url, sink=None, keep_records=True, targets=None):
+        """收集所有类别、所有项目、所有年份的电子废弃物数据 (生产模式)
+
+        sink 不为 None 时，每个项目的记录提取完成后立即逐条交给 sink(record)；
+        keep_records=False 时不在内存中累积记录 (返回空列表)，内存占用与抓取规模无关。
+        targets 为 {类别: [名称, ...]} 时只抓取其中列出的项目。
+        """
+        all_data = RecordTable()
+        record_count = 0
+        print(f"开始从 {base_url} 收集数据 (完整模式)...")
+        soup = self._get_page_data(base_url)
+        if not soup:
+            print("错误：无法获取基础页面，收集终止。")
+            return all_data
+
+        # 获取所有项目 (与 collect_data_async / 流水线使用同一份类别与名称筛选)
+        entities = list(self._iter_entities(soup, targets))
+        per_category = {}
+        for category_name, _, _ in entities:
+            per_category[category_name] = per_category.get(category_name, 0) + 1
+        total_items_to_process = len(entities)
+        print(f"总共需要处理约 {total_items_to_process} 个项目。")
 
-                if not detail_url.startswith('http'):
-                    base_domain = "https://globalewaste.org"
-                    if not detail_url.startswith('/'):
-                        detail_url = '/' + detail_url
-                    detail_url = base_domain + detail_url
+        current_category = None
+        for processed_items_count, (category_name, name, detail_url) in enumerate(entities, 1):
+            if category_name != current_category:
+                current_category = category_name
+                print(f"\n正在处理 {category_name}，共找到 {per_category[category_name]} 个项目")
 
-                print(f"  ({processed_items_count}/{total_items_to_process}) 正在获取 {category_name}-{name} 的数据...")
+            print(f"  ({processed_items_count}/{total_items_to_process}) 正在获取 {category_name}-{name} 的数据...")
 
+            try:
+                # 处理该项目的所有年份数据 - 注意这里调用没有 target_years
+                data = self._process_detail_page(detail_url, category_name, name)
+                if data:
+                    record_count += self._emit(data, all_data, sink, keep_records)
+                # else:
+                     # print(f"  注意：未从 {category_name}-{name} 获取到任何年份数据。") # 生产模式可以减少日志
+            except KeyboardInterrupt:
+                 print("\n用户中断操作。")
+                 return all_data
+            except Exception as e:
+                print(f"  严重错误：处理 {category_name}-{name} ({detail_url}) 数据时发生意外错误: {e}")
+                continue
+
+        print(f"\n所有类别处理完毕，共收集到 {record_count} 条记录。")
+        return all_data
+
+    def collect_data_scheduled(self, base_url, scheduler, sink=None, keep_records=True):
+        """按新鲜度调度抓取：只在请求预算内重抓到期的 (类别, 名称, 年份) 单元 (见 RecrawlScheduler)
+
+        启用了变更检测 (self.changes) 时，本次没有重抓的单元从其基线中补全，输出仍是完整数据集。
+        """
+        all_data = RecordTable()
+        record_count = 0
+        print(f"开始从 {base_url} 收集数据 (调度模式，预算 {scheduler.budget} 个请求)...")
+        soup = self._get_page_data(base_url)
+        if not soup:
+            print("错误：无法获取基础页面，收集终止。")
+            return all_data
+
+        plan = scheduler.plan(list(self._iter_entities(soup)))
+        stats = scheduler.stats()
+        print(f"到期单元 {stats['due_units']} 个，本次安排 {stats['planned_units']} 个 "
+              f"(约 {stats['planned_requests']} 个请求)，推迟 {stats['deferred_units']} 个。")
+        refreshed = set()
+        try:
+            for i, (category_name, name, detail_url, years, discover) in enumerate(plan, start=1):
+                if discover:
+                    years, detail_soup = self._discover_new_years(detail_url, category_name, name, years,
+                                                                  scheduler.known_years(category_name, name))
+                    if years is None:
+                        continue # 详情页获取失败：不登记，下次运行仍然到期
+                    if not years:
+                        scheduler.mark_checked(category_name, name, [], discovered=True)
+                        continue # 没有新年份，也没有到期的年份
+                else:
+                    detail_soup = None
+                print(f"  ({i}/{len(plan)}) 正在获取 {category_name}-{name} 的数据"
+                      f"{' (年份: ' + ', '.join(years) + ')' if years else ''}...")
                 try:
-                    # 处理该项目的所有年份数据 - 注意这里调用没有 target_years
-                    data = self._process_detail_page(detail_url, category_name, name)
-                    if data:
-                        all_data.extend(data)
-                    # else:
-                         # print(f"  注意：未从 {category_name}-{name} 获取到任何年份数据。") # 生产模式可以减少日志
-                    time.sleep(1.5) # 保持休眠
-                except KeyboardInterrupt:
-                     print("\n用户中断操作。")
-                     return all_data
+                    data = self._process_detail_page(detail_url, category_name, name, target_years=years,
+                                                     soup=detail_soup)
                 except Exception as e:
                     print(f"  严重错误：处理 {category_name}-{name} ({detail_url}) 数据时发生意外错误: {e}")
                     continue
+                if not data:
+                    continue # 获取失败 (或没有数据)：不登记，下次运行仍然到期
+                # 只登记确实拿到数据的年份；获取失败的年份保持到期，下次运行重试
+                checked = sorted({str(record['Year']) for record in data}, reverse=True)
+                scheduler.mark_checked(category_name, name, checked, discovered=discover or years is None)
+                refreshed.update((category_name, name, str(year)) for year in checked)
+                record_count += self._emit(data, all_data, sink, keep_records)
+        except KeyboardInterrupt:
+            print("\n用户中断操作。")
+            return all_data
+
+        if self.changes is not None:
+            carried = [r for r in self.changes.baseline_records()
+                       if (r['Category'], r['Name'], str(r['Year'])) not in refreshed]
+            print(f"从变更检测基线补全 {len(carried)} 条未到期的记录。")
+            record_count += self._emit(carried, all_data, sink, keep_records)
+        print(f"\n调度抓取完毕，共输出 {record_count} 条记录。")
+        return all_data
 
-        print(f"\n所有类别处理完毕，共收集到 {len(all_data)} 条记录。")
+    def _discover_new_years(self, detail_url, category, name, years, known_years):
+        """请求详情页，返回 (到期年份加上页面上尚未见过的年份 (从新到旧), 详情页)；详情页获取失败时年份为 None
+
+        返回的详情页交给 _process_detail_page 复用，同一详情页只请求一次。
+        """
+        soup = self._get_page_data(detail_url)
+        if not soup:
+            return None, None
+        new_years = [year for year, _ in self._get_year_links(soup, category, name) if year not in known_years]
+        if new_years:
+            print(f"    发现 {category}-{name} 的新年份: {', '.join(new_years)}")
+        return sorted(set(years) | set(new_years), reverse=True), soup
+
+    def collect_data_async(self, base_url, concurrency=16, per_host=4, host_delay=0.0, sink=None, keep_records=True,
+                           targets=None):
+        """并发抓取所有数据 (异步模式)，产出的记录与 collect_data 相同 (sink 也按相同顺序收到记录)"""
+        from async_crawler import AsyncCrawler # 延迟导入，顺序模式无需安装 aiohttp
+        print(f"开始从 {base_url} 收集数据 (异步模式，并发 {concurrency})...")
+        crawler = AsyncCrawler(self, concurrency=concurrency, per_host=per_host, host_delay=host_delay)
+        all_data = crawler.run(base_url, targets=targets, sink=sink, keep_records=keep_records)
+        print(f"\n所有类别处理完毕，共收集到 {crawler.record_count} 条记录。")
+        return all_data
+
+    def collect_data_pipeline(self, base_url, fetch_workers=8, parse_workers=None, fetch_queue_size=64,
+                              parse_inflight=None, sink=None, keep_records=True, targets=None):
+        """以 抓取 -> 多进程解析 -> 写入 流水线方式收集所有数据，返回的记录与 collect_data 相同
+
+        注意：sink 按解析完成的顺序收到记录，返回值则按 collect_data 的顺序排列。
+        """
+        from pipeline import CrawlPipeline
+        print(f"开始从 {base_url} 收集数据 (流水线模式)...")
+        crawl_pipeline = CrawlPipeline(self, fetch_workers=fetch_workers, parse_workers=parse_workers,
+                                       fetch_queue_size=fetch_queue_size, parse_inflight=parse_inflight,
+                                       sink=sink, keep_records=keep_records)
+        all_data = crawl_pipeline.run(base_url, targets=targets)
+        print(f"\n所有类别处理完毕，共收集到 {crawl_pipeline.record_count} 条记录。")
         return all_data
 
-    def _process_detail_page(self, url, category, name, target_years=None): # 保持 target_years 参数
-        """处理详情页数据，获取指定年份或所有年份数据"""
+    def collect_data_sharded(self, base_url, queue_path, workers=4, worker_options=None, resume=False,
+                             lease_seconds=300.0, sink=None, keep_records=True, targets=None):
+        """多进程分片抓取：项目与年份单元放入共享的带租约工作队列，由 workers 个进程并行处理
+
+        worker_options 为创建 worker 端收集器的参数 (见 sharded_crawl.build_worker_collector)；
+        其他主机可以用 --join 加入同一个队列。全部完成后按 collect_data 的顺序合并记录并交给 sink。
+        """
+        from sharded_crawl import run_sharded
+        print(f"开始从 {base_url} 收集数据 (分片模式，{workers} 个本地 worker，队列 {queue_path})...")
+        all_data = run_sharded(self, base_url, queue_path, workers=workers, worker_options=worker_options,
+                               resume=resume, lease_seconds=lease_seconds, targets=targets)
+        record_count = self._emit(all_data, [], sink, keep_records=False)
+        print(f"\n所有类别处理完毕，共收集到 {record_count} 条记录。")
+        return RecordTable(all_data) if keep_records else []
+
+    def _process_detail_page(self, url, category, name, target_years=None, soup=None): # 保持 target_years 参数
+        """处理详情页数据，获取指定年份或所有年份数据；soup 为调用方已获取的详情页 (不再重复请求)"""
+        resumed = self._resume_entity(category, name, target_years)
+        if resumed is not None:
+            return resumed
+
+        started = time.monotonic()
         data_list = []
-        soup = self._get_page_data(url)
+        # 规划器已学到年份 URL 模板时，直接请求目标年份页面，跳过详情页
+        direct_links = (self.planner.direct_links(url, target_years)
+                        if self.planner is not None and soup is None else None)
+        planned = {} # 年份 -> (URL, 记录)，按模板直接获取的结果
+        if direct_links:
+            for year, year_url in direct_links:
+                try:
+                    planned[year] = (year_url, self._extract_year_data(year_url, category, name, year))
+                except Exception:
+                    planned[year] = (year_url, None)
+            if all(record for _, record in planned.values()):
+                data_list = [planned[year][1] for year, _ in direct_links]
+                if self.telemetry is not None:
+                    self.telemetry.observe_entity(time.monotonic() - started)
+                return data_list
+            self.planner.record_fallback() # 模板未命中：回退到详情页流程，已获取的年份不再重复请求
+
+        if soup is None:
+            soup = self._get_page_data(url)
         if not soup:
             # print(f"  警告：无法获取 {category}-{name} 的详情页 {url}，跳过此项目。") # 生产模式减少日志
             return data_list
 
+        year_links = self._get_year_links(soup, category, name, target_years)
+        reuse_year = self.planner.reusable_year(url, year_links, soup) if self.planner is not None else None
+        records_by_year = {}
+        for year, year_url in year_links:
+            try:
+                planned_url, planned_record = planned.get(year, (None, None))
+                if planned_record and planned_url == year_url:
+                    year_data = planned_record
+                else:
+                    year_data = self._reuse_detail_record(soup, year_url, category, name, year) if year == reuse_year else None
+                    if year_data is None:
+                        year_data = self._extract_year_data(year_url, category, name, year)
+                if year_data:
+                    data_list.append(year_data)
+                    records_by_year[year] = year_data
+
+            except KeyboardInterrupt:
+                 raise
+            except Exception as loop_e:
+                 print(f"    错误：处理 {category}-{name} 年份 {year} ({year_url}) 时出错: {loop_e}")
+                 continue
+
+        self._checkpoint_entity(category, name, year_links, target_years)
+        self._learn_year_urls(soup, url, category, name, year_links, records_by_year)
+        if self.telemetry is not None:
+            self.telemetry.observe_entity(time.monotonic() - started)
+        # print(f"    完成处理 {category}-{name}，获取到 {len(data_list)} 个年份的数据。") # 生产模式减少日志
+        return data_list
+
+    def _reuse_detail_record(self, soup, year_url, category, name, year):
+        """详情页展示的年份：直接用详情页的解析结果构建记录，等价于不再请求年份页面的 _extract_year_data
+
+        返回 None 表示详情页上没有数据 (或日志中该单元没有数据)，此时调用方仍以年份页面为准。
+        """
+        if self.journal is not None:
+            done, record = self.journal.get_unit(category, name, year)
+            if done:
+                return record
+        record = self._parse_year_page(soup, year_url, category, name, year)
+        if record is not None and self.journal is not None:
+            self.journal.record_unit(category, name, year, year_url, record)
+        return record
+
+    def _learn_year_urls(self, soup, url, category, name, year_links, records_by_year):
+        """学习阶段：把按原有流程抓取的项目交给 URL 规划器"""
+        if self.planner is not None and self.planner.learning:
+            detail_record = self._parse_year_page(soup, url, category, name, None)
+            self.planner.observe(url, detail_record, year_links, records_by_year)
+
+    def _resume_entity(self, category, name, target_years=None):
+        """续跑时，若该项目已在检查点日志中全部完成，则直接返回其记录；否则返回 None"""
+        if self.journal is None or target_years or not self.journal.is_entity_done(category, name):
+            return None
+        return self.journal.entity_records(category, name)
+
+    def _checkpoint_entity(self, category, name, year_links, target_years=None):
+        """项目的所有年份单元都已写入日志时，将项目标记为完成"""
+        if self.journal is None or target_years or not year_links:
+            return
+        completed = self.journal.completed_years(category, name)
+        if all(year in completed for year, _ in year_links):
+            self.journal.mark_entity_done(category, name, [year for year, _ in year_links])
+
+    def _get_year_links(self, soup, category, name, target_years=None):
+        """从详情页中解析年份链接，返回 [(年份, 年份页面URL), ...]，顺序与页面一致"""
+        year_links = []
         try:
             year_links_all = soup.find_all('a', class_='yclick')
             if not year_links_all:
                  # print(f"  注意：在 {category}-{name} 页面未找到年份链接 ('a.yclick')。") # 生产模式减少日志
-                 return data_list
+                 return year_links
         except Exception as find_err:
             print(f"  错误：查找 {category}-{name} 的年份链接时出错: {find_err}")
-            return data_list
+            return year_links
 
         # --- 年份筛选逻辑 ---
         if target_years:
@@ -177,55 +501,64 @@ class EwasteDataCollector:
                       year_links_to_process.append(link)
             if not year_links_to_process:
                  print(f"    注意：在 {category}-{name} 未找到目标年份 {target_years} 的链接。")
-                 return data_list # 没有找到目标年份，直接返回
+                 return year_links # 没有找到目标年份，直接返回
             # print(f"    找到 {len(year_links_to_process)}/{len(year_links_all)} 个目标年份链接。") # 测试时可以取消注释
         else:
             year_links_to_process = year_links_all # 处理所有年份
             # print(f"    找到 {len(year_links_to_process)} 个年份链接，开始处理...") # 生产模式减少日志
 
+        for year_link in year_links_to_process:
+            if not hasattr(year_link, 'text') or not hasattr(year_link, 'get'):
+                # print(f"    警告：跳过无效的年份链接元素 (非 Tag 对象): {year_link}") # 生产模式减少日志
+                continue
 
-        for i, year_link in enumerate(year_links_to_process):
-            try:
-                if not hasattr(year_link, 'text') or not hasattr(year_link, 'get'):
-                    # print(f"    警告：跳过无效的年份链接元素 (非 Tag 对象): {year_link}") # 生产模式减少日志
-                    continue
-
-                year = year_link.text.strip()
-                year_url_path = year_link.get('href')
-
-                if not year or not year_url_path:
-                     # print(f"    警告：跳过无效的年份链接 (年份: '{year}', 链接路径: '{year_url_path}')") # 生产模式减少日志
-                     continue
-
-                if not year_url_path.startswith('http'):
-                    base_domain = "https://globalewaste.org"
-                    if not year_url_path.startswith('/'):
-                         year_url_path = '/' + year_url_path
-                    year_url = base_domain + year_url_path
-                else:
-                     year_url = year_url_path
-
-                year_data = self._extract_year_data(year_url, category, name, year)
-                if year_data:
-                    data_list.append(year_data)
-                time.sleep(1) # 保持休眠
+            year = year_link.text.strip()
+            year_url_path = year_link.get('href')
 
-            except KeyboardInterrupt:
-                 raise
-            except Exception as loop_e:
-                 print(f"    错误：处理 {category}-{name} 年份链接 ({year_link.prettify() if hasattr(year_link, 'prettify') else year_link}) 时出错: {loop_e}")
+            if not year or not year_url_path:
+                 # print(f"    警告：跳过无效的年份链接 (年份: '{year}', 链接路径: '{year_url_path}')") # 生产模式减少日志
                  continue
 
-        # print(f"    完成处理 {category}-{name}，获取到 {len(data_list)} 个年份的数据。") # 生产模式减少日志
-        return data_list
+            year_links.append((year, self._absolute_url(year_url_path)))
+
+        return year_links
 
     def _extract_year_data(self, url, category, name, year):
         """提取给定年份页面的具体数据"""
-        soup = self._get_page_data(url)
-        if not soup:
-             # print(f"      警告：无法获取 {category}-{name} 年份 {year} 的页面 {url}") # 生产模式减少日志
-             return None
+        if self.journal is not None:
+            done, record = self.journal.get_unit(category, name, year)
+            if done:
+                return record
 
+        text = self._fetch_html(url, kind='year')
+        if text is None:
+             # print(f"      警告：无法获取 {category}-{name} 年份 {year} 的页面 {url}") # 生产模式减少日志
+             return None # 获取失败不写入日志，续跑时会重试
+        parsed, record = self._record_from_year_text(text, url, category, name, year)
+        if not parsed:
+            return None
+        if self.journal is not None:
+            self.journal.record_unit(category, name, year, url, record)
+        return record
+
+    def _record_from_year_text(self, text, url, category, name, year):
+        """由年份页面正文得到记录：返回 (是否解析成功, 记录)；正文未变化时直接使用上次的记录"""
+        digest, unchanged, record = self._unchanged_year_record(text, url, category, name, year)
+        if unchanged:
+            return True, record
+        soup = self._parse_year_text(text, url)
+        if not soup:
+            return False, None
+        start = time.perf_counter()
+        record = self._parse_year_page(soup, url, category, name, year)
+        if self.telemetry is not None:
+            self.telemetry.observe_parse('extract', time.perf_counter() - start)
+        if digest is not None:
+            self.changes.remember_page(url, digest, record)
+        return True, record
+
+    def _parse_year_page(self, soup, url, category, name, year):
+        """从已解析的年份页面中构建一条记录 (同步与异步抓取共用)"""
         data = {
             'Category': category,
             'Name': name,
@@ -256,265 +589,28 @@ class EwasteDataCollector:
         return data
 
     def _extract_metrics(self, soup, data):
-        """从页面中提取各个指标数据"""
-        processed_titles = set()
-        
-        # print("\n=== 开始提取指标数据 ===")
-        # print(f"当前URL: {data.get('Source URL', 'Unknown')}")
-        
-        # 分别处理upper-part和bottom-part
-        upper_part = soup.find('div', class_='upper-part')
-        bottom_part = soup.find('div', class_='bottom-part upper-part row')
-        
-        # print("\n--- 页面结构检查 ---")
-        # print(f"找到upper-part: {upper_part is not None}")
-        # print(f"找到bottom-part: {bottom_part is not None}")
-        
-        # if upper_part:
-        #     print("\n--- upper-part内容 ---")
-        #     print(upper_part.prettify()[:500] + "...")
-        
-        # if bottom_part:
-        #     print("\n--- bottom-part内容 ---")
-        #     print(bottom_part.prettify()[:500] + "...")
-            
-        #     # 检查bottom-part中的类名
-        #     print("\n--- bottom-part的类名 ---")
-        #     print(f"bottom-part的class属性: {bottom_part.get('class', [])}")
-            
-        #     # 检查所有single-data元素
-        #     all_single_data = bottom_part.find_all('div', class_='single-data')
-        #     print(f"\n找到 {len(all_single_data)} 个single-data元素")
-            
-        #     for i, single_data in enumerate(all_single_data):
-        #         print(f"\n--- 第 {i+1} 个single-data元素 ---")
-        #         print(f"类名: {single_data.get('class', [])}")
-        #         print(f"HTML内容: {single_data.prettify()[:300] + '...'}")
-                
-        #         # 检查标题
-        #         title = single_data.find('h3')
-        #         if title:
-        #             print(f"标题: {title.text.strip()}")
-        #         else:
-        #             print("未找到标题")
-                
-        #         # 检查数值元素
-        #         value_elements = single_data.find_all('p', class_=['num bignum', 'num middlenum', 'num bignum pomEEE', 'num middlenum pomEEE'])
-        #         print(f"找到 {len(value_elements)} 个数值元素")
-        #         for j, value_elem in enumerate(value_elements):
-        #             print(f"数值元素 {j+1}: {value_elem.text.strip()}")
-                
-        #         # 检查单位元素
-        #         unit_elements = single_data.find_all('p', class_='num')
-        #         print(f"找到 {len(unit_elements)} 个单位元素")
-        #         for j, unit_elem in enumerate(unit_elements):
-        #             print(f"单位元素 {j+1}: {unit_elem.text.strip()}")
-        
-        # 处理upper-part数据（总量数据）
-        if upper_part:
-            data_blocks = upper_part.find_all('div', class_=['single-data', 'single-data small-margin'])
-            # print(f"\n在upper-part中找到 {len(data_blocks)} 个数据块")
-            
-            for i, item in enumerate(data_blocks):
-                # print(f"\n--- 处理第 {i+1} 个数据块 ---")
-                # print(item.prettify()[:300] + "...")
-                
-                title_element = item.find('h3')
-                if not title_element:
-                    # print("警告：未找到标题元素")
-                    continue
-
-                title_text_raw = title_element.text.strip()
-                title_text_lower = title_text_raw.lower()
-                # print(f"标题: {title_text_raw}")
-
-                if 'e-waste collection rate' in title_text_lower and title_text_raw not in processed_titles:
-                    percent_element = item.find('text', class_='circle-chart__percent')
-                    if percent_element:
-                        data['E-waste Collection Rate (%)'] = self._extract_number(percent_element.text)
-                        processed_titles.add(title_text_raw)
-                        # print(f"提取到收集率: {data['E-waste Collection Rate (%)']}")
-                    else:
-                        # print("警告：未找到收集率数值元素")
-                        pass
-                    continue
-
-                value_element = item.find('p', class_=['num bignum', 'num middlenum', 'num bignum pomEEE', 'num middlenum pomEEE'])
-                if not value_element:
-                    # print("警告：未找到数值元素")
-                    continue
-
-                unit_elements = item.find_all('p', class_='num')
-                unit_text = ""
-                item_text_lower = item.text.lower()
-
-                if len(unit_elements) > 0:
-                    next_p = value_element.find_next_sibling('p', class_='num') if value_element else None
-                    if next_p:
-                        unit_text = next_p.text.strip().lower()
-                    elif len(unit_elements) > 1:
-                        unit_text = unit_elements[-1].text.strip().lower()
-
-                value_text = value_element.text.strip()
-                numeric_value = self._extract_number(value_text)
-                # print(f"提取到数值: {numeric_value}, 单位: {unit_text}")
-
-                if title_text_raw in processed_titles:
-                    # print("标题已处理过，跳过")
-                    continue
-
-                # 处理总量数据
-                if 'e-waste generated' in title_text_lower:
-                    data['E-waste Generated (kt)'] = numeric_value
-                    processed_titles.add(title_text_raw)
-                    # print(f"设置E-waste Generated (kt): {numeric_value}")
-                elif 'eee put on market' in title_text_lower:
-                    data['EEE Put on Market (kt)'] = numeric_value
-                    processed_titles.add(title_text_raw)
-                    # print(f"设置EEE Put on Market (kt): {numeric_value}")
-                elif 'e-waste formally collected' in title_text_lower:
-                    data['E-waste Formally Collected (kt)'] = numeric_value
-                    processed_titles.add(title_text_raw)
-                    # print(f"设置E-waste Formally Collected (kt): {numeric_value}")
-                elif 'e-waste imported' in title_text_lower:
-                    data['E-waste Imported (kt)'] = numeric_value
-                    processed_titles.add(title_text_raw)
-                    # print(f"设置E-waste Imported (kt): {numeric_value}")
-                elif 'e-waste exported' in title_text_lower:
-                    data['E-waste Exported (kt)'] = numeric_value
-                    processed_titles.add(title_text_raw)
-                    # print(f"设置E-waste Exported (kt): {numeric_value}")
-
-        # 处理bottom-part数据（人均数据）
-        if bottom_part:
-            data_blocks = bottom_part.find_all('div', class_='single-data')
-            # print(f"\n在bottom-part中找到 {len(data_blocks)} 个数据块")
-            
-            for i, item in enumerate(data_blocks):
-                # print(f"\n--- 处理第 {i+1} 个数据块 ---")
-                # print(item.prettify()[:300] + "...")
-                
-                title_element = item.find('h3')
-                if not title_element:
-                    # print("警告：未找到标题元素")
-                    continue
-
-                title_text_raw = title_element.text.strip()
-                title_text_lower = title_text_raw.lower()
-                # print(f"标题: {title_text_raw}")
-
-                value_element = item.find('p', class_=['num bignum', 'num middlenum', 'num bignum pomEEE', 'num middlenum pomEEE'])
-                if not value_element:
-                    # print("警告：未找到数值元素")
-                    continue
-
-                unit_elements = item.find_all('p', class_='num')
-                unit_text = ""
-                item_text_lower = item.text.lower()
-
-                if len(unit_elements) > 0:
-                    next_p = value_element.find_next_sibling('p', class_='num') if value_element else None
-                    if next_p:
-                        unit_text = next_p.text.strip().lower()
-                    elif len(unit_elements) > 1:
-                        unit_text = unit_elements[-1].text.strip().lower()
-
-                value_text = value_element.text.strip()
-                numeric_value = self._extract_number(value_text)
-                # print(f"提取到数值: {numeric_value}, 单位: {unit_text}")
-
-                # 处理人均数据 - 移除processed_titles检查
-                if 'e-waste generated' in title_text_lower:
-                    data['E-waste Generated (kg/capita)'] = numeric_value
-                    # print(f"设置E-waste Generated (kg/capita): {numeric_value}")
-                elif 'eee put on market' in title_text_lower:
-                    data['EEE Put on Market (kg/capita)'] = numeric_value
-                    # print(f"设置EEE Put on Market (kg/capita): {numeric_value}")
-
-        # print("\n=== 提取完成 ===")
-        # print("提取到的数据:")
-        # for key, value in data.items():
-        #     if key not in ['Category', 'Name', 'Year', 'Source URL']:
-        #         print(f"{key}: {value}")
+        """从页面中提取各个指标数据 (按 metric_spec.METRIC_SPEC 声明的规则单次遍历)"""
+        COMPILED_SPEC.extract(soup, data)
 
 # --- 新增的测试运行函数 ---
-def run_test_scrape(collector, base_url):
-    """运行一个限定范围的测试抓取"""
-    test_data = []
-    print(f"开始从 {base_url} 进行测试数据收集...")
-
-    # 定义测试目标
-    test_targets = {
-        'Continent': ['Europe'],
-        'Region': ['Australia and New Zealand', 'South-Eastern Asia'],
-        'Country': ['China', 'Germany', 'Japan', 'United States of America']
-    }
-    test_years = ['2022', '2018']
-    print(f"测试目标 - 项目: {test_targets}")
-    print(f"测试目标 - 年份: {test_years}")
-
-    soup = collector._get_page_data(base_url)
-    if not soup:
-        print("错误：无法获取基础页面，测试终止。")
-        return test_data
-
-    categories_elements = {
-        'Continent': soup.find('ul', id='continent-list'),
-        'Region': soup.find('ul', id='region-list'),
-        'Country': soup.find('ul', id='country-list')
-    }
-
-    processed_items_count = 0
-    items_to_process_in_test = sum(len(v) for v in test_targets.values())
-
-
-    for category_name, target_items in test_targets.items():
-        category_list_element = categories_elements.get(category_name)
-        if not category_list_element:
-            print(f"警告：未找到测试类别列表: {category_name}")
-            continue
+# 测试目标
+TEST_TARGETS = {
+    'Continent': ['Europe'],
+    'Region': ['Australia and New Zealand', 'South-Eastern Asia'],
+    'Country': ['China', 'Germany', 'Japan', 'United States of America']
+}
+TEST_YEARS = ['2022', '2018']
 
-        all_links_in_category = category_list_element.find_all('a')
-        # 筛选出测试目标的链接
-        target_links = [link for link in all_links_in_category if link.text.strip() in target_items]
 
-        print(f"\n正在处理测试类别 {category_name}，目标项目: {', '.join(target_items)} (找到 {len(target_links)} 个匹配链接)")
+def run_test_scrape(collector, base_url, sink=None, keep_records=True):
+    """运行一个限定范围的测试抓取 (sink/keep_records 的含义同 collect_data)
 
-        for link in target_links:
-            processed_items_count += 1
-            name = link.text.strip()
-            detail_url = link.get('href')
-
-            if not detail_url:
-                 print(f"  警告：跳过测试项目 '{name}'，因为链接为空。")
-                 continue
-
-            if not detail_url.startswith('http'):
-                base_domain = "https://globalewaste.org"
-                if not detail_url.startswith('/'):
-                    detail_url = '/' + detail_url
-                detail_url = base_domain + detail_url
-
-            print(f"  ({processed_items_count}/{items_to_process_in_test}) [测试] 正在获取 {category_name}-{name} 的数据 (年份: {', '.join(test_years)})...")
-
-            try:
-                # 调用 _process_detail_page 并传入 target_years
-                data = collector._process_detail_page(detail_url, category_name, name, target_years=test_years)
-                if data:
-                    test_data.extend(data)
-                else:
-                    print(f"  [测试] 注意：未从 {category_name}-{name} (年份 {test_years}) 获取到数据。")
-                time.sleep(1) # 测试时也保持一定的休眠
-
-            except KeyboardInterrupt:
-                 print("\n用户中断测试操作。")
-                 return test_data
-            except Exception as e:
-                print(f"  [测试] 严重错误：处理测试项目 {category_name}-{name} ({detail_url}) 时发生意外错误: {e}")
-                continue
-
-    print(f"\n测试数据收集完毕，共收集到 {len(test_data)} 条记录。")
-    return test_data
+    即固定目标的抓取计划，见 crawl_plan.run_crawl_plan。
+    """
+    print(f"测试目标 - 项目: {TEST_TARGETS}")
+    print(f"测试目标 - 年份: {TEST_YEARS}")
+    plan = CrawlPlan.from_targets(TEST_TARGETS, TEST_YEARS)
+    return run_crawl_plan(collector, base_url, plan, sink=sink, keep_records=keep_records, label='测试')
 
 
 def save_data(data_list, output_dir, file_prefix):
@@ -526,16 +622,9 @@ def save_data(data_list, output_dir, file_prefix):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
     # --- 保存为 CSV ---
-    df = pd.DataFrame(data_list)
-    column_order = [
-        'Category', 'Name', 'Year', 'Population',
-        'E-waste Generated (kt)', 'EEE Put on Market (kt)',
-        'E-waste Formally Collected (kt)', 'E-waste Collection Rate (%)',
-        'E-waste Generated (kg/capita)', 'EEE Put on Market (kg/capita)',
-        'E-waste Imported (kt)', 'E-waste Exported (kt)',
-        'Source URL'
-    ]
-    df = df.reindex(columns=[col for col in column_order if col in df.columns])
+    # RecordTable 直接在其列数组上构造 DataFrame，不经过逐条的 dict
+    df = data_list.to_frame() if isinstance(data_list, RecordTable) else pd.DataFrame(data_list)
+    df = df.reindex(columns=[col for col in COLUMN_ORDER if col in df.columns])
 
     csv_filename = f'{file_prefix}_{timestamp}.csv'
     csv_filepath = os.path.join(output_dir, csv_filename)
@@ -571,10 +660,368 @@ def main():
         action="store_true", # 如果提供了 --test 参数，则此值为 True
         help="运行限定范围的测试抓取，而不是完整抓取。"
     )
+    parser.add_argument(
+        "--bulk",
+        default=None,
+        metavar="FILE",
+        help="批量导入模式：从本地 CSV / XLSX 数据文件一次性加载 (不发出任何网络请求)，映射为相同的输出格式。"
+    )
+    parser.add_argument(
+        "--bulk-sheet",
+        default=None,
+        help="批量导入 XLSX 时使用的工作表 (默认第一个)。"
+    )
+    parser.add_argument(
+        "--bulk-category",
+        default="Country",
+        help="批量文件没有类别列时，所有行使用的类别 (默认 Country)。"
+    )
+    parser.add_argument(
+        "--column-map",
+        action="append",
+        default=[],
+        metavar="SRC=DST",
+        help="批量导入时手动指定列映射，可重复 (如 \"EWG (kt)=E-waste Generated (kt)\")。"
+    )
+    parser.add_argument(
+        "--category",
+        default=None,
+        help="目标抓取：只抓取这些类别 (逗号分隔，如 Country 或 Region,Country)。"
+    )
+    parser.add_argument(
+        "--names",
+        default=None,
+        help="目标抓取：只抓取这些名称 (逗号分隔，不区分大小写，如 China,Japan)。"
+    )
+    parser.add_argument(
+        "--years",
+        default=None,
+        help="目标抓取：只抓取这些年份 (逗号分隔，如 2021,2022)。"
+    )
+    parser.add_argument(
+        "--index",
+        default=os.path.join("output_data", "entity_index.json"),
+        help="目标抓取使用的项目 URL 索引 (默认 output_data/entity_index.json)。"
+    )
+    parser.add_argument(
+        "--refresh-index",
+        action="store_true",
+        help="目标抓取前先请求基础页面刷新项目索引。"
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="使用 asyncio 并发抓取 (需要 aiohttp)，结果与顺序抓取一致。"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="异步模式下全局同时在途的请求数上限 (默认 16)。"
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=4,
+        help="异步模式下单个主机同时在途的请求数上限 (默认 4)。"
+    )
+    parser.add_argument(
+        "--host-delay",
+        type=float,
+        default=0.0,
+        help="异步模式下同一主机相邻请求的额外最小间隔秒数 (默认 0，节奏由限速器控制)。"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=1.0,
+        help="限速器的初始请求速率 (请求/秒，默认 1.0)，之后根据响应情况自动调整。"
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=8.0,
+        help="限速器允许提升到的最大请求速率 (请求/秒，默认 8.0)。"
+    )
+    parser.add_argument(
+        "--cache",
+        default=os.path.join("output_data", "http_cache.sqlite3"),
+        help="HTTP 响应缓存文件路径 (默认 output_data/http_cache.sqlite3)。"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="禁用 HTTP 缓存，每个页面都完整下载。"
+    )
+    parser.add_argument(
+        "--cache-only",
+        action="store_true",
+        help="完全离线运行，只从缓存读取页面，不发出任何网络请求。"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="从上次运行的检查点日志续跑，跳过已完成的 (类别, 名称, 年份) 单元。"
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help="检查点日志文件路径 (默认 output_data/crawl_journal_<full|test|query>.sqlite3)。"
+    )
+    parser.add_argument(
+        "--extract-backend",
+        choices=list(EXTRACT_BACKENDS),
+        default="full",
+        help="年份页面的解析后端：full (完整解析，默认)、fast (选择性解析)、lxml (lxml + 选择性解析)。"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="以流水线方式运行：I/O 线程抓取，进程池并行解析，写入线程汇总。"
+    )
+    parser.add_argument(
+        "--fetch-workers",
+        type=int,
+        default=8,
+        help="流水线模式下的 I/O 线程数 (默认 8)。"
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="流水线模式下的解析进程数 (默认等于 CPU 核数)。"
+    )
+    parser.add_argument(
+        "--fetch-queue",
+        type=int,
+        default=64,
+        help="流水线模式下等待解析的原始页面队列上限 (默认 64)，队列满时抓取线程阻塞。"
+    )
+    parser.add_argument(
+        "--parse-inflight",
+        type=int,
+        default=None,
+        help="流水线模式下同时提交给进程池的解析任务上限 (默认为解析进程数的 2 倍)。"
+    )
+    parser.add_argument(
+        "--parquet",
+        default=None,
+        metavar="DIR",
+        help="另外导出强类型的 Parquet 数据集到 DIR (按 Category/Year 分区，需要 pyarrow)。"
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        metavar="WARC",
+        help="录制模式：把所有原始响应写入 WARC 归档 (如 output_data/crawl.warc.gz)。"
+    )
+    parser.add_argument(
+        "--replay",
+        default=None,
+        metavar="WARC",
+        help="回放模式：所有页面都从 WARC 归档读取，不访问网络。"
+    )
+    parser.add_argument(
+        "--aggregate",
+        action="store_true",
+        help="汇总模式：区域/大洲由国家记录在本地计算，只抽样抓取其页面用于验证 (不能与 --test 同时使用)。"
+    )
+    parser.add_argument(
+        "--validation-sample",
+        type=float,
+        default=0.2,
+        help="汇总模式下抓取用于验证的区域/大洲比例 (默认 0.2)。"
+    )
+    parser.add_argument(
+        "--hierarchy",
+        default=None,
+        metavar="CSV",
+        help="国家 -> 区域 -> 大洲 对照表 (Name, Region, Continent 三列)，默认使用内置的 M49 分区。"
+    )
+    parser.add_argument(
+        "--no-url-plan",
+        action="store_true",
+        help="禁用年份 URL 规划 (始终先请求详情页，再逐个请求其列出的年份页面)。"
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        metavar="PATH",
+        help="抓取指标输出路径 (不含扩展名，写出 .json 与 .prom)，默认 output_data/crawl_metrics_<test|full|query>。"
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=30.0,
+        help="抓取过程中定期写出指标的间隔秒数 (默认 30，0 表示只在结束时写出)。"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="分片模式：启动 N 个本地 worker 进程，从共享的带租约工作队列领取单元 (--rate 为每个 worker 的速率)。"
+    )
+    parser.add_argument(
+        "--queue",
+        default=os.path.join("output_data", "work_queue.sqlite3"),
+        help="分片模式的工作队列文件 (默认 output_data/work_queue.sqlite3，多主机时放在共享文件系统上)。"
+    )
+    parser.add_argument(
+        "--join",
+        default=None,
+        metavar="QUEUE",
+        help="只作为 worker 加入已有的工作队列 (如其他主机上启动的分片抓取)，不写出结果文件。"
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=300.0,
+        help="分片模式下单元的租约秒数 (默认 300)；worker 崩溃后其单元在租约到期时重新发放。"
+    )
+    parser.add_argument(
+        "--schedule",
+        action="store_true",
+        help="调度模式：按新鲜度只重抓到期的 (类别, 名称, 年份) 单元，受 --budget 限制 (顺序抓取)；"
+             "其余单元从变更检测基线补全，输出为 ewaste_data_schedule_*。"
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=200,
+        help="调度模式下每次运行的请求预算 (默认 200)。"
+    )
+    parser.add_argument(
+        "--ttl-latest",
+        default="1d",
+        help="调度模式下最新年份的有效期 (默认 1d)。"
+    )
+    parser.add_argument(
+        "--ttl-default",
+        default="30d",
+        help="调度模式下其余年份的有效期 (默认 30d)。"
+    )
+    parser.add_argument(
+        "--ttl",
+        action="append",
+        default=[],
+        metavar="RULE",
+        help="额外的有效期规则，可重复：按年份 2018-2020=365d，或按类别 Country=7d (取较短者)。"
+    )
+    parser.add_argument(
+        "--schedule-db",
+        default=os.path.join("output_data", "recrawl_schedule.sqlite3"),
+        help="调度模式下记录各单元检查时间的数据库 (默认 output_data/recrawl_schedule.sqlite3)。"
+    )
+    parser.add_argument(
+        "--changes",
+        default=None,
+        metavar="PATH",
+        help="变更检测数据库路径 (默认 output_data/change_tracker_<test|full|query|bulk|schedule>.sqlite3)。"
+    )
+    parser.add_argument(
+        "--no-changes",
+        action="store_true",
+        help="禁用变更检测：每个年份页面都重新解析，不生成变更日志。"
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        default=None,
+        metavar="DIR",
+        help="快照库目录：每次运行结束后把结果保存为去重的内容寻址快照 (默认 output_data/snapshots_<运行模式>)。"
+    )
+    parser.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        help="不把本次结果保存到快照库。"
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="不使用流式写入，抓取结束后再一次性保存为 CSV 和 JSON (旧方式)。"
+    )
     args = parser.parse_args()
+    if args.use_async and args.pipeline:
+        parser.error("--async 与 --pipeline 不能同时使用。")
+
+    worker_options = {
+        'rate': args.rate, 'max_rate': args.max_rate, 'extract_backend': args.extract_backend,
+        'cache': None if args.no_cache else args.cache, 'cache_only': args.cache_only, 'replay': args.replay,
+    }
+    if args.join:
+        from sharded_crawl import run_worker
+        print(f"作为 worker 加入工作队列: {args.join}")
+        run_worker(args.join, options=worker_options, lease_seconds=args.lease)
+        return
+    if args.bulk and (args.test or args.aggregate or args.schedule or args.workers is not None
+                      or args.use_async or args.pipeline or args.category or args.names or args.years):
+        parser.error("--bulk 不能与其他抓取模式同时使用。")
+    column_map = {}
+    for pair in args.column_map:
+        src, sep, dst = pair.rpartition('=')
+        if not sep or not src or dst not in COLUMN_ORDER:
+            parser.error(f"无法解析的列映射: {pair!r} (目标列必须是 {', '.join(COLUMN_ORDER)} 之一)")
+        column_map[src] = dst
+    plan = None
+    if args.category or args.names or args.years:
+        if args.test or args.aggregate or args.schedule or args.workers is not None:
+            parser.error("--category / --names / --years 不能与 --test / --aggregate / --schedule / --workers 同时使用。")
+        try:
+            plan = CrawlPlan.from_args(args.category, args.names, args.years)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.workers is not None and (args.test or args.aggregate or args.use_async or args.pipeline or args.schedule):
+        parser.error("--workers 不能与 --test / --aggregate / --async / --pipeline / --schedule 同时使用。")
+    if args.workers is not None and args.record:
+        parser.error("--workers 不能与 --record 同时使用 (多个进程不能写入同一个归档)。")
 
     start_time = time.time()
-    collector = EwasteDataCollector()
+    rate_limiter = AdaptiveRateLimiter(initial_rate=args.rate, max_rate=max(args.rate, args.max_rate))
+    if args.no_cache and args.cache_only:
+        parser.error("--no-cache 与 --cache-only 不能同时使用。")
+    if args.record and args.replay:
+        parser.error("--record 与 --replay 不能同时使用。")
+    if args.aggregate and args.test:
+        parser.error("--aggregate 与 --test 不能同时使用。")
+    if args.schedule and (args.test or args.aggregate or args.use_async or args.pipeline):
+        parser.error("--schedule 不能与 --test / --aggregate / --async / --pipeline 同时使用。")
+    if args.schedule and args.no_changes:
+        parser.error("--schedule 需要变更检测基线补全未重抓的单元，不能与 --no-changes 同时使用。")
+    scheduler = None
+    if args.schedule:
+        try:
+            policy = FreshnessPolicy.from_rules(args.ttl, latest_ttl=parse_duration(args.ttl_latest),
+                                                default_ttl=parse_duration(args.ttl_default))
+        except ValueError as e:
+            parser.error(str(e))
+        scheduler = RecrawlScheduler(args.schedule_db, policy=policy, budget=args.budget)
+    cache = None
+    if not args.no_cache:
+        cache = HttpCache(args.cache, cache_only=args.cache_only)
+        print(f"使用 HTTP 缓存: {args.cache}{' (离线模式)' if args.cache_only else ''}")
+    # 调度运行只重抓一部分单元，使用自己的文件前缀 / 快照库，不会覆盖完整抓取的结果
+    run_mode = ('test' if args.test else 'query' if plan is not None else 'bulk' if args.bulk
+                else 'schedule' if args.schedule else 'full')
+    journal_path = args.journal or os.path.join("output_data", f"crawl_journal_{run_mode}.sqlite3")
+    journal = CrawlJournal(journal_path, resume=args.resume)
+    if args.resume:
+        print(f"从检查点日志续跑: {journal_path} (已完成 {journal.unit_count()} 个单元)")
+    recorder = PageArchiveWriter(args.record) if args.record else None
+    replay = PageArchive(args.replay) if args.replay else None
+    if replay is not None:
+        print(f"回放模式: {args.replay} (共 {len(replay)} 个页面)")
+    metrics_path = args.metrics or os.path.join("output_data", f"crawl_metrics_{run_mode}")
+    telemetry = CrawlTelemetry(metrics_path, interval=args.metrics_interval).start()
+    changes = None
+    if not args.no_changes:
+        changes_path = args.changes or os.path.join("output_data", f"change_tracker_{run_mode}.sqlite3")
+        changes = ChangeTracker(changes_path)
+        print(f"使用变更检测: {changes_path} (第 {changes.run_id} 次运行)")
+    collector = EwasteDataCollector(rate_limiter=rate_limiter, cache=cache, journal=journal,
+                                    extract_backend=args.extract_backend, recorder=recorder, replay=replay,
+                                    telemetry=telemetry,
+                                    planner=None if args.no_url_plan else YearUrlPlanner(),
+                                    changes=changes)
     base_url = "https://globalewaste.org/country-sheets/"
     output_dir = "output_data" # 定义输出文件夹
 
@@ -584,25 +1031,151 @@ def main():
         print(f"创建输出文件夹: {output_dir}")
 
     collected_data = []
-    file_prefix = "" # 文件名前缀
-
-    if args.test:
-        print("=== 开始测试模式运行 ===")
-        collected_data = run_test_scrape(collector, base_url)
-        file_prefix = "ewaste_data_test"
-    else:
-        print("=== 开始正式数据收集 (完整模式) ===")
-        print("这将抓取所有类别、项目和年份的数据，可能需要较长时间。")
-        collected_data = collector.collect_data(base_url)
-        file_prefix = "ewaste_data_full"
+    file_prefix = f"ewaste_data_{run_mode}" # 文件名前缀
+
+    # 默认边抓取边写入 (流式)，--no-stream 时沿用抓取结束后一次性 save_data 的方式
+    writer = None
+    sink, keep_records = None, True
+    if not args.no_stream:
+        writer = StreamingRecordWriter(output_dir, file_prefix, COLUMN_ORDER)
+        sink, keep_records = writer.write, False
+    if changes is not None:
+        # 每条记录先与上次的基线比较，再交给原来的 sink
+        downstream = sink
+        def sink(record):
+            changes.observe(record)
+            if downstream is not None:
+                downstream(record)
+
+    try:
+        if args.bulk:
+            print("=== 开始批量导入 ===")
+            from bulk_ingest import ingest_bulk
+            collected_data, bulk_report = ingest_bulk(args.bulk, sheet=args.bulk_sheet, column_map=column_map,
+                                                      category=args.bulk_category, sink=sink,
+                                                      keep_records=keep_records)
+            telemetry.add_records(bulk_report['rows_loaded'])
+            report_path = os.path.join(output_dir, f"{file_prefix}_validation.json")
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(bulk_report, f, ensure_ascii=False, indent=2)
+            print(f"批量导入校验报告已保存到: {report_path}")
+        elif args.test:
+            print("=== 开始测试模式运行 ===")
+            collected_data = run_test_scrape(collector, base_url, sink=sink, keep_records=keep_records)
+        elif plan is not None:
+            print("=== 开始目标抓取 ===")
+            collected_data = run_crawl_plan(collector, base_url, plan, index=EntityIndex(args.index), sink=sink,
+                                            keep_records=keep_records, refresh=args.refresh_index)
+        else:
+            print("=== 开始正式数据收集 (完整模式) ===")
+            print("这将抓取所有类别、项目和年份的数据，可能需要较长时间。")
+            if args.use_async:
+                method, crawl_kwargs = 'async', dict(concurrency=args.concurrency, per_host=args.per_host,
+                                                     host_delay=args.host_delay)
+            elif args.pipeline:
+                method, crawl_kwargs = 'pipeline', dict(fetch_workers=args.fetch_workers,
+                                                        parse_workers=args.parse_workers,
+                                                        fetch_queue_size=args.fetch_queue,
+                                                        parse_inflight=args.parse_inflight)
+            else:
+                method, crawl_kwargs = 'sequential', {}
+            if args.workers is not None:
+                collected_data = collector.collect_data_sharded(base_url, args.queue, workers=args.workers,
+                                                                worker_options=worker_options, resume=args.resume,
+                                                                lease_seconds=args.lease, sink=sink,
+                                                                keep_records=keep_records)
+            elif scheduler is not None:
+                collected_data = collector.collect_data_scheduled(base_url, scheduler, sink=sink,
+                                                                  keep_records=keep_records)
+            elif args.aggregate:
+                from aggregation import collect_with_aggregates
+                from region_hierarchy import load_hierarchy
+                collected_data, aggregate_report = collect_with_aggregates(
+                    collector, base_url, method=method, validation_fraction=args.validation_sample,
+                    hierarchy=load_hierarchy(args.hierarchy), sink=sink, keep_records=keep_records, **crawl_kwargs)
+                report_path = os.path.join(output_dir, f"{file_prefix}_aggregate_validation.json")
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    json.dump(aggregate_report, f, ensure_ascii=False, indent=2)
+                print(f"汇总验证报告已保存到: {report_path}")
+            elif method == 'async':
+                collected_data = collector.collect_data_async(base_url, sink=sink, keep_records=keep_records,
+                                                              **crawl_kwargs)
+            elif method == 'pipeline':
+                collected_data = collector.collect_data_pipeline(base_url, sink=sink, keep_records=keep_records,
+                                                                 **crawl_kwargs)
+            else:
+                collected_data = collector.collect_data(base_url, sink=sink, keep_records=keep_records)
+    finally:
+        if writer is not None:
+            written_paths = writer.close() # 即使异常退出也把已写入的部分原子地落盘
+        telemetry.close()
 
     # 保存数据
-    save_data(collected_data, output_dir, file_prefix)
+    if writer is None:
+        save_data(collected_data, output_dir, file_prefix)
+
+    if changes is not None:
+        changelog = changes.finish()
+        changelog_path = os.path.join(output_dir, f"{file_prefix}_changelog_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(changelog_path, 'w', encoding='utf-8') as f:
+            json.dump(changelog, f, ensure_ascii=False, indent=2)
+        summary = changelog['summary']
+        print(f"变更日志已保存到: {changelog_path} (变化 {summary['changed']}，新增 {summary['appeared']}，"
+              f"消失 {summary['vanished']}；{summary['pages_unchanged']} 个页面未变化，跳过解析)")
+        changes.close()
+
+    # 快照：流式模式下记录不在内存中，从刚写好的 JSONL 逐行读回
+    if not args.no_snapshot:
+        from snapshot_store import SnapshotStore
+        store = SnapshotStore(args.snapshot_dir or os.path.join(output_dir, f"snapshots_{run_mode}"))
+        try:
+            if writer is None:
+                manifest = store.commit(collected_data, label=run_mode) if collected_data else None
+            elif 'jsonl' in written_paths:
+                with open(written_paths['jsonl'], 'r', encoding='utf-8') as f:
+                    manifest = store.commit((json.loads(line) for line in f if line.strip()), label=run_mode)
+            else:
+                manifest = None
+            if manifest is not None:
+                print(f"快照已保存: {store.root} -> {manifest['id']} ({manifest['record_count']} 条记录，"
+                      f"{len(manifest['chunks'])} 个块中新增 {manifest['new_chunks']} 个，{manifest['new_bytes']} 字节)")
+        except Exception as e:
+            print(f"错误：保存快照失败: {e}")
+
+    # 列式导出：流式模式下记录不在内存中，从刚写好的 CSV 读回
+    if args.parquet:
+        from columnar_export import typed_frame_from_csv, write_parquet_dataset
+        try:
+            if writer is None:
+                write_parquet_dataset(collected_data, args.parquet)
+            elif 'csv' in written_paths:
+                write_parquet_dataset(typed_frame_from_csv(written_paths['csv']), args.parquet)
+        except Exception as e:
+            print(f"错误：导出 Parquet 数据集失败: {e}")
 
     end_time = time.time()
     duration = end_time - start_time
-    print(f"\n=== {'测试' if args.test else '完整'}运行完成 ===")
+    print(f"\n=== {dict(test='测试', query='目标', bulk='批量导入', schedule='调度', full='完整')[run_mode]}运行完成 ===")
     print(f"总耗时: {duration:.2f} 秒")
+    metrics = telemetry.snapshot()
+    print(f"请求数: {metrics['requests']}，记录数: {metrics['records']} ({metrics['records_per_second']} 条/秒)，"
+          f"重试: {metrics['retries'] or 0}")
+    print(f"限速器状态: {rate_limiter.stats()}")
+    if cache is not None:
+        print(f"缓存状态: {cache.stats()}")
+        cache.close()
+    if args.resume:
+        print(f"从检查点日志直接取回 {journal.resumed_units} 个单元。")
+    journal.close()
+    if recorder is not None:
+        recorder.close()
+    if replay is not None:
+        print(f"回放状态: {replay.stats()}")
+    if collector.planner is not None:
+        print(f"URL 规划: {collector.planner.stats()}")
+    if scheduler is not None:
+        print(f"调度状态: {scheduler.stats()}")
+        scheduler.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
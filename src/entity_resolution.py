@@ -0,0 +1,341 @@
+import re
+import unicodedata
+
+
+# ISO 3166-1 alpha-3 -> 名称变体：第一个为 M49 英文短名 (与 region_hierarchy 及站点一致)，
+# 其后为常见简称与 Natural Earth 使用的写法。未列出的写法在建索引时从 Shapefile 的名称列补充。
+ISO3_NAMES = {
+    'AFG': ['Afghanistan'],
+    'ALB': ['Albania'],
+    'DZA': ['Algeria'],
+    'ASM': ['American Samoa'],
+    'AND': ['Andorra'],
+    'AGO': ['Angola'],
+    'AIA': ['Anguilla'],
+    'ATG': ['Antigua and Barbuda', 'Antigua and Barb.'],
+    'ARG': ['Argentina'],
+    'ARM': ['Armenia'],
+    'ABW': ['Aruba'],
+    'AUS': ['Australia'],
+    'AUT': ['Austria'],
+    'AZE': ['Azerbaijan'],
+    'BHS': ['Bahamas', 'The Bahamas'],
+    'BHR': ['Bahrain'],
+    'BGD': ['Bangladesh'],
+    'BRB': ['Barbados'],
+    'BLR': ['Belarus'],
+    'BEL': ['Belgium'],
+    'BLZ': ['Belize'],
+    'BEN': ['Benin'],
+    'BMU': ['Bermuda'],
+    'BTN': ['Bhutan'],
+    'BOL': ['Bolivia (Plurinational State of)', 'Bolivia', 'Plurinational State of Bolivia'],
+    'BIH': ['Bosnia and Herzegovina', 'Bosnia and Herz.'],
+    'BWA': ['Botswana'],
+    'BRA': ['Brazil'],
+    'VGB': ['British Virgin Islands', 'British Virgin Is.'],
+    'BRN': ['Brunei Darussalam', 'Brunei'],
+    'BGR': ['Bulgaria'],
+    'BFA': ['Burkina Faso'],
+    'BDI': ['Burundi'],
+    'CPV': ['Cabo Verde', 'Cape Verde'],
+    'KHM': ['Cambodia'],
+    'CMR': ['Cameroon'],
+    'CAN': ['Canada'],
+    'CYM': ['Cayman Islands', 'Cayman Is.'],
+    'CAF': ['Central African Republic', 'Central African Rep.'],
+    'TCD': ['Chad'],
+    'CHL': ['Chile'],
+    'CHN': ['China', "People's Republic of China"],
+    'HKG': ['China, Hong Kong SAR', 'China, Hong Kong Special Administrative Region', 'Hong Kong',
+            'Hong Kong S.A.R.', 'Hong Kong SAR, China'],
+    'MAC': ['China, Macao SAR', 'China, Macao Special Administrative Region', 'Macao', 'Macau',
+            'Macao S.A.R', 'Macao SAR, China'],
+    'COL': ['Colombia'],
+    'COM': ['Comoros'],
+    'COG': ['Congo', 'Republic of the Congo', 'Congo, Rep.', 'Congo-Brazzaville'],
+    'COK': ['Cook Islands', 'Cook Is.'],
+    'CRI': ['Costa Rica'],
+    'CIV': ["Côte d'Ivoire", 'Ivory Coast'],
+    'HRV': ['Croatia'],
+    'CUB': ['Cuba'],
+    'CUW': ['Curaçao'],
+    'CYP': ['Cyprus'],
+    'CZE': ['Czechia', 'Czech Republic', 'Czech Rep.'],
+    'PRK': ["Democratic People's Republic of Korea", 'North Korea', 'Dem. Rep. Korea', 'Korea, Dem. Rep.'],
+    'COD': ['Democratic Republic of the Congo', 'Dem. Rep. Congo', 'DR Congo', 'Congo, Dem. Rep.',
+            'Congo-Kinshasa'],
+    'DNK': ['Denmark'],
+    'DJI': ['Djibouti'],
+    'DMA': ['Dominica'],
+    'DOM': ['Dominican Republic', 'Dominican Rep.'],
+    'ECU': ['Ecuador'],
+    'EGY': ['Egypt'],
+    'SLV': ['El Salvador'],
+    'GNQ': ['Equatorial Guinea', 'Eq. Guinea'],
+    'ERI': ['Eritrea'],
+    'EST': ['Estonia'],
+    'SWZ': ['Eswatini', 'eSwatini', 'Swaziland', 'Kingdom of Eswatini'],
+    'ETH': ['Ethiopia'],
+    'FLK': ['Falkland Islands', 'Falkland Is.', 'Falkland Islands (Malvinas)'],
+    'FRO': ['Faroe Islands', 'Faeroe Is.'],
+    'FJI': ['Fiji'],
+    'FIN': ['Finland'],
+    'FRA': ['France'],
+    'GUF': ['French Guiana'],
+    'PYF': ['French Polynesia', 'Fr. Polynesia'],
+    'ATF': ['French Southern and Antarctic Lands', 'Fr. S. Antarctic Lands', 'French Southern Territories'],
+    'GAB': ['Gabon'],
+    'GMB': ['Gambia', 'The Gambia'],
+    'GEO': ['Georgia'],
+    'DEU': ['Germany'],
+    'GHA': ['Ghana'],
+    'GIB': ['Gibraltar'],
+    'GRC': ['Greece'],
+    'GRL': ['Greenland'],
+    'GRD': ['Grenada'],
+    'GLP': ['Guadeloupe'],
+    'GUM': ['Guam'],
+    'GTM': ['Guatemala'],
+    'GIN': ['Guinea'],
+    'GNB': ['Guinea-Bissau', 'Guinea Bissau'],
+    'GUY': ['Guyana'],
+    'HTI': ['Haiti'],
+    'HND': ['Honduras'],
+    'HUN': ['Hungary'],
+    'ISL': ['Iceland'],
+    'IND': ['India'],
+    'IDN': ['Indonesia'],
+    'IRN': ['Iran (Islamic Republic of)', 'Iran', 'Islamic Republic of Iran', 'Iran, Islamic Rep.'],
+    'IRQ': ['Iraq'],
+    'IRL': ['Ireland'],
+    'ISR': ['Israel'],
+    'ITA': ['Italy'],
+    'JAM': ['Jamaica'],
+    'JPN': ['Japan'],
+    'JOR': ['Jordan'],
+    'KAZ': ['Kazakhstan'],
+    'KEN': ['Kenya'],
+    'KIR': ['Kiribati'],
+    'XKX': ['Kosovo', 'Republic of Kosovo'],
+    'KWT': ['Kuwait'],
+    'KGZ': ['Kyrgyzstan', 'Kyrgyz Republic'],
+    'LAO': ["Lao People's Democratic Republic", 'Laos', 'Lao PDR'],
+    'LVA': ['Latvia'],
+    'LBN': ['Lebanon'],
+    'LSO': ['Lesotho'],
+    'LBR': ['Liberia'],
+    'LBY': ['Libya'],
+    'LIE': ['Liechtenstein'],
+    'LTU': ['Lithuania'],
+    'LUX': ['Luxembourg'],
+    'MDG': ['Madagascar'],
+    'MWI': ['Malawi'],
+    'MYS': ['Malaysia'],
+    'MDV': ['Maldives'],
+    'MLI': ['Mali'],
+    'MLT': ['Malta'],
+    'MHL': ['Marshall Islands', 'Marshall Is.'],
+    'MTQ': ['Martinique'],
+    'MRT': ['Mauritania'],
+    'MUS': ['Mauritius'],
+    'MYT': ['Mayotte'],
+    'MEX': ['Mexico'],
+    'FSM': ['Micronesia (Federated States of)', 'Micronesia', 'Federated States of Micronesia'],
+    'MCO': ['Monaco'],
+    'MNG': ['Mongolia'],
+    'MNE': ['Montenegro'],
+    'MSR': ['Montserrat'],
+    'MAR': ['Morocco'],
+    'MOZ': ['Mozambique'],
+    'MMR': ['Myanmar', 'Burma'],
+    'NAM': ['Namibia'],
+    'NRU': ['Nauru'],
+    'NPL': ['Nepal'],
+    'NLD': ['Netherlands', 'Netherlands (Kingdom of the)', 'The Netherlands'],
+    'NCL': ['New Caledonia'],
+    'NZL': ['New Zealand'],
+    'NIC': ['Nicaragua'],
+    'NER': ['Niger'],
+    'NGA': ['Nigeria'],
+    'NIU': ['Niue'],
+    'MKD': ['North Macedonia', 'Macedonia', 'The former Yugoslav Republic of Macedonia',
+            'Republic of North Macedonia'],
+    'MNP': ['Northern Mariana Islands', 'N. Mariana Is.'],
+    'NOR': ['Norway'],
+    'OMN': ['Oman'],
+    'PAK': ['Pakistan'],
+    'PLW': ['Palau'],
+    'PSE': ['State of Palestine', 'Palestine', 'West Bank and Gaza'],
+    'PAN': ['Panama'],
+    'PNG': ['Papua New Guinea'],
+    'PRY': ['Paraguay'],
+    'PER': ['Peru'],
+    'PHL': ['Philippines'],
+    'POL': ['Poland'],
+    'PRT': ['Portugal'],
+    'PRI': ['Puerto Rico'],
+    'QAT': ['Qatar'],
+    'KOR': ['Republic of Korea', 'South Korea', 'Korea', 'Korea, Rep.'],
+    'MDA': ['Republic of Moldova', 'Moldova'],
+    'REU': ['Réunion'],
+    'ROU': ['Romania'],
+    'RUS': ['Russian Federation', 'Russia'],
+    'RWA': ['Rwanda'],
+    'KNA': ['Saint Kitts and Nevis', 'St. Kitts and Nevis'],
+    'LCA': ['Saint Lucia', 'St. Lucia'],
+    'VCT': ['Saint Vincent and the Grenadines', 'St. Vin. and Gren.', 'St. Vincent and the Grenadines'],
+    'WSM': ['Samoa'],
+    'SMR': ['San Marino'],
+    'STP': ['Sao Tome and Principe', 'São Tomé and Principe', 'São Tomé and Príncipe'],
+    'SAU': ['Saudi Arabia'],
+    'SEN': ['Senegal'],
+    'SRB': ['Serbia', 'Republic of Serbia'],
+    'SYC': ['Seychelles'],
+    'SLE': ['Sierra Leone'],
+    'SGP': ['Singapore'],
+    'SXM': ['Sint Maarten (Dutch part)', 'Sint Maarten'],
+    'SVK': ['Slovakia', 'Slovak Republic'],
+    'SVN': ['Slovenia'],
+    'SLB': ['Solomon Islands', 'Solomon Is.'],
+    'SOM': ['Somalia'],
+    'ZAF': ['South Africa'],
+    'SSD': ['South Sudan', 'S. Sudan'],
+    'ESP': ['Spain'],
+    'LKA': ['Sri Lanka'],
+    'SDN': ['Sudan'],
+    'SUR': ['Suriname'],
+    'SWE': ['Sweden'],
+    'CHE': ['Switzerland'],
+    'SYR': ['Syrian Arab Republic', 'Syria'],
+    'TWN': ['Taiwan', 'China, Taiwan Province of China', 'Taiwan Province of China'],
+    'TJK': ['Tajikistan'],
+    'THA': ['Thailand'],
+    'TLS': ['Timor-Leste', 'East Timor'],
+    'TGO': ['Togo'],
+    'TON': ['Tonga'],
+    'TTO': ['Trinidad and Tobago'],
+    'TUN': ['Tunisia'],
+    'TUR': ['Türkiye', 'Turkey', 'Turkiye'],
+    'TKM': ['Turkmenistan'],
+    'TCA': ['Turks and Caicos Islands', 'Turks and Caicos Is.'],
+    'TUV': ['Tuvalu'],
+    'UGA': ['Uganda'],
+    'UKR': ['Ukraine'],
+    'ARE': ['United Arab Emirates'],
+    'GBR': ['United Kingdom of Great Britain and Northern Ireland', 'United Kingdom', 'UK', 'Great Britain'],
+    'TZA': ['United Republic of Tanzania', 'Tanzania'],
+    'USA': ['United States of America', 'United States', 'USA'],
+    'VIR': ['United States Virgin Islands', 'U.S. Virgin Is.', 'US Virgin Islands'],
+    'URY': ['Uruguay'],
+    'UZB': ['Uzbekistan'],
+    'VUT': ['Vanuatu'],
+    'VEN': ['Venezuela (Bolivarian Republic of)', 'Venezuela', 'Bolivarian Republic of Venezuela'],
+    'VNM': ['Viet Nam', 'Vietnam'],
+    'ESH': ['Western Sahara', 'W. Sahara'],
+    'YEM': ['Yemen'],
+    'ZMB': ['Zambia'],
+    'ZWE': ['Zimbabwe'],
+}
+
+# Natural Earth Shapefile 中的名称列与代码列 (代码列依次尝试，'-99' 表示没有该代码)
+SHAPE_NAME_COLUMNS = ('ADMIN', 'NAME', 'NAME_LONG', 'NAME_EN', 'FORMAL_EN', 'BRK_NAME', 'GEOUNIT')
+ISO_CODE_COLUMNS = ('ISO_A3', 'ISO_A3_EH')
+FALLBACK_CODE_COLUMNS = ('ADM0_A3', 'SU_A3', 'GU_A3') # Natural Earth 自己的代码，不一定是 ISO 代码
+
+
+def normalize_name(name):
+    """名称规范化：去掉重音与标点，'&' 视为 'and'，忽略大小写与开头的 'the'"""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii').lower()
+    text = text.replace('&', ' and ').replace("'", '')
+    text = re.sub(r'[^a-z0-9]+', ' ', text).strip()
+    return re.sub(r'^the ', '', text)
+
+
+def entity_key(iso3):
+    """ISO3 (或 Natural Earth 的 ADM0_A3 等三字母代码) -> 整数实体键 (按 26 进制编码，可逆，< 17576)"""
+    code = iso3.upper()
+    if not re.fullmatch(r'[A-Z]{3}', code):
+        raise ValueError(f"无效的三字母代码: {iso3!r}")
+    return (ord(code[0]) - 65) * 676 + (ord(code[1]) - 65) * 26 + (ord(code[2]) - 65)
+
+
+def iso3_of(key):
+    """entity_key 的逆运算"""
+    return chr(65 + key // 676) + chr(65 + key // 26 % 26) + chr(65 + key % 26)
+
+
+def _row_code(row, columns):
+    for col in columns:
+        value = row.get(col)
+        if isinstance(value, str) and re.fullmatch(r'[A-Z]{3}', value):
+            return value
+    return None
+
+
+class ResolutionIndex:
+    """实体解析索引：任意名称变体 (规范化后) -> 整数实体键 (见 entity_key)
+
+    内置 ISO3_NAMES 中的写法，加上 add_shapes() 从 Shapefile 名称列学到的写法；
+    resolve() 找不到时返回 None，并记入 unmatched，供生成未匹配名称报告。
+    """
+    def __init__(self, aliases=None, labels=None):
+        self.aliases = dict(aliases or {}) # 规范化名称 -> 实体键
+        self.labels = dict(labels or {})   # 实体键 -> 显示名称 (M49 短名或 Shapefile ADMIN)
+        self.unmatched = {}                # 未解析的名称 -> 出现次数
+        self.resolved = set()              # 解析到的实体键
+        if not self.aliases:
+            for iso3, names in ISO3_NAMES.items():
+                self.add(iso3, names)
+
+    def add(self, iso3, names):
+        key = entity_key(iso3)
+        for name in names:
+            if name is None or (isinstance(name, float) and name != name):
+                continue
+            self.aliases.setdefault(normalize_name(name), key)
+        self.labels.setdefault(key, names[0])
+
+    def add_shapes(self, world):
+        """从 Shapefile 属性表 (DataFrame / GeoDataFrame) 学习名称变体，返回每行的实体键列表 (无法确定时为 None)
+
+        有 ISO 代码的行直接使用 ISO 代码；没有 ISO 代码的行 (如 110m 数据中的法国、挪威、科索沃
+        ISO_A3 为 -99) 先按名称匹配已知实体，匹配不到再使用 Natural Earth 自己的 ADM0_A3 等代码。
+        """
+        keys = []
+        for row in world.to_dict(orient='records'):
+            names = [row[col] for col in SHAPE_NAME_COLUMNS if isinstance(row.get(col), str)]
+            code = _row_code(row, ISO_CODE_COLUMNS)
+            if code is None:
+                known = next((self.aliases[normalize_name(n)] for n in names if normalize_name(n) in self.aliases), None)
+                if known is not None:
+                    code = iso3_of(known)
+                else:
+                    code = _row_code(row, FALLBACK_CODE_COLUMNS)
+            if code is None:
+                keys.append(None)
+                continue
+            self.add(code, names or [code])
+            keys.append(entity_key(code))
+        return keys
+
+    def resolve(self, name):
+        key = self.aliases.get(normalize_name(name))
+        if key is None:
+            self.unmatched[name] = self.unmatched.get(name, 0) + 1
+        else:
+            self.resolved.add(key)
+        return key
+
+    def resolve_many(self, names):
+        """批量解析 (每个不同的名称只解析一次)：返回与 names 等长的实体键列表"""
+        cache = {}
+        return [cache[n] if n in cache else cache.setdefault(n, self.resolve(n)) for n in names]
+
+    def report(self, shape_keys=None):
+        """未匹配报告：没有解析到实体键的名称，以及 (给出 shape_keys 时) 有数据但在 Shapefile 中没有几何的实体"""
+        report = {'unmatched_names': sorted(self.unmatched)}
+        if shape_keys is not None:
+            shapes = {k for k in shape_keys if k is not None}
+            report['entities_without_geometry'] = sorted(self.labels.get(k, iso3_of(k)) for k in self.resolved - shapes)
+        return report
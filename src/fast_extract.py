@@ -0,0 +1,40 @@
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+# 年份页面上真正会被读取的只有这些子树：
+#   div.upper-part (总量数据，含 circle-chart__percent 回收率)
+#   div.bottom-part.upper-part.row (人均数据，同样带有 upper-part 类)
+#   p.pop-number (人口)
+# 用正则而不是类名列表：多值 class (如 "bottom-part upper-part row") 在不同 bs4 版本中
+# 可能按整串或逐个类名匹配，正则在两种情况下都能命中。
+YEAR_PAGE_STRAINER = SoupStrainer(['div', 'p'], class_=re.compile(r'(^|\s)(upper-part|pop-number)(\s|$)'))
+
+# 后端名称 -> (BeautifulSoup 解析器, 是否只解析上述子树)
+EXTRACT_BACKENDS = {
+    'full': ('html.parser', False), # 原有方式：完整构建整棵文档树
+    'fast': ('html.parser', True),  # 纯 Python 解析器 + SoupStrainer 选择性解析
+    'lxml': ('lxml', True),         # C 加速的 lxml 解析器 + SoupStrainer (需要安装 lxml)
+}
+
+
+def parse_year_html(text, backend='full'):
+    """按指定后端解析年份页面 HTML，返回可直接交给 _parse_year_page 的 soup"""
+    try:
+        parser, strained = EXTRACT_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"未知的提取后端: {backend} (可选: {', '.join(EXTRACT_BACKENDS)})")
+    if strained:
+        return BeautifulSoup(text, parser, parse_only=YEAR_PAGE_STRAINER)
+    return BeautifulSoup(text, parser)
+
+
+def check_backend(backend):
+    """确认后端依赖可用，不可用时抛出 ImportError"""
+    parser, _ = EXTRACT_BACKENDS.get(backend, (None, None))
+    if parser == 'lxml':
+        try:
+            import lxml # noqa: F401
+        except ImportError:
+            raise ImportError("lxml 提取后端需要安装 lxml: pip install lxml")
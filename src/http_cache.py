@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class CacheEntry:
+    """缓存中的一条响应"""
+    __slots__ = ('url', 'etag', 'last_modified', 'text', 'fetched_at')
+
+    def __init__(self, url, etag, last_modified, text, fetched_at):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.text = text
+        self.fetched_at = fetched_at
+
+
+class HttpCache:
+    """基于 SQLite 的持久化 HTTP 响应缓存 (按 URL 索引)
+
+    - 页面正文使用 zlib 压缩存储，同时保存 ETag / Last-Modified；
+    - 再次请求时附带 If-None-Match / If-Modified-Since，服务器返回 304 时直接使用缓存；
+    - cache_only=True 时完全离线，只从缓存读取，未命中视为获取失败。
+    """
+    def __init__(self, path, cache_only=False):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.cache_only = cache_only
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   url TEXT PRIMARY KEY,
+                   etag TEXT,
+                   last_modified TEXT,
+                   body BLOB NOT NULL,
+                   fetched_at REAL NOT NULL,
+                   validated_at REAL NOT NULL
+               )"""
+        )
+        self._conn.commit()
+        # 运行统计
+        self.fresh_downloads = 0 # 200，正文已下载并写入缓存
+        self.revalidated = 0     # 304，正文来自缓存
+        self.offline_hits = 0    # 离线模式下命中
+        self.misses = 0          # 离线模式下未命中
+        self.bytes_saved = 0     # 因 304/离线命中而免于下载的正文字节数 (解压后)
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body, fetched_at = row
+        return CacheEntry(url, etag, last_modified, zlib.decompress(body).decode('utf-8'), fetched_at)
+
+    def iter_entries(self):
+        """遍历缓存中的全部条目 (用于离线基准测试等)"""
+        with self._lock:
+            urls = [r[0] for r in self._conn.execute("SELECT url FROM responses ORDER BY url")]
+        for url in urls:
+            entry = self.get(url)
+            if entry is not None:
+                yield entry
+
+    def conditional_headers(self, entry):
+        """根据缓存条目生成条件请求头"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def lookup_offline(self, url):
+        """离线模式下读取缓存，未命中返回 None"""
+        entry = self.get(url)
+        if entry is None:
+            self.misses += 1
+            print(f"  错误：离线缓存中没有 {url}")
+            return None
+        self.offline_hits += 1
+        self.bytes_saved += len(entry.text)
+        return entry.text
+
+    def revalidated_text(self, entry):
+        """服务器返回 304 时调用，刷新校验时间并返回缓存正文"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET validated_at = ? WHERE url = ?", (time.time(), entry.url))
+            self._conn.commit()
+        self.revalidated += 1
+        self.bytes_saved += len(entry.text)
+        return entry.text
+
+    def store(self, url, headers, text):
+        """写入 (或覆盖) 一条 200 响应"""
+        now = time.time()
+        body = zlib.compress(text.encode('utf-8'), 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, body, fetched_at, validated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, headers.get('ETag'), headers.get('Last-Modified'), body, now, now)
+            )
+            self._conn.commit()
+        self.fresh_downloads += 1
+
+    def stats(self):
+        return {
+            'fresh_downloads': self.fresh_downloads,
+            'revalidated_304': self.revalidated,
+            'offline_hits': self.offline_hits,
+            'offline_misses': self.misses,
+            'bytes_saved': self.bytes_saved,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
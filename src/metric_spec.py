@@ -0,0 +1,136 @@
+import re
+
+
+# 声明式指标规格：页面区块 -> [(标题关键字, 输出列, 单位)]
+# 标题 (h3，不区分大小写) 包含关键字即命中；同一区块内按列表顺序取第一个命中的关键字。
+METRIC_SPEC = {
+    # div.upper-part：总量数据
+    'upper': [
+        ('e-waste generated', 'E-waste Generated (kt)', 'kt'),
+        ('eee put on market', 'EEE Put on Market (kt)', 'kt'),
+        ('e-waste formally collected', 'E-waste Formally Collected (kt)', 'kt'),
+        ('e-waste imported', 'E-waste Imported (kt)', 'kt'),
+        ('e-waste exported', 'E-waste Exported (kt)', 'kt'),
+    ],
+    # div.bottom-part.upper-part.row：人均数据
+    'bottom': [
+        ('e-waste generated', 'E-waste Generated (kg/capita)', 'kg/capita'),
+        ('eee put on market', 'EEE Put on Market (kg/capita)', 'kg/capita'),
+    ],
+}
+# 回收率不在 p.num 中，而是环形图里的 text.circle-chart__percent
+COLLECTION_RATE = ('e-waste collection rate', 'E-waste Collection Rate (%)', '%')
+
+# 数值所在 <p> 的完整 class 字符串
+VALUE_CLASSES = frozenset(['num bignum', 'num middlenum', 'num bignum pomEEE', 'num middlenum pomEEE'])
+BOTTOM_CLASS = 'bottom-part upper-part row'
+
+_NON_NUMERIC = re.compile(r'[^\d.]+')
+
+
+def parse_number(text):
+    """从文本中提取数字：'n/a' 原样保留；去掉数字与小数点以外的字符；多个小数点时只取前两段"""
+    if not text:
+        return None
+    cleaned = text.strip().lower()
+    if cleaned == 'n/a':
+        return 'n/a' # 保留 n/a 作为一个明确的值
+    digits = _NON_NUMERIC.sub('', cleaned)
+    if not digits: # 例如只有 '%'
+        return None
+    head, dot, tail = digits.partition('.')
+    try:
+        return float(head + dot + tail.split('.', 1)[0])
+    except ValueError:
+        return None # 例如只剩一个 '.'
+
+
+def _class_string(tag):
+    return ' '.join(tag.get('class') or ())
+
+
+def _is_block(tag):
+    return tag.name == 'div' and 'single-data' in (tag.get('class') or ())
+
+
+def _is_value(tag):
+    return tag.name == 'p' and _class_string(tag) in VALUE_CLASSES
+
+
+def _is_upper(tag):
+    return tag.name == 'div' and 'upper-part' in (tag.get('class') or ())
+
+
+def _is_bottom(tag):
+    return tag.name == 'div' and _class_string(tag) == BOTTOM_CLASS
+
+
+def _is_percent(tag):
+    return tag.name == 'text' and 'circle-chart__percent' in (tag.get('class') or ())
+
+
+class CompiledMetricSpec:
+    """把 METRIC_SPEC 编译为 (关键字, 列) 元组和标签判定函数，每个页面只需对每个数据块遍历一次
+
+    取值规则与原 _extract_metrics 保持一致：
+      - 总量区块中同一标题只取第一次出现的值，回收率取自环形图；
+      - 人均区块中后出现的值覆盖先出现的值。
+    """
+    def __init__(self, spec=None, collection_rate=COLLECTION_RATE):
+        spec = spec or METRIC_SPEC
+        self.upper = tuple((keyword, column) for keyword, column, _ in spec['upper'])
+        self.bottom = tuple((keyword, column) for keyword, column, _ in spec['bottom'])
+        self.rate_keyword, self.rate_column, _ = collection_rate
+        self.units = {column: unit for section in spec.values() for _, column, unit in section}
+        self.units[self.rate_column] = collection_rate[2]
+
+    @staticmethod
+    def _match(rules, title_lower):
+        for keyword, column in rules:
+            if keyword in title_lower:
+                return column
+        return None
+
+    def extract(self, soup, data):
+        """把页面上的指标写入 data (只写命中的列)"""
+        upper_part = soup.find(_is_upper)
+        if upper_part is not None:
+            processed_titles = set()
+            for item in upper_part.find_all(_is_block):
+                title = item.find('h3')
+                if title is None:
+                    continue
+                title_raw = title.text.strip()
+                if title_raw in processed_titles:
+                    continue
+                title_lower = title_raw.lower()
+                if self.rate_keyword in title_lower:
+                    percent = item.find(_is_percent)
+                    if percent is not None:
+                        data[self.rate_column] = parse_number(percent.text)
+                        processed_titles.add(title_raw)
+                    continue
+                column = self._match(self.upper, title_lower)
+                if column is None:
+                    continue
+                value = item.find(_is_value)
+                if value is not None:
+                    data[column] = parse_number(value.text.strip())
+                    processed_titles.add(title_raw)
+
+        bottom_part = soup.find(_is_bottom)
+        if bottom_part is not None:
+            for item in bottom_part.find_all(_is_block):
+                title = item.find('h3')
+                if title is None:
+                    continue
+                column = self._match(self.bottom, title.text.strip().lower())
+                if column is None:
+                    continue
+                value = item.find(_is_value)
+                if value is not None:
+                    data[column] = parse_number(value.text.strip())
+        return data
+
+
+COMPILED_SPEC = CompiledMetricSpec()
@@ -0,0 +1,112 @@
+import gzip
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+
+# 这些头描述的是传输层编码，归档里保存的是解码后的正文，因此不保留
+_DROPPED_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length', 'connection'}
+
+
+class PageArchiveWriter:
+    """录制模式：把每个原始 HTTP 响应追加写入 WARC 格式的归档
+
+    - 每条记录单独 gzip 压缩 (与 .warc.gz 惯例一致，可用 warcio 等工具读取)；
+    - 同时维护 <归档>.idx 索引 (JSON Lines：url, offset, length, status, encoding)，
+      回放时按偏移直接定位，无需扫描整个归档。
+    """
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.index_path = path + '.idx'
+        self._lock = threading.Lock()
+        self._data = open(path, 'ab')
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+        self.records = 0
+
+    def record(self, url, status, headers, body, encoding):
+        """写入一条响应；body 为解码 (解压) 后的正文字节，encoding 为解析正文时使用的字符集"""
+        reason = HTTPStatus(status).phrase if status in HTTPStatus._value2member_map_ else ''
+        header_lines = ''.join(f'{k}: {v}\r\n' for k, v in headers.items() if k.lower() not in _DROPPED_HEADERS)
+        http_block = (f'HTTP/1.1 {status} {reason}\r\n{header_lines}Content-Length: {len(body)}\r\n\r\n'
+                      .encode('iso-8859-1', errors='replace') + body)
+        warc_headers = (
+            'WARC/1.0\r\n'
+            'WARC-Type: response\r\n'
+            f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n'
+            f'WARC-Date: {datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}\r\n'
+            f'WARC-Target-URI: {url}\r\n'
+            f'WARC-X-Decoded-Encoding: {encoding or "utf-8"}\r\n'
+            'Content-Type: application/http; msgtype=response\r\n'
+            f'Content-Length: {len(http_block)}\r\n\r\n'
+        ).encode('utf-8')
+        member = gzip.compress(warc_headers + http_block + b'\r\n\r\n')
+        with self._lock:
+            offset = self._data.tell()
+            self._data.write(member)
+            self._data.flush()
+            self._index.write(json.dumps({'url': url, 'offset': offset, 'length': len(member),
+                                          'status': status, 'encoding': encoding or 'utf-8'}) + '\n')
+            self._index.flush()
+            self.records += 1
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._index.close()
+        print(f"已录制 {self.records} 个响应到归档: {self.path}")
+
+
+class PageArchive:
+    """回放模式：整个归档读入内存，按索引定位并解压单条记录，完全不访问网络"""
+    def __init__(self, path):
+        if not os.path.exists(path + '.idx'):
+            raise FileNotFoundError(f"找不到归档索引: {path}.idx")
+        with open(path, 'rb') as f:
+            self._data = f.read()
+        self._index = {}
+        with open(path + '.idx', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._index[entry['url']] = entry # 同一 URL 多次录制时以最后一次为准
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def urls(self):
+        return list(self._index)
+
+    def get(self, url):
+        """返回 (状态码, 响应头 dict, 正文文本)；归档中没有该 URL 时返回 None"""
+        entry = self._index.get(url)
+        if entry is None:
+            return None
+        raw = gzip.decompress(self._data[entry['offset']:entry['offset'] + entry['length']])
+        _, _, http_block = raw.partition(b'\r\n\r\n')          # 去掉 WARC 头
+        head, _, body = http_block.partition(b'\r\n\r\n')      # HTTP 头 / 正文 (含记录结尾的分隔符)
+        lines = head.decode('iso-8859-1').split('\r\n')
+        headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+        body = body[:int(headers.get('Content-Length', len(body)))]
+        return entry['status'], headers, body.decode(entry['encoding'], errors='replace')
+
+    def get_text(self, url):
+        """回放一个页面的正文；未命中或非 200 响应返回 None"""
+        response = self.get(url)
+        if response is None or response[0] != 200:
+            self.misses += 1
+            print(f"  错误：归档中没有 {url} 的有效响应")
+            return None
+        self.hits += 1
+        return response[2]
+
+    def stats(self):
+        return {'archived_urls': len(self._index), 'replay_hits': self.hits, 'replay_misses': self.misses}
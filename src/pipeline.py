@@ -0,0 +1,293 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fast_extract import parse_year_html
+from record_table import RecordTable
+
+
+_SENTINEL = object()
+
+# 解析进程中的收集器实例 (每个进程一个，由 _init_parse_worker 创建)
+_worker_collector = None
+
+
+def _init_parse_worker(extract_backend):
+    """解析进程初始化：只需要收集器的提取逻辑，不会发出任何网络请求"""
+    global _worker_collector
+    from data_collector import EwasteDataCollector
+    _worker_collector = EwasteDataCollector(extract_backend=extract_backend)
+
+
+def _parse_year_html_worker(html, url, category, name, year):
+    """在解析进程中运行，等价于 _extract_year_data 的解析部分；同时返回 (解析耗时, 提取耗时)"""
+    start = time.perf_counter()
+    soup = parse_year_html(html, _worker_collector.extract_backend)
+    parsed = time.perf_counter()
+    record = _worker_collector._parse_year_page(soup, url, category, name, year)
+    return record, (parsed - start, time.perf_counter() - parsed)
+
+
+class CrawlPipeline:
+    """抓取与解析解耦的流水线
+
+      I/O 线程 (fetch_workers 个) ──> 有界队列 (fetch_queue_size) ──> 解析进程池 (parse_workers 个)
+                                                                       │
+      写入线程 <── 结果队列 (result_queue_size) <───────────────────────┘
+
+    - I/O 线程抓取详情页 (轻量解析年份链接) 和年份页面原始 HTML；
+    - 年份页面的 HTML 解析是 CPU 密集型的，交给 ProcessPoolExecutor 在多核上并行，
+      同时在途的解析任务数受 parse_inflight 限制；
+    - 写入线程消费记录：写检查点日志、调用 sink，并按与 collect_data 相同的顺序汇总。
+    任一队列满时上游阻塞，从而形成背压；配合 keep_records=False，内存占用不会随抓取规模增长。
+    """
+    def __init__(self, collector, fetch_workers=8, parse_workers=None, fetch_queue_size=64,
+                 parse_inflight=None, result_queue_size=256, sink=None, keep_records=True):
+        self.collector = collector
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.fetch_queue_size = fetch_queue_size
+        self.parse_inflight = parse_inflight or self.parse_workers * 2
+        self.result_queue_size = result_queue_size
+        self.sink = sink # 可选，每条记录写入时按完成顺序调用 sink(record)
+        self.keep_records = keep_records # False 时不在内存中保留记录，run() 返回空列表
+        self.record_count = 0
+        self._results = {}
+        self._results_lock = threading.Lock()
+
+    # --- I/O 阶段 ---
+    def _fetch_unit(self, category, name, year, year_url):
+        """获取一个年份单元：('done', 记录) 来自检查点日志，('parsed', 记录) 正文未变化，
+        ('html', (文本, 正文哈希)) 待解析；获取失败返回 None"""
+        journal = self.collector.journal
+        if journal is not None:
+            done, record = journal.get_unit(category, name, year)
+            if done:
+                return 'done', record
+        html = self.collector._fetch_html(year_url, kind='year')
+        if html is None:
+            return None # 获取失败不写入日志，续跑时会重试
+        digest, unchanged, record = self.collector._unchanged_year_record(html, year_url, category, name, year)
+        if unchanged: # 正文与上次相同：直接使用上次的记录，不再提交解析
+            return 'parsed', record
+        return 'html', (html, digest)
+
+    def _submit_unit(self, key, category, name, year, year_url, unit):
+        kind, value = unit
+        if kind == 'html':
+            self._fetch_queue.put((key, category, name, year, year_url, value)) # 队列满时阻塞 (背压)
+        else: # 'parsed' 为本线程刚解析的新记录，需要写日志；'done' / 'reused' 已在日志中
+            self._result_queue.put((key, category, name, year, year_url, value, kind == 'parsed'))
+
+    def _parse_in_thread(self, page, year_url, category, name, year):
+        """URL 规划器学习阶段需要立即拿到记录，此时在 I/O 线程中直接解析 (只涉及最初几个项目)"""
+        html, digest = page
+        try:
+            soup = parse_year_html(html, self.collector.extract_backend)
+            record = self.collector._parse_year_page(soup, year_url, category, name, year)
+        except Exception as e:
+            print(f"    错误：处理 {category}-{name} 年份 {year} ({year_url}) 时出错: {e}")
+            return None
+        self._remember_page(year_url, digest, record)
+        return 'parsed', record
+
+    def _remember_page(self, year_url, digest, record):
+        if digest is not None:
+            self.collector.changes.remember_page(year_url, digest, record)
+
+    def _fetch_entity(self, index, category, name, detail_url, target_years):
+        resumed = self.collector._resume_entity(category, name, target_years)
+        if resumed is not None:
+            for pos, record in enumerate(resumed):
+                self._result_queue.put(((index, pos), category, name, None, None, record, False))
+            return None
+
+        started = time.monotonic()
+        telemetry = self.collector.telemetry
+        planner = self.collector.planner
+        # 规划器已学到年份 URL 模板时，直接请求目标年份页面，跳过详情页；全部获取成功才提交
+        direct_links = planner.direct_links(detail_url, target_years) if planner is not None else None
+        prefetched = {}
+        if direct_links:
+            units = [self._fetch_unit(category, name, year, year_url) for year, year_url in direct_links]
+            if all(units):
+                for pos, ((year, year_url), unit) in enumerate(zip(direct_links, units)):
+                    self._submit_unit((index, pos), category, name, year, year_url, unit)
+                if telemetry is not None:
+                    telemetry.observe_entity(time.monotonic() - started)
+                return direct_links
+            prefetched = {year_url: unit for (_, year_url), unit in zip(direct_links, units) if unit}
+            planner.record_fallback() # 模板未命中：回退到详情页流程
+
+        soup = self.collector._get_page_data(detail_url)
+        if not soup:
+            return None
+        year_links = self.collector._get_year_links(soup, category, name, target_years)
+        reuse_year = planner.reusable_year(detail_url, year_links, soup) if planner is not None else None
+        learning = planner is not None and planner.learning
+        records_by_year = {}
+        for pos, (year, year_url) in enumerate(year_links):
+            unit = prefetched.get(year_url)
+            if unit is None and year == reuse_year:
+                record = self.collector._reuse_detail_record(soup, year_url, category, name, year)
+                unit = ('reused', record) if record is not None else None
+            if unit is None:
+                unit = self._fetch_unit(category, name, year, year_url)
+            if unit is not None and unit[0] == 'html' and learning:
+                unit = self._parse_in_thread(unit[1], year_url, category, name, year)
+            if unit is None:
+                continue
+            if unit[0] != 'html' and unit[1]:
+                records_by_year[year] = unit[1]
+            self._submit_unit((index, pos), category, name, year, year_url, unit)
+        if learning:
+            self.collector._learn_year_urls(soup, detail_url, category, name, year_links, records_by_year)
+        if telemetry is not None:
+            telemetry.observe_entity(time.monotonic() - started) # 只含抓取阶段，解析在进程池中异步完成
+        return year_links
+
+    def _fetch_loop(self, entity_queue, year_links_by_entity, target_years):
+        while True:
+            try:
+                index, category, name, detail_url = entity_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                year_links_by_entity[index] = self._fetch_entity(index, category, name, detail_url, target_years)
+            except Exception as e:
+                print(f"  严重错误：处理 {category}-{name} ({detail_url}) 数据时发生意外错误: {e}")
+
+    # --- 解析阶段 ---
+    def _dispatch_loop(self, executor):
+        inflight = threading.BoundedSemaphore(self.parse_inflight)
+        self._outstanding = 0 # 已提交、结果尚未放入结果队列的解析任务数
+        self._outstanding_done = threading.Condition()
+        while True:
+            item = self._fetch_queue.get()
+            if item is _SENTINEL:
+                break
+            key, category, name, year, year_url, (html, digest) = item
+            inflight.acquire()
+            with self._outstanding_done:
+                self._outstanding += 1
+            try:
+                future = executor.submit(_parse_year_html_worker, html, year_url, category, name, year)
+            except Exception:
+                self._parse_finished(inflight)
+                raise
+            future.add_done_callback(
+                lambda f, meta=(key, category, name, year, year_url, digest): self._on_parsed(f, meta, inflight))
+        # future 完成时先唤醒等待者、后运行回调，因此以回调放入结果为准：计数归零后才结束写入线程
+        with self._outstanding_done:
+            while self._outstanding:
+                self._outstanding_done.wait()
+        self._result_queue.put(_SENTINEL)
+
+    def _parse_finished(self, inflight):
+        inflight.release()
+        with self._outstanding_done:
+            self._outstanding -= 1
+            self._outstanding_done.notify_all()
+
+    def _on_parsed(self, future, meta, inflight):
+        key, category, name, year, year_url, digest = meta
+        try:
+            record, (parse_seconds, extract_seconds) = future.result()
+            telemetry = self.collector.telemetry
+            if telemetry is not None:
+                telemetry.observe_parse('year', parse_seconds)
+                telemetry.observe_parse('extract', extract_seconds)
+            self._remember_page(year_url, digest, record)
+        except Exception as e:
+            print(f"    错误：处理 {category}-{name} 年份 {year} ({year_url}) 时出错: {e}")
+            record = _SENTINEL # 解析出错：不写入日志
+        try:
+            self._result_queue.put((key, category, name, year, year_url, record, True))
+        finally:
+            self._parse_finished(inflight)
+
+    # --- 写入阶段 ---
+    def _write_loop(self):
+        """消费结果队列直到收到结束标记；某条记录写入出错时记下第一个异常并继续消费 (否则上游会阻塞在 put 上)，
+        由 run() 在结束后重新抛出"""
+        journal = self.collector.journal
+        while True:
+            item = self._result_queue.get()
+            if item is _SENTINEL:
+                return
+            key, category, name, year, year_url, record, fresh = item
+            if record is _SENTINEL:
+                continue
+            try:
+                if fresh and journal is not None:
+                    journal.record_unit(category, name, year, year_url, record)
+                if record:
+                    self.record_count += 1
+                    if self.collector.telemetry is not None:
+                        self.collector.telemetry.add_records(1)
+                    if self.sink is not None:
+                        self.sink(record)
+                    if self.keep_records:
+                        with self._results_lock:
+                            self._results[key] = record
+            except Exception as e:
+                print(f"    错误：写入 {category}-{name} 年份 {year} 的记录时出错: {e}")
+                if self._write_error is None:
+                    self._write_error = e
+
+    def _ordered_results(self):
+        with self._results_lock:
+            return RecordTable(self._results[k] for k in sorted(self._results))
+
+    def run(self, base_url, targets=None, target_years=None):
+        """运行流水线，返回与 collect_data 顺序一致的记录列表；用户中断时返回已写入的记录"""
+        soup = self.collector._get_page_data(base_url)
+        if not soup:
+            print("错误：无法获取基础页面，收集终止。")
+            return []
+        entities = list(self.collector._iter_entities(soup, targets))
+        print(f"总共需要处理约 {len(entities)} 个项目 (I/O 线程 {self.fetch_workers}，解析进程 {self.parse_workers})。")
+
+        entity_queue = queue.Queue()
+        for index, (category, name, detail_url) in enumerate(entities):
+            entity_queue.put((index, category, name, detail_url))
+        self._fetch_queue = queue.Queue(maxsize=self.fetch_queue_size)
+        self._result_queue = queue.Queue(maxsize=self.result_queue_size)
+        self._results = {}
+        self.record_count = 0
+        self._write_error = None
+        year_links_by_entity = {}
+
+        executor = ProcessPoolExecutor(max_workers=self.parse_workers, initializer=_init_parse_worker,
+                                       initargs=(self.collector.extract_backend,))
+        writer = threading.Thread(target=self._write_loop, name='pipeline-writer', daemon=True)
+        dispatcher = threading.Thread(target=self._dispatch_loop, args=(executor,), name='pipeline-dispatch', daemon=True)
+        fetchers = [threading.Thread(target=self._fetch_loop, args=(entity_queue, year_links_by_entity, target_years),
+                                     name=f'pipeline-fetch-{i}', daemon=True)
+                    for i in range(self.fetch_workers)]
+        try:
+            writer.start()
+            dispatcher.start()
+            for t in fetchers:
+                t.start()
+            for t in fetchers:
+                while t.is_alive():
+                    t.join(timeout=0.5) # 带超时的 join 使主线程能及时响应 Ctrl+C
+            self._fetch_queue.put(_SENTINEL)
+            dispatcher.join()
+            writer.join()
+        except KeyboardInterrupt:
+            print("\n用户中断操作。")
+            executor.shutdown(wait=False, cancel_futures=True)
+            return self._ordered_results()
+        executor.shutdown()
+        if self._write_error is not None:
+            raise self._write_error
+
+        for index, (category, name, _) in enumerate(entities):
+            year_links = year_links_by_entity.get(index)
+            if year_links:
+                self.collector._checkpoint_entity(category, name, year_links, target_years)
+        return self._ordered_results()
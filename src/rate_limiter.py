@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+
+THROTTLE_STATUS = (429, 503) # 服务器明确要求放慢速度的状态码
+
+
+class AdaptiveRateLimiter:
+    """自适应令牌桶限速器 (AIMD：加性增、乘性减)
+
+    - 每个请求发出前调用 acquire()/acquire_async() 取一个令牌；
+    - 请求结束后调用 record() 反馈状态码与延迟：
+      状态正常且延迟低于目标时按 increase_step 线性提速，
+      遇到 429/503 或 Retry-After 时按 decrease_factor 成倍降速，
+      Retry-After 还会让所有请求暂停到指定时刻。
+    同步抓取与异步抓取可以共用同一个实例。
+    """
+    def __init__(self, initial_rate=1.0, min_rate=0.1, max_rate=8.0, burst=2,
+                 increase_step=0.1, decrease_factor=0.5, latency_target=2.0):
+        self.rate = float(initial_rate)      # 当前速率 (请求/秒)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst                   # 令牌桶容量，允许的瞬时突发请求数
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target # 超过该延迟 (秒) 视为服务器吃紧，不再提速
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        # 可观察的状态
+        self.requests = 0
+        self.throttles = 0
+        self.total_wait = 0.0
+        self.peak_rate = self.rate
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def _reserve(self):
+        """预留一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            wait = max(wait, self._blocked_until - now)
+            self.requests += 1
+            self.total_wait += wait
+            return wait
+
+    def acquire(self):
+        """阻塞直到允许发出下一个请求"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire 的协程版本"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, status, latency, retry_after=None):
+        """根据一次请求的结果调整速率；返回 True 表示该请求被限流 (429/503)，应当重试"""
+        throttled = status in THROTTLE_STATUS
+        retry_seconds = self._parse_retry_after(retry_after) if throttled else None # 只有 429/503 的 Retry-After 有效
+        with self._lock:
+            if throttled:
+                self.throttles += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self._tokens = min(self._tokens, 0.0) # 丢弃积攒的突发额度
+                if retry_seconds:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + retry_seconds)
+            elif status is not None and status < 400 and latency <= self.latency_target:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+                self.peak_rate = max(self.peak_rate, self.rate)
+        return throttled
+
+    @staticmethod
+    def _parse_retry_after(value):
+        """解析 Retry-After 头 (只支持秒数形式)"""
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(str(value).strip()))
+        except ValueError:
+            return None
+
+    def stats(self):
+        """返回当前状态的快照，便于打印或写入日志"""
+        with self._lock:
+            return {
+                'current_rate': round(self.rate, 3),
+                'peak_rate': round(self.peak_rate, 3),
+                'requests': self.requests,
+                'throttles': self.throttles,
+                'total_wait_seconds': round(self.total_wait, 2),
+            }
+
+    def __repr__(self):
+        s = self.stats()
+        return (f"AdaptiveRateLimiter(rate={s['current_rate']}/s, peak={s['peak_rate']}/s, "
+                f"requests={s['requests']}, throttles={s['throttles']})")
@@ -0,0 +1,158 @@
+import math
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from columnar_export import METRIC_COLUMNS, NA_SUFFIX
+
+
+NAN = float('nan')
+
+
+class _Dictionary:
+    """字符串字典编码：值 -> 编号 (Category / Name / Year 的取值很少，每条记录只保存编号)"""
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class RecordTable:
+    """收集过程中按列累积记录的紧凑容器 (代替 dict 列表)
+
+    - Category / Name / Year 字典编码为 uint32 编号；
+    - 每个指标一个 float64 数组 (array('d'))，缺失与 'n/a' 都存为 NaN，
+      另用每条记录一个 uint16 位掩码标记哪些指标是网站明确标注的 'n/a'；
+    - Source URL 为字符串列表。
+    一条记录约占 100 字节 (不含 URL 字符串本身)，而 13 键的 dict 加上其中的 float 对象约 700 字节。
+    接口与记录列表兼容：len()、迭代 / 下标得到与原来相同的 dict，extend() / append() 追加 dict；
+    to_frame() / to_typed_frame() 直接在这些数组上构造 DataFrame，不逐条复制。
+    """
+    def __init__(self, records=None):
+        self._categories = _Dictionary()
+        self._names = _Dictionary()
+        self._years = _Dictionary()
+        self._category_codes = array('I')
+        self._name_codes = array('I')
+        self._year_codes = array('I')
+        self._metrics = [array('d') for _ in METRIC_COLUMNS]
+        self._na_bits = array('H') # 第 i 位为 1：METRIC_COLUMNS[i] 是 'n/a'
+        self._urls = []
+        if records is not None:
+            self.extend(records)
+
+    def __len__(self):
+        return len(self._urls)
+
+    def append(self, record):
+        self._category_codes.append(self._categories.code(record['Category']))
+        self._name_codes.append(self._names.code(record['Name']))
+        self._year_codes.append(self._years.code(str(record['Year'])))
+        bits = 0
+        for i, col in enumerate(METRIC_COLUMNS):
+            value = record.get(col)
+            if value is None:
+                value = NAN
+            elif isinstance(value, str):
+                if value.strip().lower() == 'n/a':
+                    bits |= 1 << i
+                    value = NAN
+                else:
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        value = NAN
+            self._metrics[i].append(value)
+        self._na_bits.append(bits)
+        self._urls.append(record.get('Source URL'))
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def _record(self, index):
+        bits = self._na_bits[index]
+        record = {
+            'Category': self._categories.values[self._category_codes[index]],
+            'Name': self._names.values[self._name_codes[index]],
+            'Year': self._years.values[self._year_codes[index]],
+        }
+        for i, col in enumerate(METRIC_COLUMNS):
+            value = self._metrics[i][index]
+            record[col] = 'n/a' if bits >> i & 1 else (None if math.isnan(value) else value)
+        record['Source URL'] = self._urls[index]
+        return record
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RecordTable index out of range")
+        return self._record(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._record(i)
+
+    # --- 转为 DataFrame ---
+    # 注意：返回的 DataFrame 与本对象共享内存，在其存活期间不能再追加记录 (array 会拒绝扩容)。
+    def _codes(self, codes, dictionary):
+        return pd.Categorical.from_codes(np.frombuffer(codes, dtype=np.uint32).astype(np.int32, copy=False),
+                                         categories=pd.Index(dictionary.values))
+
+    def _metric(self, i):
+        return np.frombuffer(self._metrics[i], dtype=np.float64) if len(self) else np.empty(0)
+
+    def _na_mask(self, i):
+        return (np.frombuffer(self._na_bits, dtype=np.uint16) >> i & 1).astype(bool) if len(self) else np.empty(0, bool)
+
+    def _url_column(self):
+        return pd.array(self._urls, dtype='string')
+
+    def to_frame(self):
+        """转换为与 pd.DataFrame(记录列表) 相同内容的 DataFrame (save_data 的格式)
+
+        没有 'n/a' 的指标列直接使用 float64 数组 (不复制)；含 'n/a' 的列为 object 列，
+        缺失为 None、'n/a' 为字符串，与原来的记录列表转换结果一致。
+        """
+        columns = {
+            'Category': self._codes(self._category_codes, self._categories),
+            'Name': self._codes(self._name_codes, self._names),
+            'Year': self._codes(self._year_codes, self._years),
+        }
+        for i, col in enumerate(METRIC_COLUMNS):
+            values, na = self._metric(i), self._na_mask(i)
+            missing = np.isnan(values)
+            if na.any() or missing.all():
+                column = values.astype(object)
+                column[missing] = None
+                column[na] = 'n/a'
+                values = column
+            columns[col] = values
+        columns['Source URL'] = self._url_column()
+        return pd.DataFrame(columns, copy=False)
+
+    def to_typed_frame(self):
+        """转换为与 columnar_export.to_typed_frame 相同的强类型 DataFrame (指标列不复制)"""
+        columns = {
+            'Category': self._codes(self._category_codes, self._categories),
+            'Name': self._codes(self._name_codes, self._names),
+            'Year': pd.to_numeric(pd.Series(self._years.values, dtype=object), errors='coerce')
+                      .to_numpy()[np.frombuffer(self._year_codes, dtype=np.uint32)].astype('int16')
+                    if len(self) else np.empty(0, np.int16),
+        }
+        for i, col in enumerate(METRIC_COLUMNS):
+            columns[col] = self._metric(i)
+        for i, col in enumerate(METRIC_COLUMNS):
+            columns[col + NA_SUFFIX] = self._na_mask(i)
+        columns['Source URL'] = self._url_column()
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,211 @@
+import heapq
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+_DURATION = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*$')
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+DAY = 86400
+DISCOVERY = '*' # units 表中记录项目详情页 (年份列表) 上次检查时间的伪年份
+
+
+def parse_duration(text):
+    """解析时长字符串为秒：如 '45s'、'30m'、'12h'、'1d'、'2w'，不带单位时按秒计"""
+    match = _DURATION.match(str(text).lower())
+    if not match:
+        raise ValueError(f"无法解析的时长: {text!r} (示例: 12h, 1d, 30d)")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+class FreshnessPolicy:
+    """每个 (类别, 名称, 年份) 单元的有效期 (TTL，秒)
+
+    - year_ttls 中列出的年份使用指定的 TTL；
+    - 否则最新年份使用 latest_ttl，其余年份使用 default_ttl；
+    - category_ttls 中列出的类别取 (年份 TTL, 类别 TTL) 中较短者。
+    """
+    def __init__(self, latest_ttl=DAY, default_ttl=30 * DAY, year_ttls=None, category_ttls=None):
+        self.latest_ttl = latest_ttl
+        self.default_ttl = default_ttl
+        self.year_ttls = dict(year_ttls or {})
+        self.category_ttls = dict(category_ttls or {})
+
+    @classmethod
+    def from_rules(cls, rules, latest_ttl=DAY, default_ttl=30 * DAY):
+        """由命令行规则构造：'2018=365d'、'2018-2020=365d' (年份) 或 'Country=7d' (类别)"""
+        year_ttls, category_ttls = {}, {}
+        for rule in rules or ():
+            key, sep, value = rule.partition('=')
+            key = key.strip()
+            if not sep or not key:
+                raise ValueError(f"无法解析的 TTL 规则: {rule!r} (示例: 2018-2020=365d, Country=7d)")
+            ttl = parse_duration(value)
+            span = re.fullmatch(r'(\d{4})(?:-(\d{4}))?', key)
+            if span:
+                first, last = int(span.group(1)), int(span.group(2) or span.group(1))
+                for year in range(min(first, last), max(first, last) + 1):
+                    year_ttls[str(year)] = ttl
+            else:
+                category_ttls[key] = ttl
+        return cls(latest_ttl, default_ttl, year_ttls, category_ttls)
+
+    def ttl(self, category, year, latest_year):
+        ttl = self.year_ttls.get(year)
+        if ttl is None:
+            ttl = self.latest_ttl if year == latest_year else self.default_ttl
+        if category in self.category_ttls:
+            ttl = min(ttl, self.category_ttls[category])
+        return ttl
+
+
+class RecrawlScheduler:
+    """按新鲜度安排重抓 (SQLite 保存每个单元上次检查的时间)
+
+    单元的陈旧度 = 距上次检查的时间 / TTL，超过 1 即为到期；从未检查过的单元陈旧度为无穷大。
+    plan() 用优先队列按陈旧度从高到低挑选到期单元，直到用完本次的请求预算：
+    同一项目的第一个年份计 2 个请求 (详情页 + 年份页)，之后每个年份计 1 个；
+    从未见过的项目按完整抓取计 (详情页 + 已知项目的平均年份数)。
+    已知项目的年份列表 (详情页) 本身也是一个单元，按最新年份的 TTL 到期：到期时安排一次发现，
+    计 2 个请求 (详情页 + 一个可能新发布的年份页)，由调用方请求详情页并补抓其中尚未见过的年份。
+    """
+    def __init__(self, path, policy=None, budget=200, now=None, new_entity_years=10):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.policy = policy or FreshnessPolicy()
+        self.budget = budget # 本次运行允许的请求数 (不含基础页面)
+        self.new_entity_years = new_entity_years # 还没有任何历史时，估计每个项目的年份数
+        self.now = time.time() if now is None else now
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS units (
+                   category TEXT NOT NULL,
+                   name TEXT NOT NULL,
+                   year TEXT NOT NULL,
+                   checked_at REAL NOT NULL,
+                   PRIMARY KEY (category, name, year)
+               )"""
+        )
+        self._conn.commit()
+        # 统计
+        self.due_units = 0
+        self.planned_units = 0
+        self.planned_requests = 0
+        self.deferred_units = 0
+        self.checked_units = 0
+
+    def _known_units(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT category, name, year, checked_at FROM units").fetchall()
+        known, discovered = {}, {}
+        for category, name, year, checked_at in rows:
+            if year == DISCOVERY:
+                discovered[(category, name)] = checked_at
+            else:
+                known.setdefault((category, name), {})[year] = checked_at
+        return known, discovered
+
+    def known_years(self, category, name):
+        """该项目已登记过的年份集合"""
+        with self._lock:
+            rows = self._conn.execute("SELECT year FROM units WHERE category = ? AND name = ? AND year != ?",
+                                      (category, name, DISCOVERY)).fetchall()
+        return {r[0] for r in rows}
+
+    def _staleness(self, checked_at, ttl):
+        return (self.now - checked_at) / max(ttl, 1e-9)
+
+    def plan(self, entities):
+        """entities 为 [(类别, 名称, 详情页URL)]；返回按站点顺序排列的
+        [(类别, 名称, 详情页URL, 年份列表或 None, 是否发现新年份)]
+
+        年份列表为 None 表示该项目从未抓取过，需要完整抓取以发现其年份；
+        是否发现新年份为 True 时，调用方应请求详情页，并把其中尚未见过的年份加入年份列表。
+        """
+        known, discovered = self._known_units()
+        latest_year = max((y for years in known.values() for y in years), default=None)
+        avg_years = round(sum(len(y) for y in known.values()) / len(known)) if known else self.new_entity_years
+        heap = []
+        for order, (category, name, _) in enumerate(entities):
+            years = known.get((category, name))
+            if not years:
+                heapq.heappush(heap, (-float('inf'), order, '', category, name))
+                continue
+            for year, checked_at in years.items():
+                staleness = self._staleness(checked_at, self.policy.ttl(category, year, latest_year))
+                if staleness >= 1:
+                    heapq.heappush(heap, (-staleness, order, year, category, name))
+            # 年份列表按最新年份的 TTL 到期 (没有发现记录时以该项目最新年份的检查时间为准)
+            own_latest = max(years)
+            checked_at = discovered.get((category, name), years[own_latest])
+            staleness = self._staleness(checked_at, self.policy.ttl(category, latest_year, latest_year))
+            if staleness >= 1:
+                heapq.heappush(heap, (-staleness, order, DISCOVERY, category, name))
+        self.due_units = len(heap)
+
+        chosen = {} # (类别, 名称) -> 年份列表，None 表示完整抓取
+        discover = set()
+        spent = 0
+        while heap:
+            _, _, year, category, name = heapq.heappop(heap)
+            key = (category, name)
+            if not year:
+                cost = 1 + avg_years
+            elif year == DISCOVERY:
+                cost = 2
+            else:
+                cost = 1 if key in chosen else 2
+            if spent + cost > self.budget:
+                self.deferred_units += 1
+                continue
+            spent += cost
+            if not year:
+                chosen[key] = None
+            elif year == DISCOVERY:
+                discover.add(key)
+                chosen.setdefault(key, [])
+            else:
+                chosen.setdefault(key, []).append(year)
+            self.planned_units += 1
+        self.planned_requests = spent
+
+        plan = []
+        for category, name, url in entities:
+            key = (category, name)
+            if key in chosen:
+                years = chosen[key]
+                plan.append((category, name, url, sorted(years, reverse=True) if years is not None else None,
+                             key in discover))
+        return plan
+
+    def mark_checked(self, category, name, years, discovered=False):
+        """登记一个项目的这些年份已在本次检查过；discovered 为 True 时同时登记其年份列表 (详情页)"""
+        now = time.time()
+        rows = [(category, name, str(year), now) for year in years]
+        if discovered:
+            rows.append((category, name, DISCOVERY, now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO units (category, name, year, checked_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+        self.checked_units += len(years)
+
+    def stats(self):
+        return {
+            'budget': self.budget,
+            'due_units': self.due_units,
+            'planned_units': self.planned_units,
+            'planned_requests': self.planned_requests,
+            'deferred_units': self.deferred_units,
+            'checked_units': self.checked_units,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
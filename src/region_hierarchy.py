@@ -0,0 +1,114 @@
+import pandas as pd
+
+
+# 联合国 M49 分区 (使用 Global E-waste Monitor 的区域划分：拉美与撒哈拉以南非洲按中间区域拆分)
+# 区域 -> 大洲
+REGION_CONTINENT = {
+    'Eastern Africa': 'Africa', 'Middle Africa': 'Africa', 'Northern Africa': 'Africa',
+    'Southern Africa': 'Africa', 'Western Africa': 'Africa',
+    'Caribbean': 'Americas', 'Central America': 'Americas', 'South America': 'Americas',
+    'Northern America': 'Americas',
+    'Central Asia': 'Asia', 'Eastern Asia': 'Asia', 'South-Eastern Asia': 'Asia',
+    'Southern Asia': 'Asia', 'Western Asia': 'Asia',
+    'Eastern Europe': 'Europe', 'Northern Europe': 'Europe', 'Southern Europe': 'Europe',
+    'Western Europe': 'Europe',
+    'Australia and New Zealand': 'Oceania', 'Melanesia': 'Oceania', 'Micronesia': 'Oceania',
+    'Polynesia': 'Oceania',
+}
+
+# 区域 -> 国家 (名称采用 M49 英文短名)
+REGION_COUNTRIES = {
+    'Eastern Africa': [
+        'Burundi', 'Comoros', 'Djibouti', 'Eritrea', 'Ethiopia', 'Kenya', 'Madagascar', 'Malawi',
+        'Mauritius', 'Mozambique', 'Rwanda', 'Seychelles', 'Somalia', 'South Sudan', 'Uganda',
+        'United Republic of Tanzania', 'Zambia', 'Zimbabwe', 'Mayotte', 'Réunion',
+    ],
+    'Middle Africa': [
+        'Angola', 'Cameroon', 'Central African Republic', 'Chad', 'Congo',
+        'Democratic Republic of the Congo', 'Equatorial Guinea', 'Gabon', 'Sao Tome and Principe',
+    ],
+    'Northern Africa': ['Algeria', 'Egypt', 'Libya', 'Morocco', 'Sudan', 'Tunisia', 'Western Sahara'],
+    'Southern Africa': ['Botswana', 'Eswatini', 'Lesotho', 'Namibia', 'South Africa'],
+    'Western Africa': [
+        'Benin', 'Burkina Faso', 'Cabo Verde', "Côte d'Ivoire", 'Gambia', 'Ghana', 'Guinea',
+        'Guinea-Bissau', 'Liberia', 'Mali', 'Mauritania', 'Niger', 'Nigeria', 'Senegal',
+        'Sierra Leone', 'Togo',
+    ],
+    'Caribbean': [
+        'Anguilla', 'Antigua and Barbuda', 'Aruba', 'Bahamas', 'Barbados', 'British Virgin Islands',
+        'Cayman Islands', 'Cuba', 'Curaçao', 'Dominica', 'Dominican Republic', 'Grenada',
+        'Guadeloupe', 'Haiti', 'Jamaica', 'Martinique', 'Montserrat', 'Puerto Rico',
+        'Saint Kitts and Nevis', 'Saint Lucia', 'Saint Vincent and the Grenadines',
+        'Sint Maarten (Dutch part)', 'Trinidad and Tobago', 'Turks and Caicos Islands',
+        'United States Virgin Islands',
+    ],
+    'Central America': [
+        'Belize', 'Costa Rica', 'El Salvador', 'Guatemala', 'Honduras', 'Mexico', 'Nicaragua', 'Panama',
+    ],
+    'South America': [
+        'Argentina', 'Bolivia (Plurinational State of)', 'Brazil', 'Chile', 'Colombia', 'Ecuador',
+        'French Guiana', 'Guyana', 'Paraguay', 'Peru', 'Suriname', 'Uruguay',
+        'Venezuela (Bolivarian Republic of)',
+    ],
+    'Northern America': ['Bermuda', 'Canada', 'Greenland', 'United States of America'],
+    'Central Asia': ['Kazakhstan', 'Kyrgyzstan', 'Tajikistan', 'Turkmenistan', 'Uzbekistan'],
+    'Eastern Asia': [
+        'China', 'China, Hong Kong SAR', 'China, Macao SAR', "Democratic People's Republic of Korea",
+        'Japan', 'Mongolia', 'Republic of Korea',
+    ],
+    'South-Eastern Asia': [
+        'Brunei Darussalam', 'Cambodia', 'Indonesia', "Lao People's Democratic Republic", 'Malaysia',
+        'Myanmar', 'Philippines', 'Singapore', 'Thailand', 'Timor-Leste', 'Viet Nam',
+    ],
+    'Southern Asia': [
+        'Afghanistan', 'Bangladesh', 'Bhutan', 'India', 'Iran (Islamic Republic of)', 'Maldives',
+        'Nepal', 'Pakistan', 'Sri Lanka',
+    ],
+    'Western Asia': [
+        'Armenia', 'Azerbaijan', 'Bahrain', 'Cyprus', 'Georgia', 'Iraq', 'Israel', 'Jordan', 'Kuwait',
+        'Lebanon', 'Oman', 'Qatar', 'Saudi Arabia', 'State of Palestine', 'Syrian Arab Republic',
+        'Türkiye', 'United Arab Emirates', 'Yemen',
+    ],
+    'Eastern Europe': [
+        'Belarus', 'Bulgaria', 'Czechia', 'Hungary', 'Poland', 'Republic of Moldova', 'Romania',
+        'Russian Federation', 'Slovakia', 'Ukraine',
+    ],
+    'Northern Europe': [
+        'Denmark', 'Estonia', 'Faroe Islands', 'Finland', 'Iceland', 'Ireland', 'Latvia', 'Lithuania',
+        'Norway', 'Sweden', 'United Kingdom of Great Britain and Northern Ireland',
+    ],
+    'Southern Europe': [
+        'Albania', 'Andorra', 'Bosnia and Herzegovina', 'Croatia', 'Gibraltar', 'Greece', 'Italy',
+        'Malta', 'Montenegro', 'North Macedonia', 'Portugal', 'San Marino', 'Serbia', 'Slovenia',
+        'Spain', 'Kosovo',
+    ],
+    'Western Europe': [
+        'Austria', 'Belgium', 'France', 'Germany', 'Liechtenstein', 'Luxembourg', 'Monaco',
+        'Netherlands', 'Switzerland',
+    ],
+    'Australia and New Zealand': ['Australia', 'New Zealand'],
+    'Melanesia': ['Fiji', 'New Caledonia', 'Papua New Guinea', 'Solomon Islands', 'Vanuatu'],
+    'Micronesia': [
+        'Guam', 'Kiribati', 'Marshall Islands', 'Micronesia (Federated States of)', 'Nauru',
+        'Northern Mariana Islands', 'Palau',
+    ],
+    'Polynesia': ['American Samoa', 'Cook Islands', 'French Polynesia', 'Niue', 'Samoa', 'Tonga', 'Tuvalu'],
+}
+
+
+def default_hierarchy():
+    """内置的 国家 -> 区域 -> 大洲 对照表 (DataFrame: Name, Region, Continent)"""
+    rows = [(country, region, REGION_CONTINENT[region])
+            for region, countries in REGION_COUNTRIES.items() for country in countries]
+    return pd.DataFrame(rows, columns=['Name', 'Region', 'Continent'])
+
+
+def load_hierarchy(path=None):
+    """读取对照表 CSV (需包含 Name, Region, Continent 三列)；path 为 None 时使用内置的 M49 分区"""
+    if path is None:
+        return default_hierarchy()
+    df = pd.read_csv(path, dtype=str, encoding='utf-8-sig')
+    missing = {'Name', 'Region', 'Continent'} - set(df.columns)
+    if missing:
+        raise ValueError(f"对照表 {path} 缺少列: {', '.join(sorted(missing))}")
+    return df[['Name', 'Region', 'Continent']].dropna(subset=['Name']).drop_duplicates('Name')
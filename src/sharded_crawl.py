@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import socket
+import time
+
+from work_queue import WorkQueue
+
+
+def build_worker_collector(options):
+    """按 worker_options 创建 worker 端的收集器 (每个进程一个，各自持有限速器与连接)
+
+    options 可包含：rate, max_rate, extract_backend, cache (路径), cache_only, replay (归档路径)。
+    注意 rate 是单个 worker 的速率，N 个 worker 的总速率约为 N 倍。
+    """
+    from data_collector import EwasteDataCollector
+    from http_cache import HttpCache
+    from page_archive import PageArchive
+    from rate_limiter import AdaptiveRateLimiter
+    options = options or {}
+    rate = options.get('rate', 1.0)
+    limiter = AdaptiveRateLimiter(initial_rate=rate, max_rate=max(rate, options.get('max_rate', 8.0)))
+    cache = HttpCache(options['cache'], cache_only=options.get('cache_only', False)) if options.get('cache') else None
+    replay = PageArchive(options['replay']) if options.get('replay') else None
+    return EwasteDataCollector(rate_limiter=limiter, cache=cache, replay=replay,
+                               extract_backend=options.get('extract_backend', 'full'))
+
+
+def process_unit(collector, queue, unit):
+    """处理一个领取到的单元；获取或解析失败时返回 False (调用方放回队列)"""
+    category, name, url = unit['category'], unit['name'], unit['url']
+    if unit['kind'] == 'entity':
+        soup = collector._get_page_data(url)
+        if not soup:
+            return False
+        queue.complete(unit['seq'], year_links=collector._get_year_links(soup, category, name))
+        return True
+    text = collector._fetch_html(url, kind='year')
+    if text is None:
+        return False
+    parsed, record = collector._record_from_year_text(text, url, category, name, unit['year'])
+    if not parsed:
+        return False
+    queue.complete(unit['seq'], record=record)
+    return True
+
+
+def run_worker(queue_path, worker_id=0, options=None, lease_seconds=300.0, poll_interval=1.0):
+    """worker 主循环：不断领取单元，直到队列中没有待处理或处理中的单元；返回处理成功的单元数
+
+    其他 worker 持有租约的单元尚未完成时继续等待：对方崩溃后租约到期，单元会被重新领取。
+    协调进程还没有写入单元时 (先用 --join 启动的 worker) 同样等待。
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{worker_id}"
+    queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    collector = build_worker_collector(options)
+    done = 0
+    try:
+        while True:
+            unit = queue.lease(owner)
+            if unit is None:
+                if queue.is_finished():
+                    break
+                time.sleep(poll_interval)
+                continue
+            try:
+                ok = process_unit(collector, queue, unit)
+            except Exception as e:
+                print(f"  [{owner}] 错误：处理 {unit['category']}-{unit['name']} {unit['year']} ({unit['url']}) 时出错: {e}")
+                ok = False
+            if ok:
+                done += 1
+            else:
+                queue.release(unit['seq'])
+    finally:
+        if collector.cache is not None:
+            collector.cache.close()
+        queue.close()
+    print(f"  [{owner}] 完成，共处理 {done} 个单元。")
+    return done
+
+
+def _worker_main(queue_path, worker_id, options, lease_seconds):
+    try:
+        run_worker(queue_path, worker_id, options, lease_seconds)
+    except KeyboardInterrupt:
+        pass # 由协调进程统一处理中断；未完成的单元在租约到期后可被重新领取
+
+
+def run_sharded(collector, base_url, queue_path, workers=4, worker_options=None, resume=False,
+                lease_seconds=300.0, targets=None):
+    """协调进程：初始化队列、启动本地 worker、等待队列完成，返回按 collect_data 顺序合并的记录
+
+    workers=0 时只初始化队列并等待其他主机上 (--join) 的 worker 完成。
+    resume=True 且队列已初始化时沿用已有进度 (已完成的单元不再抓取)，也不重新请求基础页面。
+    """
+    queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    try:
+        if resume and queue.is_seeded():
+            print(f"沿用已有队列进度: {queue.stats()}")
+        else:
+            queue.unseed() # 写入新单元之前加入的 worker 会一直等待，而不是看到空队列就退出
+            soup = collector._get_page_data(base_url)
+            if not soup:
+                print("错误：无法获取基础页面，收集终止。")
+                return []
+            entities = list(collector._iter_entities(soup, targets))
+            queue.seed(entities)
+            print(f"总共需要处理约 {len(entities)} 个项目，已写入工作队列。")
+
+        processes = [multiprocessing.Process(target=_worker_main, args=(queue_path, i, worker_options, lease_seconds),
+                                             name=f'shard-worker-{i}', daemon=True)
+                     for i in range(workers)]
+        try:
+            for p in processes:
+                p.start()
+            for p in processes:
+                while p.is_alive():
+                    p.join(timeout=0.5) # 带超时的 join 使主进程能及时响应 Ctrl+C
+            while not queue.is_finished(): # 其他主机上的 worker 仍在处理
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            print("\n用户中断操作，返回已完成的记录 (续跑时使用 --resume)。")
+            for p in processes:
+                p.terminate()
+        print(f"队列状态: {queue.stats()}")
+        return queue.results()
+    finally:
+        queue.close()
@@ -0,0 +1,261 @@
+import json
+import math
+import os
+import time
+import zlib
+from datetime import datetime
+
+import pandas as pd
+
+from change_tracker import content_digest
+from columnar_export import METRIC_COLUMNS
+
+
+def _canonical_value(col, value):
+    """规范化单个值，使内容相同的记录总是得到相同的字节：指标 -> float / 'n/a' / None，其余 -> str / None"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if col not in METRIC_COLUMNS:
+        text = str(value).strip()
+        return text or None
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return None
+        if text.lower() == 'n/a':
+            return 'n/a'
+        try:
+            return float(text.replace(',', ''))
+        except ValueError:
+            return text
+    return float(value)
+
+
+def _canonical_year(value):
+    """Year 统一为字符串 ('2018'、2018、2018.0 -> '2018')"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+class SnapshotStore:
+    """内容寻址、按块去重的数据快照库 (目录)
+
+    - 每个项目 (类别, 名称) 的全部年份记录是一个块：规范化后的 JSON 经 zlib 压缩，
+      按内容哈希保存在 objects/ 下。内容没有变化的块在多次运行之间只保存一份，
+      存储随数据变化增长，而不是随运行次数增长；
+    - 每次 commit 写一个清单 snapshots/<快照ID>.json (块哈希列表，几 KB)，
+      LATEST 文件指向最新的快照 (原子替换)；
+    - read() 可按 'latest'、快照 ID 或时间点 (at) 读取；diff() 跳过哈希相同的块，
+      只解压并比较有变化的项目。
+    """
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+        self.latest_path = os.path.join(root, 'LATEST')
+        for directory in (self.objects_dir, self.snapshots_dir):
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+        self._chunk_cache = {} # 块哈希 -> 行列表 (同一对象上重复读取时不再解压)
+
+    # --- 文件 ---
+    @staticmethod
+    def _write_atomic(path, data):
+        partial = path + '.partial'
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _columns(self):
+        from data_collector import COLUMN_ORDER
+        return [c for c in COLUMN_ORDER if c not in ('Category', 'Name')]
+
+    def _put_chunk(self, rows):
+        """保存一个块，返回 (块哈希, 是否为新对象)"""
+        payload = json.dumps(rows, ensure_ascii=False, separators=(',', ':'))
+        digest = content_digest(payload)
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, False
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._write_atomic(path, zlib.compress(payload.encode('utf-8'), 6))
+        return digest, True
+
+    def _get_chunk(self, digest):
+        rows = self._chunk_cache.get(digest)
+        if rows is None:
+            with open(self._object_path(digest), 'rb') as f:
+                rows = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+            self._chunk_cache[digest] = rows
+        return rows
+
+    # --- 写入 ---
+    def commit(self, records, label=None):
+        """把一组记录 (可为迭代器) 保存为新快照并设为最新，返回其清单 dict
+
+        项目按首次出现的顺序保存，项目内的年份按从新到旧排列 (与记录到达顺序无关，
+        不同抓取方式得到的相同数据会得到相同的块)。
+        """
+        columns = self._columns()
+        entities = {} # (类别, 名称) -> {年份: 行}
+        count = 0
+        for record in records:
+            key = (str(record['Category']), str(record['Name']))
+            year = _canonical_year(record['Year'])
+            row = [year] + [_canonical_value(col, record.get(col)) for col in columns[1:]]
+            entities.setdefault(key, {})[year] = row
+            count += 1
+
+        chunks, new_chunks, new_bytes = [], 0, 0
+        for (category, name), years in entities.items():
+            rows = [years[y] for y in sorted(years, reverse=True)]
+            digest, created = self._put_chunk(rows)
+            if created:
+                new_chunks += 1
+                new_bytes += os.path.getsize(self._object_path(digest))
+            chunks.append([category, name, digest, len(rows)])
+
+        created_at = time.time()
+        snapshot_id = f"{datetime.fromtimestamp(created_at).strftime('%Y%m%d_%H%M%S')}_" \
+                      f"{content_digest(json.dumps(chunks, ensure_ascii=False))[:8]}"
+        manifest = {
+            'id': snapshot_id,
+            'created_at': created_at,
+            'label': label,
+            'columns': ['Category', 'Name'] + columns,
+            'record_count': sum(c[3] for c in chunks),
+            'records_received': count,
+            'new_chunks': new_chunks,
+            'new_bytes': new_bytes,
+            'chunks': chunks,
+        }
+        self._write_atomic(os.path.join(self.snapshots_dir, f'{snapshot_id}.json'),
+                           json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+        self._write_atomic(self.latest_path, snapshot_id.encode('utf-8'))
+        return manifest
+
+    # --- 读取 ---
+    def snapshots(self):
+        """全部快照的概要 (不含块列表)，按创建时间从旧到新"""
+        manifests = []
+        for filename in os.listdir(self.snapshots_dir):
+            if filename.endswith('.json'):
+                manifest = self.manifest(filename[:-len('.json')])
+                manifest.pop('chunks')
+                manifests.append(manifest)
+        return sorted(manifests, key=lambda m: m['created_at'])
+
+    def latest_id(self):
+        if not os.path.exists(self.latest_path):
+            return None
+        with open(self.latest_path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+
+    def resolve(self, snapshot='latest', at=None):
+        """返回快照 ID：at 给出时为该时间点 (epoch 秒、datetime 或 ISO 字符串) 当时最新的快照"""
+        if at is not None:
+            if isinstance(at, str):
+                at = datetime.fromisoformat(at)
+            if isinstance(at, datetime):
+                at = at.timestamp()
+            earlier = [m for m in self.snapshots() if m['created_at'] <= at]
+            if not earlier:
+                raise KeyError(f"{datetime.fromtimestamp(at)} 之前没有快照")
+            return earlier[-1]['id']
+        if snapshot == 'latest':
+            snapshot_id = self.latest_id()
+            if snapshot_id is None:
+                raise KeyError(f"快照库 {self.root} 中还没有快照")
+            return snapshot_id
+        return snapshot
+
+    def manifest(self, snapshot='latest', at=None):
+        snapshot_id = self.resolve(snapshot, at)
+        path = os.path.join(self.snapshots_dir, f'{snapshot_id}.json')
+        if not os.path.exists(path):
+            raise KeyError(f"找不到快照: {snapshot_id}")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def records(self, snapshot='latest', at=None, categories=None, names=None):
+        """逐条产出快照中的记录 dict；categories / names 过滤时只解压需要的块"""
+        manifest = self.manifest(snapshot, at)
+        columns = manifest['columns']
+        for category, name, digest, _ in manifest['chunks']:
+            if (categories and category not in categories) or (names and name not in names):
+                continue
+            for row in self._get_chunk(digest):
+                yield dict(zip(columns, [category, name] + row))
+
+    def read(self, snapshot='latest', at=None, categories=None, names=None):
+        """读取快照为 DataFrame (列顺序同 save_data 的 CSV)"""
+        columns = self.manifest(snapshot, at)['columns']
+        return pd.DataFrame(list(self.records(snapshot, at, categories, names)), columns=columns)
+
+    # --- 比较 ---
+    def diff(self, old='latest', new='latest'):
+        """比较两个快照，返回与 ChangeTracker 变更日志相同格式的 dict
+
+        两个快照中哈希相同的块直接跳过，只有内容不同的项目才被解压并逐年份、逐指标比较。
+        """
+        old_manifest, new_manifest = self.manifest(old), self.manifest(new)
+        old_chunks = {(c, n): d for c, n, d, _ in old_manifest['chunks']}
+        new_chunks = {(c, n): d for c, n, d, _ in new_manifest['chunks']}
+        columns = new_manifest['columns']
+
+        def by_year(digest):
+            if digest is None:
+                return {}
+            return {row[0]: dict(zip(columns[2:], row)) for row in self._get_chunk(digest)}
+
+        changes, skipped = [], 0
+        for key in list(old_chunks) + [k for k in new_chunks if k not in old_chunks]:
+            before_digest, after_digest = old_chunks.get(key), new_chunks.get(key)
+            if before_digest == after_digest:
+                skipped += 1
+                continue
+            before, after = by_year(before_digest), by_year(after_digest)
+            for year in list(before) + [y for y in after if y not in before]:
+                old_record, new_record = before.get(year, {}), after.get(year, {})
+                for col in METRIC_COLUMNS:
+                    was, now = old_record.get(col), new_record.get(col)
+                    if was == now:
+                        continue
+                    change = 'appeared' if was is None else 'vanished' if now is None else 'changed'
+                    changes.append({
+                        'Category': key[0], 'Name': key[1], 'Year': year,
+                        'Metric': col, 'Change': change, 'Old': was, 'New': now,
+                    })
+
+        counts = {'changed': 0, 'appeared': 0, 'vanished': 0}
+        for change in changes:
+            counts[change['Change']] += 1
+        return {
+            'from': old_manifest['id'],
+            'to': new_manifest['id'],
+            'summary': dict(counts, entities_compared=len(set(old_chunks) | set(new_chunks)) - skipped,
+                            entities_unchanged=skipped),
+            'changed_entities': sorted({(c['Category'], c['Name']) for c in changes}),
+            'changes': changes,
+        }
+
+    def stats(self):
+        objects, size = 0, 0
+        for directory, _, files in os.walk(self.objects_dir):
+            for filename in files:
+                if not filename.endswith('.partial'):
+                    objects += 1
+                    size += os.path.getsize(os.path.join(directory, filename))
+        return {
+            'snapshots': len([f for f in os.listdir(self.snapshots_dir) if f.endswith('.json')]),
+            'objects': objects,
+            'object_bytes': size,
+            'latest': self.latest_id(),
+        }
+
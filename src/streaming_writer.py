@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+
+class StreamingRecordWriter:
+    """流式增量写入器：每提取一条记录就立即追加到 CSV / JSONL 文件
+
+    - 运行期间写入 <文件名>.partial，并定期 flush + fsync，抓取途中即可读取已有结果；
+    - close() 时最后一次 fsync，再用 os.replace 原子地重命名为正式文件名；
+    - 内存中只保留前几条记录用于预览，占用与抓取规模无关。
+    CSV 的列顺序与编码 (utf-8-sig) 与 save_data 保持一致。
+    """
+    def __init__(self, output_dir, file_prefix, columns, formats=('csv', 'jsonl'),
+                 fsync_every=50, fsync_interval=10.0, preview_size=5):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.columns = list(columns)
+        self.fsync_every = fsync_every       # 每写入多少条记录 fsync 一次
+        self.fsync_interval = fsync_interval # 距上次 fsync 超过多少秒也会 fsync
+        self.preview_size = preview_size
+        self.preview = []
+        self.count = 0
+        self._since_sync = 0
+        self._last_sync = time.monotonic()
+        self._files = {} # 格式 -> (文件对象, 临时路径, 正式路径)
+        self._csv_writer = None
+        self._closed = False
+
+        for fmt in formats:
+            final_path = os.path.join(output_dir, f'{file_prefix}_{timestamp}.{fmt}')
+            partial_path = final_path + '.partial'
+            if fmt == 'csv':
+                f = open(partial_path, 'w', encoding='utf-8-sig', newline='')
+                self._csv_writer = csv.DictWriter(f, fieldnames=self.columns, extrasaction='ignore')
+                self._csv_writer.writeheader()
+            elif fmt == 'jsonl':
+                f = open(partial_path, 'w', encoding='utf-8')
+            else:
+                raise ValueError(f"不支持的输出格式: {fmt}")
+            self._files[fmt] = (f, partial_path, final_path)
+        print(f"流式写入已开启: {', '.join(p for _, p, _ in self._files.values())}")
+
+    def write(self, record):
+        """追加一条记录 (可直接作为 collect_data 等的 sink)"""
+        if 'csv' in self._files:
+            self._csv_writer.writerow({k: ('' if v is None else v) for k, v in record.items()})
+        if 'jsonl' in self._files:
+            f = self._files['jsonl'][0]
+            f.write(json.dumps({col: record.get(col) for col in self.columns if col in record}, ensure_ascii=False))
+            f.write('\n')
+        self.count += 1
+        if len(self.preview) < self.preview_size:
+            self.preview.append(record)
+        self._since_sync += 1
+        if self._since_sync >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """把缓冲区内容刷到磁盘"""
+        for f, _, _ in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self._since_sync = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """最终 fsync 并原子重命名为正式文件；返回 {格式: 正式路径}"""
+        if self._closed:
+            return {fmt: final for fmt, (_, _, final) in self._files.items()}
+        self._closed = True
+        self.sync()
+        paths = {}
+        for fmt, (f, partial_path, final_path) in self._files.items():
+            f.close()
+            if self.count == 0:
+                os.remove(partial_path) # 没有任何记录时不留下空文件
+                continue
+            os.replace(partial_path, final_path)
+            paths[fmt] = final_path
+            print(f"数据已保存到 {fmt.upper()} 文件: {final_path}")
+
+        if self.count == 0:
+            print("没有数据可保存。")
+        else:
+            print(f"\n数据预览 (前 {len(self.preview)} 条):")
+            for record in self.preview:
+                print({col: record.get(col) for col in self.columns[:5]})
+            print(f"\n总共写入了 {self.count} 条数据记录。")
+        return paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,171 @@
+import re
+import threading
+
+
+# 比较详情页与年份页面时忽略的字段 (两者只在这些字段上必然不同)
+_IGNORED_FIELDS = ('Year', 'Source URL')
+# 年份选择器中表示当前年份的标记
+_SELECTED_CLASSES = ('active', 'selected', 'current')
+
+
+def page_year(soup, years):
+    """读取页面自身标明的年份：年份选择器中处于选中状态的链接，否则为一级/二级标题或 <title> 中
+    唯一出现的候选年份；无法确定时返回 None"""
+    years = set(years)
+    for link in soup.find_all('a', class_='yclick'):
+        selected = any(c in _SELECTED_CLASSES for c in (link.get('class') or [])) or link.get('aria-current')
+        if selected and link.text.strip() in years:
+            return link.text.strip()
+    for tag in ('h1', 'h2', 'title'):
+        for elem in soup.find_all(tag):
+            text = elem.get_text(' ')
+            found = {year for year in years if re.search(rf'(?<!\d){re.escape(year)}(?!\d)', text)}
+            if len(found) == 1:
+                return found.pop()
+    return None
+
+
+def _same_data(a, b):
+    if not a or not b:
+        return False
+    return all(a.get(k) == b.get(k) for k in set(a) | set(b) if k not in _IGNORED_FIELDS)
+
+
+class YearUrlPlanner:
+    """年份页面 URL 规划器：从最初几个项目中学习站点规律，减少重复请求
+
+    学习阶段 (与原有流程相同：详情页 -> a.yclick -> 各年份页面)，对每个项目观察：
+      - 年份 URL 模板：年份链接相对于详情页 URL 的写法，如 "{detail}{year}/"；
+      - 详情页展示的年份：详情页本身按年份页面解析，与哪个年份的记录完全一致。
+    连续 learn_entities 个项目的观察结果一致后启用规划：
+      - 指定了目标年份时，直接按模板构造年份 URL，不再请求详情页；
+      - 抓取全部年份时仍请求详情页 (需要它的年份列表)，但详情页展示的那个年份
+        直接复用详情页的解析结果，不再重复下载对应的年份页面；每次复用前都从该详情页本身
+        (年份选择器或标题，见 page_year) 确认展示的年份，无法确认或不一致时照常请求年份页面。
+    观察不一致时对应的规划永久停用；按模板构造的 URL 获取失败时，调用方回退到原有流程。
+    """
+    def __init__(self, learn_entities=3):
+        self.learn_entities = learn_entities
+        self._lock = threading.Lock()
+        self._template = None        # 如 '{detail}{year}/'；False 表示观察到不一致，停用
+        self._template_votes = 0
+        self._shown_year = None      # 详情页展示的年份；False 表示停用
+        self._shown_votes = 0
+        self._year_order = []        # 按页面上出现的顺序记录见过的年份，用于给目标年份排序
+        # 统计
+        self.learned_entities = 0
+        self.detail_pages_skipped = 0
+        self.year_pages_reused = 0
+        self.shown_year_mismatches = 0
+        self.template_misses = 0
+        self.fallbacks = 0
+
+    # --- 学习 ---
+    @staticmethod
+    def _infer_template(detail_url, year, year_url):
+        """把年份 URL 写成相对于详情页 URL 的模板；无法表示时返回 None"""
+        base = detail_url if detail_url.endswith('/') else detail_url + '/'
+        if not year_url.startswith(base) or year not in year_url[len(base):]:
+            return None
+        return '{detail}' + year_url[len(base):].replace(year, '{year}')
+
+    def _format(self, detail_url, year):
+        base = detail_url if detail_url.endswith('/') else detail_url + '/'
+        return self._template.replace('{detail}', base).replace('{year}', year)
+
+    def observe(self, detail_url, detail_record, year_links, records_by_year):
+        """学习阶段：登记一个按原有流程抓取完成的项目
+
+        detail_record 为详情页按年份页面解析得到的记录；records_by_year 为 {年份: 记录}。
+        """
+        if not year_links:
+            return
+        with self._lock:
+            self.learned_entities += 1
+            for year, _ in year_links:
+                if year not in self._year_order:
+                    self._year_order.append(year)
+
+            if self._template is not False:
+                templates = {self._infer_template(detail_url, year, url) for year, url in year_links}
+                if len(templates) == 1 and None not in templates and self._template in (None, *templates):
+                    self._template = templates.pop()
+                    self._template_votes += 1
+                else:
+                    self._template = False
+
+            if self._shown_year is not False:
+                matches = [year for year, _ in year_links if _same_data(detail_record, records_by_year.get(year))]
+                shown_listed = any(year == self._shown_year for year, _ in year_links)
+                if len(matches) == 1 and self._shown_year in (None, matches[0]):
+                    self._shown_year = matches[0]
+                    self._shown_votes += 1
+                elif (len(matches) == 1 or not matches) and self._shown_year is not None and shown_listed:
+                    # 已学到的年份就在本项目中，详情页却与它不一致：规律不成立
+                    self._shown_year = False
+                # 其余情况 (多个年份数据相同、目标年份里没有详情页展示的年份) 无法判断，不计票
+
+    @property
+    def learning(self):
+        """是否仍需按原有流程抓取并调用 observe"""
+        with self._lock:
+            return (self._template is not False and self._template_votes < self.learn_entities) or \
+                   (self._shown_year is not False and self._shown_votes < self.learn_entities)
+
+    def _template_ready(self):
+        return self._template not in (None, False) and self._template_votes >= self.learn_entities
+
+    def _shown_ready(self):
+        return self._shown_year not in (None, False) and self._shown_votes >= self.learn_entities
+
+    # --- 规划 ---
+    def direct_links(self, detail_url, target_years):
+        """指定了目标年份且模板已确认时，返回按模板构造的 [(年份, URL)]；否则返回 None (需要请求详情页)"""
+        if not target_years:
+            return None
+        with self._lock:
+            if not self._template_ready():
+                return None
+            order = {year: i for i, year in enumerate(self._year_order)}
+            years = sorted(set(target_years), key=lambda y: (order.get(y, len(order)), y))
+            self.detail_pages_skipped += 1
+            return [(year, self._format(detail_url, year)) for year in years]
+
+    def reusable_year(self, detail_url, year_links, soup):
+        """返回可以直接复用详情页 (soup) 解析结果的年份 (不在 year_links 中时返回 None)；同时校验链接是否符合模板
+
+        学到的年份还要与该详情页本身标明的年份 (page_year) 一致，否则返回 None，由调用方请求年份页面。
+        """
+        with self._lock:
+            if self._template_ready():
+                misses = sum(1 for year, url in year_links if url != self._format(detail_url, year))
+                self.template_misses += misses
+            if not self._shown_ready() or not any(year == self._shown_year for year, _ in year_links):
+                return None
+            shown_year = self._shown_year
+        if page_year(soup, [year for year, _ in year_links]) != shown_year:
+            with self._lock:
+                self.shown_year_mismatches += 1
+            return None
+        with self._lock:
+            self.year_pages_reused += 1
+        return shown_year
+
+    def record_fallback(self):
+        """按模板构造的 URL 获取失败，调用方回退到详情页流程"""
+        with self._lock:
+            self.fallbacks += 1
+            self.detail_pages_skipped -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'template': self._template or None,
+                'shown_year': self._shown_year or None,
+                'learned_entities': self.learned_entities,
+                'detail_pages_skipped': self.detail_pages_skipped,
+                'year_pages_reused': self.year_pages_reused,
+                'shown_year_mismatches': self.shown_year_mismatches,
+                'template_misses': self.template_misses,
+                'fallbacks': self.fallbacks,
+            }
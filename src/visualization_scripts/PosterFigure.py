@@ -6,8 +6,11 @@ import os
 import numpy as np
 import warnings
 
+from ewaste_data import build_cube, load_ewaste_data, load_world, split_levels
+
 # --- 配置 ---
-CSV_FILE_PATH = '/Users/lakexia/Library/Mobile Documents/com~apple~CloudDocs/GTSI/25Spring/CSE6242/Project/02_DataProcess/Data/ewaste_data_full_20250402_003307.csv'
+SNAPSHOT_DIR = '/Users/lakexia/Library/Mobile Documents/com~apple~CloudDocs/GTSI/25Spring/CSE6242/Project/02_DataProcess/Data/snapshots_full' # data_collector 的快照库，读取其中最新的快照
+CSV_FILE_PATH = '/Users/lakexia/Library/Mobile Documents/com~apple~CloudDocs/GTSI/25Spring/CSE6242/Project/02_DataProcess/Data/ewaste_data_full_20250402_003307.csv' # 快照库不存在时使用
 WORLD_SHP_PATH = '/Users/lakexia/Library/Mobile Documents/com~apple~CloudDocs/GTSI/25Spring/CSE6242/Project/02_DataProcess/Data/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp'
 OUTPUT_DIR_POSTER = 'poster_visuals_map_line_bar' # <<< 新的输出目录名
 CORRECT_NAME_COLUMN = 'ADMIN' # <<< 确认这是你找到的正确列名
@@ -18,43 +21,26 @@ if not os.path.exists(OUTPUT_DIR_POSTER):
 # --- 数据加载与准备 (简化版) ---
 print("Loading and preparing data...")
 try:
-    ewaste_df = pd.read_csv(CSV_FILE_PATH)
-    world = gpd.read_file(WORLD_SHP_PATH)
+    # 指标列 (含总量列) 已转换为数字，Year 为整数，Entity 为国家的整数实体键
+    ewaste_df = load_ewaste_data(SNAPSHOT_DIR, CSV_FILE_PATH)
+    world = load_world(WORLD_SHP_PATH, name_column=CORRECT_NAME_COLUMN) # 已去掉南极洲，GeoParquet 缓存
 except Exception as e:
     print(f"Error loading data: {e}")
     exit()
-
-# 清理和转换 (包括总量列)
-numeric_cols = ['Population', 'E-waste Generated (kg/capita)', 'E-waste Collection Rate (%)', 
-                'E-waste Generated (kt)', 'EEE Put on Market (kt)', 'E-waste Formally Collected (kt)'] # <<< 包含总量列
-for col in numeric_cols:
-    if col in ewaste_df.columns:
-        ewaste_df[col] = pd.to_numeric(ewaste_df[col], errors='coerce')
-ewaste_df['Year'] = ewaste_df['Year'].astype(str)
-ewaste_df['Population'] = pd.to_numeric(ewaste_df['Population'], errors='coerce')
-
-# 国家名称映射
-name_mapping = {
-    "United States of America": "United States", "Russian Federation": "Russia",
-    "Republic of Korea": "South Korea", "Iran (Islamic Republic of)": "Iran",
-    # ... (其他映射) ...
-    "Czech Republic": "Czechia"
-}
-ewaste_df['Name_mapped'] = ewaste_df['Name'].replace(name_mapping)
+levels = split_levels(ewaste_df)
 
 # 合并国家数据
-world = world[(world[CORRECT_NAME_COLUMN] != "Antarctica")]
-ewaste_countries = ewaste_df[ewaste_df['Category'] == 'Country'].copy()
-merged_gdf = world.merge(ewaste_countries, left_on=CORRECT_NAME_COLUMN, right_on='Name_mapped', how='left')
+ewaste_countries = levels['Country']
+country_cube = build_cube(world, ewaste_countries) # 按整数实体键 (ISO3) 连接；几何每实体一份，指标为 [实体, 年份, 指标] 数组
 
 # 准备大洲数据
-ewaste_continents = ewaste_df[ewaste_df['Category'] == 'Continent'].copy()
+ewaste_continents = levels['Continent']
 
 
 # --- 图 1: 全球回收率地图 (2022) ---
 print("Generating Global Collection Rate Map (2022)...")
 fig_map, ax_map = plt.subplots(1, 1, figsize=(14, 8)) # 单独地图可以大一点
-data_plot_rate = merged_gdf[merged_gdf['Year'] == '2022']
+data_plot_rate = country_cube.year(2022) # 按年份切片，几何不复制
 metric_col_rate = 'E-waste Collection Rate (%)'
 metric_name_rate = 'Collection Rate (%)' # 用于图例
 
@@ -83,12 +69,11 @@ plt.close(fig_map)
 # --- 图 2: 全球总量趋势折线图 (2018-2022) ---
 print("Generating Global Trend Line Chart (2018-2022)...")
 # 按年份计算全球总量 (加总所有国家的数据，如果没有全球总计行)
-# 注意：这假设 merged_gdf 包含所有国家，并且 'E-waste Generated (kt)' 等列存在
-if 'E-waste Generated (kt)' in merged_gdf.columns and 'E-waste Formally Collected (kt)' in merged_gdf.columns:
-    global_totals = merged_gdf.groupby('Year')[['E-waste Generated (kt)', 'E-waste Formally Collected (kt)']].sum()
-    # 确保年份顺序
-    years_numeric = sorted([int(y) for y in ewaste_df['Year'].unique()])
-    global_totals = global_totals.reindex([str(y) for y in years_numeric]) # 按数字排序后的年份索引
+# 注意：这假设地图包含所有国家，并且 'E-waste Generated (kt)' 等列存在
+if 'E-waste Generated (kt)' in country_cube.metrics and 'E-waste Formally Collected (kt)' in country_cube.metrics:
+    global_totals = country_cube.totals(['E-waste Generated (kt)', 'E-waste Formally Collected (kt)']) # 沿实体轴求和
+    # 确保年份顺序 (Year 为整数，按数值排序)
+    global_totals = global_totals.sort_index()
 
     fig_line, ax_line = plt.subplots(figsize=(10, 6))
 
@@ -122,7 +107,7 @@ print("Generating Continental Comparison Bar Chart (2022)...")
 # (这部分代码与之前的回复基本相同，直接使用)
 continents_to_show = ['Africa', 'Americas', 'Asia', 'Europe', 'Oceania']
 # 获取2022年大洲数据
-continents_2022 = ewaste_continents[ewaste_continents['Year'] == '2022'].set_index('Name')
+continents_2022 = ewaste_continents[ewaste_continents['Year'] == 2022].set_index('Name')
 data_bar = continents_2022.loc[continents_to_show, ['E-waste Generated (kg/capita)', 'E-waste Collection Rate (%)']].copy()
 
 fig_bar, ax1_bar = plt.subplots(figsize=(10, 6.5)) # 调整高度以容纳图例
@@ -0,0 +1,281 @@
+"""绘图脚本共用的数据加载：读取、类型转换、名称映射只做一次，并缓存为二进制文件
+
+    from ewaste_data import load_ewaste_data, load_world, split_levels, build_cube
+    ewaste_df = load_ewaste_data(SNAPSHOT_DIR, CSV_FILE_PATH)
+    levels = split_levels(ewaste_df) # {'Country': ..., 'Region': ..., 'Continent': ...}
+    world = load_world(WORLD_SHP_PATH) # 预处理后的地图 (GeoParquet 缓存)
+    country_cube = build_cube(world, levels['Country']) # 几何每实体一份，指标为 [实体, 年份, 指标] 数组
+    data_2022 = country_cube.year(2022)
+
+得到的 DataFrame：Category / Name 为 category 类型，Year 为 int16，
+指标列为 float32 ('n/a' 与缺失均为 NaN)，Entity 为国家的整数实体键 (见 entity_resolution，
+非国家或无法解析的名称为 -1)。与地图按实体键连接，不再按名称字符串连接；
+按国家筛选时用 entity_keys() 把名称 (任意常见写法) 转换为实体键。
+缓存以数据来源的内容哈希 (快照 ID 或 CSV 文件哈希) 加上内置名称表的哈希为键，数据不变时之后每次启动直接读取缓存。
+地图同样只处理一次：去掉南极洲、加上 Entity、预先计算标注点与外包框，缓存为 GeoParquet。
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # 用于导入 src/ 下的模块
+from change_tracker import content_digest
+from columnar_export import METRIC_COLUMNS
+from entity_resolution import ISO3_NAMES, ResolutionIndex
+from snapshot_store import SnapshotStore
+
+CACHE_VERSION = 3 # 修改 prepare_frame 的处理方式时递增，使旧缓存失效
+WORLD_CACHE_VERSION = 1 # 修改 prepare_world 的处理方式时递增
+SHAPEFILE_PARTS = ('.shp', '.shx', '.dbf', '.prj', '.cpg') # 参与缓存键计算的 Shapefile 组成文件
+CATEGORY_LEVELS = ('Country', 'Region', 'Continent')
+# 内置名称表的内容哈希：Entity 列由它解析得到，名称表变化 (新增别名等) 时两种缓存都要失效
+NAMES_DIGEST = content_digest(json.dumps(ISO3_NAMES, sort_keys=True))[:12]
+
+
+
+def prepare_frame(raw):
+    """把原始数据 (快照或 CSV，值可能为字符串) 转换为绘图使用的紧凑类型"""
+    years = pd.to_numeric(raw['Year'], errors='coerce')
+    raw = raw[years.notna()]
+    df = pd.DataFrame(index=pd.RangeIndex(len(raw)))
+    df['Category'] = pd.Categorical(raw['Category'].to_numpy())
+    df['Name'] = pd.Categorical(raw['Name'].to_numpy())
+    df['Year'] = years[years.notna()].to_numpy().astype(np.int16)
+    for col in METRIC_COLUMNS:
+        values = raw[col] if col in raw.columns else pd.Series(np.nan, index=raw.index)
+        df[col] = pd.to_numeric(values, errors='coerce').to_numpy().astype(np.float32)
+    index = ResolutionIndex()
+    is_country = (raw['Category'] == 'Country').to_numpy()
+    keys = index.resolve_many(raw['Name'].to_numpy()[is_country])
+    entity = np.full(len(df), -1, dtype=np.int16)
+    entity[is_country] = [-1 if k is None else k for k in keys]
+    df['Entity'] = entity
+    df.attrs['unmatched_names'] = index.report()['unmatched_names'] # 随缓存一起保存
+    return df
+
+
+def _source(snapshot_dir, csv_path):
+    """返回 (缓存键, 缓存目录, 读取原始数据的函数)；快照库中有快照时优先使用"""
+    if snapshot_dir and os.path.exists(os.path.join(snapshot_dir, 'LATEST')):
+        store = SnapshotStore(snapshot_dir)
+        snapshot_id = store.latest_id() # 快照 ID 本身就由内容哈希得到
+        return f"snapshot_{snapshot_id}", os.path.join(snapshot_dir, 'frames'), lambda: store.read(snapshot_id)
+    if not csv_path or not os.path.exists(csv_path):
+        raise FileNotFoundError(f"找不到数据：快照库 {snapshot_dir} 中没有快照，CSV 文件 {csv_path} 也不存在")
+    with open(csv_path, 'rb') as f:
+        digest = content_digest(f.read())
+    reader = lambda: pd.read_csv(csv_path, dtype=str, keep_default_na=False, na_values=[''], encoding='utf-8-sig')
+    return f"csv_{digest}", os.path.join(os.path.dirname(os.path.abspath(csv_path)), '.ewaste_cache'), reader
+
+
+def load_ewaste_data(snapshot_dir=None, csv_path=None, use_cache=True):
+    """加载绘图数据：快照库中最新的快照，或 (快照库不存在时) CSV 文件；结果按内容哈希缓存"""
+    key, cache_dir, reader = _source(snapshot_dir, csv_path)
+    cache_path = os.path.join(cache_dir, f"{key}_names{NAMES_DIGEST}_v{CACHE_VERSION}.pkl")
+    if use_cache and os.path.exists(cache_path):
+        return pd.read_pickle(cache_path)
+    df = prepare_frame(reader())
+    if use_cache:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        partial = cache_path + '.partial'
+        df.to_pickle(partial, protocol=5)
+        os.replace(partial, cache_path)
+    return df
+
+
+def split_levels(df):
+    """按类别拆分 (各自只保留本类别中出现的名称类别值)"""
+    levels = {}
+    for level in CATEGORY_LEVELS:
+        part = df[df['Category'] == level].reset_index(drop=True)
+        part['Name'] = part['Name'].cat.remove_unused_categories()
+        part.attrs = dict(df.attrs)
+        levels[level] = part
+    return levels
+
+
+def entity_keys(names):
+    """国家名称 (数据或地图中的任意常见写法) -> 实体键列表，用于按 Entity 筛选；无法解析的名称打印警告并跳过"""
+    index = ResolutionIndex()
+    keys = [k for k in index.resolve_many(names) if k is not None]
+    unmatched = index.report()['unmatched_names']
+    if unmatched:
+        print(f"警告: 以下名称无法解析为实体键，已忽略: {', '.join(unmatched)}")
+    return keys
+
+
+def attach_entity_keys(world):
+    """给 Shapefile 属性表加上整数实体键列 Entity (按 ISO_A3 等代码，无法确定时为 -1)"""
+    keys = ResolutionIndex().add_shapes(world)
+    world = world.copy()
+    world['Entity'] = np.array([-1 if k is None else k for k in keys], dtype=np.int16)
+    return world
+
+
+def _report_merge(world, countries):
+    unmatched = countries.attrs.get('unmatched_names', [])
+    matched = countries[countries['Entity'] >= 0]
+    shape_keys = set(world['Entity'].tolist())
+    missing = sorted(set(matched.loc[~matched['Entity'].isin(shape_keys), 'Name'].astype(str)))
+    print(f"按实体键合并：{matched['Entity'].nunique()} 个国家有数据，其中 {len(missing)} 个在地图中没有几何"
+          f"{' (' + ', '.join(missing) + ')' if missing else ''}。")
+    if unmatched:
+        print(f"警告: 以下名称无法解析为实体键，未参与合并: {', '.join(unmatched)}")
+
+
+def merge_countries(world, countries, report=True):
+    """按整数实体键把国家数据合并到地图 (左连接，每个国家每年一行)，并打印未匹配报告
+
+    每年一行会把几何复制到每个年份；按年份绘图请用 build_cube。
+    """
+    if 'Entity' not in world.columns:
+        world = attach_entity_keys(world)
+    merged = world.merge(countries[countries['Entity'] >= 0], on='Entity', how='left')
+    if report:
+        _report_merge(world, countries)
+    return merged
+
+
+class MetricCube:
+    """按实体去重的地图数据：几何表 world 每个地理实体一行，指标为稠密数组 values[实体, 年份, 指标]
+
+    world 的第 i 行对应 values[i]，years / metrics 为另两个轴；present[i, y] 表示该实体该年有记录。
+    取某一年只是对数组切片，几何不随年份复制，年份增加时内存只增加数组本身 (每实体每年 4 字节 x 指标数)。
+    """
+    def __init__(self, world, years, metrics, values, present):
+        self.world = world
+        self.years = np.asarray(years, dtype=np.int16)
+        self.metrics = list(metrics)
+        self.values = values
+        self.present = present
+        self._year_index = {int(y): i for i, y in enumerate(self.years)}
+        self._metric_index = {m: j for j, m in enumerate(self.metrics)}
+
+    def __len__(self):
+        return len(self.world)
+
+    def subset(self, mask):
+        """只保留 mask (与 world 行对齐的布尔数组) 为真的实体"""
+        mask = np.asarray(mask, dtype=bool)
+        return MetricCube(self.world[mask], self.years, self.metrics, self.values[mask], self.present[mask])
+
+    def year(self, year):
+        """某一年的地图数据：几何表 (浅复制) 加上该年的指标列；该年没有数据的实体指标为 NaN"""
+        i = self._year_index.get(int(year))
+        if i is None:
+            block = np.full((len(self.world), len(self.metrics)), np.nan, dtype=self.values.dtype)
+        else:
+            block = self.values[:, i, :]
+        frame = self.world.copy(deep=False)
+        for j, col in enumerate(self.metrics):
+            frame[col] = block[:, j]
+        return frame
+
+    def metric(self, column, years=None):
+        """指标 column 的 [实体, 年份] 二维数组；years 给出时只取其中有数据的年份"""
+        j = self._metric_index[column]
+        if years is None:
+            return self.values[:, :, j]
+        return self.values[:, [self._year_index[int(y)] for y in years if int(y) in self._year_index], j]
+
+    def totals(self, columns):
+        """各年份全部实体的合计 (DataFrame，索引为 Year)"""
+        return pd.DataFrame({col: np.nansum(self.metric(col), axis=0) for col in columns},
+                            index=pd.Index(self.years, name='Year'))
+
+
+def build_cube(world, countries, report=True):
+    """按整数实体键把国家数据放入 MetricCube (代替 merge_countries 的每年一行)，并打印未匹配报告
+
+    world 中实体键相同的多行共享数据；同一实体同一年有多条记录时保留最后一条。
+    world 额外加上 Name 列 (该实体在数据中的名称，无数据时为 NaN)。
+    """
+    if 'Entity' not in world.columns:
+        world = attach_entity_keys(world)
+    world = world.reset_index(drop=True)
+    matched = countries[countries['Entity'] >= 0]
+    pairs = pd.DataFrame({'Entity': world['Entity'].to_numpy(), 'row': np.arange(len(world))}).merge(
+        pd.DataFrame({'Entity': matched['Entity'].to_numpy(), 'record': np.arange(len(matched))}), on='Entity')
+    rows, records = pairs['row'].to_numpy(), pairs['record'].to_numpy()
+
+    years = np.sort(matched['Year'].unique())
+    year_pos = np.searchsorted(years, matched['Year'].to_numpy())[records]
+    values = np.full((len(world), len(years), len(METRIC_COLUMNS)), np.nan, dtype=np.float32)
+    values[rows, year_pos] = matched[METRIC_COLUMNS].to_numpy(dtype=np.float32)[records]
+    present = np.zeros((len(world), len(years)), dtype=bool)
+    present[rows, year_pos] = True
+
+    world = world.copy()
+    names = pd.Series(matched['Name'].astype(object).to_numpy()[records], index=rows)
+    world['Name'] = names[~names.index.duplicated()].reindex(np.arange(len(world))).to_numpy()
+    if report:
+        _report_merge(world, countries)
+    return MetricCube(world, years, METRIC_COLUMNS, values, present)
+
+def prepare_world(world, name_column='ADMIN', exclude=('Antarctica',)):
+    """去掉 exclude 中的区域，加上 Entity，并预先计算标注点 (label_x/label_y，
+    representative_point，保证落在多边形内)、几何中心 (centroid_x/centroid_y) 与外包框 (minx ... maxy)"""
+    import warnings
+    world = world[~world[name_column].isin(list(exclude))].reset_index(drop=True)
+    world = attach_entity_keys(world)
+    points = world.geometry.representative_point()
+    world['label_x'], world['label_y'] = points.x.to_numpy(), points.y.to_numpy()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning) # 地理坐标系下计算中心的提示，仅用于标注
+        centroids = world.geometry.centroid
+    world['centroid_x'], world['centroid_y'] = centroids.x.to_numpy(), centroids.y.to_numpy()
+    bounds = world.geometry.bounds
+    for col in ('minx', 'miny', 'maxx', 'maxy'):
+        world[col] = bounds[col].to_numpy()
+    return world
+
+
+def _shapefile_digest(shp_path):
+    """Shapefile 各组成文件的内容哈希 (任一文件变化都会使缓存失效)"""
+    base = os.path.splitext(shp_path)[0]
+    parts = []
+    for ext in SHAPEFILE_PARTS:
+        if os.path.exists(base + ext):
+            with open(base + ext, 'rb') as f:
+                parts.append(f"{ext}:{content_digest(f.read())}")
+    return content_digest('|'.join(parts))
+
+
+def load_world(shp_path, name_column='ADMIN', exclude=('Antarctica',), use_cache=True):
+    """加载预处理后的世界地图 (见 prepare_world)
+
+    第一次从 Shapefile 读取并处理，结果保存为 GeoParquet (Shapefile 同目录下的 .geometry_cache/)，
+    之后以内存映射方式读取 Arrow 列，不再解析 Shapefile、也不再重复计算几何。
+    没有安装 pyarrow 时退回 pickle 缓存。
+    """
+    import geopandas as gpd
+    if not os.path.exists(shp_path):
+        raise FileNotFoundError(f"找不到 Shapefile: {shp_path}")
+    key = content_digest(f"{_shapefile_digest(shp_path)}|{name_column}|{','.join(exclude)}|{NAMES_DIGEST}")
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(shp_path)), '.geometry_cache')
+    stem = os.path.join(cache_dir, f"world_{key}_v{WORLD_CACHE_VERSION}")
+    try:
+        import pyarrow # noqa: F401 (GeoParquet 需要)
+        cache_path, fmt = stem + '.parquet', 'parquet'
+    except ImportError:
+        cache_path, fmt = stem + '.pkl', 'pickle'
+    if use_cache and os.path.exists(cache_path):
+        if fmt == 'parquet':
+            return gpd.read_parquet(cache_path, memory_map=True)
+        return pd.read_pickle(cache_path)
+
+    world = prepare_world(gpd.read_file(shp_path), name_column, exclude)
+    if use_cache:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        partial = cache_path + '.partial'
+        if fmt == 'parquet':
+            world.to_parquet(partial, index=False)
+        else:
+            world.to_pickle(partial, protocol=5)
+        os.replace(partial, cache_path)
+    return world
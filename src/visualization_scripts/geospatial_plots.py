@@ -9,8 +9,11 @@ import numpy as np
 import glob
 import warnings # <<< 新增：用于管理警告
 
+from ewaste_data import build_cube, entity_keys, load_ewaste_data, load_world, split_levels
+
 # --- 配置区域 ---
-CSV_FILE_PATH = 'Data/ewaste_data_full_20250402_003307.csv'
+SNAPSHOT_DIR = 'Data/snapshots_full' # data_collector 的快照库，读取其中最新的快照
+CSV_FILE_PATH = 'Data/ewaste_data_full_20250402_003307.csv' # 快照库不存在时使用
 OUTPUT_DIR = 'geospatial_plots'
 GIF_OUTPUT_DIR = os.path.join(OUTPUT_DIR, 'gifs')
 FRAMES_TEMP_DIR = os.path.join(OUTPUT_DIR, 'temp_frames')
@@ -25,27 +28,24 @@ metrics_to_plot = {
     'E-waste Generated (kg/capita)': 'E-waste Gen. (kg/capita)',
     'EEE Put on Market (kg/capita)': 'EEE Market (kg/capita)'
 }
-YEARS = ['2018', '2019', '2020', '2021', '2022']
-YEARS_COMPARE = ['2018', '2022'] # 用于对比的年份
+YEARS = [2018, 2019, 2020, 2021, 2022]
+YEARS_COMPARE = [2018, 2022] # 用于对比的年份
 
 # --- 数据加载与准备 ---
 print("Loading data...")
 # ... (保持不变，直到合并数据之前) ...
 try:
-    ewaste_df = pd.read_csv(CSV_FILE_PATH)
-except FileNotFoundError:
-    print(f"错误: CSV 文件未找到于 {CSV_FILE_PATH}")
+    # 指标列 (含人口) 已转换为数字，Year 为整数，Entity 为国家的整数实体键
+    ewaste_df = load_ewaste_data(SNAPSHOT_DIR, CSV_FILE_PATH)
+except FileNotFoundError as e:
+    print(f"错误: {e}")
     exit()
 
-for col in metrics_to_plot.keys():
-    if col in ewaste_df.columns:
-        ewaste_df[col] = pd.to_numeric(ewaste_df[col], errors='coerce')
-ewaste_df['Year'] = ewaste_df['Year'].astype(str)
-ewaste_df['Population'] = pd.to_numeric(ewaste_df['Population'], errors='coerce') # <<< 确保人口也是数字
-
 WORLD_SHP_PATH = 'Data/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp'
+CORRECT_NAME_COLUMN = 'ADMIN' # <<< 确认这是正确的列名
 try:
-    world = gpd.read_file(WORLD_SHP_PATH)
+    # 已去掉南极洲并加上 Entity、标注点 (label_x/label_y) 与外包框；第一次运行后从 GeoParquet 缓存读取
+    world = load_world(WORLD_SHP_PATH, name_column=CORRECT_NAME_COLUMN)
     print(f"成功加载 Shapefile: {WORLD_SHP_PATH}")
     # print("Shapefile 的列名是:") # 可以取消注释来查看
     # print(world.columns)
@@ -53,52 +53,36 @@ except Exception as e:
     print(f"错误: 无法加载 Shapefile '{WORLD_SHP_PATH}'. 错误: {e}")
     exit()
 
-CORRECT_NAME_COLUMN = 'ADMIN' # <<< 确认这是正确的列名
 if CORRECT_NAME_COLUMN not in world.columns:
     print(f"错误: 列 '{CORRECT_NAME_COLUMN}' 不在 Shapefile 中。")
     exit()
 else:
      print(f"使用 Shapefile 中的 '{CORRECT_NAME_COLUMN}' 列进行国家匹配。")
 
-try:
-    world = world[(world[CORRECT_NAME_COLUMN] != "Antarctica")]
-except KeyError:
-     print(f"警告: 无法基于列 '{CORRECT_NAME_COLUMN}' 筛选南极洲。")
-
-name_mapping = {
-    "United States of America": "United States", "Russian Federation": "Russia",
-    "Republic of Korea": "South Korea", "Iran (Islamic Republic of)": "Iran",
-    "Bolivia (Plurinational State of)": "Bolivia", "Venezuela (Bolivarian Republic of)": "Venezuela",
-    "Viet Nam": "Vietnam", "Syrian Arab Republic": "Syria",
-    "United Republic of Tanzania": "Tanzania", "The former Yugoslav Republic of Macedonia": "North Macedonia",
-    "Swaziland": "Eswatini", "Czech Republic": "Czechia",
-    "Lao People's Democratic Republic": "Laos"
-    # ... 添加更多 ...
-}
-ewaste_df['Name_mapped'] = ewaste_df['Name'].replace(name_mapping)
-
 # --- 分离不同层级的数据 ---
-ewaste_countries = ewaste_df[ewaste_df['Category'] == 'Country'].copy()
-ewaste_regions = ewaste_df[ewaste_df['Category'] == 'Region'].copy() # <<< 新增
-ewaste_continents = ewaste_df[ewaste_df['Category'] == 'Continent'].copy() # <<< 新增
+levels = split_levels(ewaste_df)
+ewaste_countries = levels['Country']
+ewaste_regions = levels['Region'] # <<< 新增
+ewaste_continents = levels['Continent'] # <<< 新增
 
 # --- 合并国家级地理数据 ---
 print("Merging country-level geospatial and e-waste data...")
 try:
-    merged_gdf = world.merge(ewaste_countries, left_on=CORRECT_NAME_COLUMN, right_on='Name_mapped', how='left')
+    # 按整数实体键 (ISO3) 连接；几何每个实体一份，指标为 [实体, 年份, 指标] 数组，不再每年复制一行
+    country_cube = build_cube(world, ewaste_countries)
     print("国家级数据合并成功。")
-    print(f"合并后非空匹配国家行数: {merged_gdf['Name'].notna().sum()}")
-    print(f"合并后总地理实体数: {len(merged_gdf)}")
+    print(f"合并后有数据的国家数: {int(country_cube.present.any(axis=1).sum())}")
+    print(f"合并后总地理实体数: {len(country_cube)}")
 except Exception as e:
      print(f"错误: 合并国家级数据时出错。错误: {e}")
      exit()
 
 # --- 绘图函数定义 ---
 # plot_choropleth 函数保持不变 (省略以节省空间)
-def plot_choropleth(gdf, column, year, title, filename, cmap='viridis', add_basemap=True, scheme='Quantiles', k=7):
+def plot_choropleth(cube, column, year, title, filename, cmap='viridis', add_basemap=True, scheme='Quantiles', k=7):
     """绘制分级统计地图 (修正 legend_kwds - 移除 loc)"""
     fig, ax = plt.subplots(1, 1, figsize=(16, 10))
-    data_to_plot = gdf[gdf['Year'] == year].copy()
+    data_to_plot = cube.year(year) # 按年份切片指标数组，几何不复制
 
     if data_to_plot.empty or data_to_plot[column].isnull().all():
         print(f"警告: {year} 年的 {column} 没有有效数据可绘制地图。")
@@ -134,10 +118,10 @@ def plot_choropleth(gdf, column, year, title, filename, cmap='viridis', add_base
 
 
 # plot_single_year_map 函数保持不变 (省略以节省空间)
-def plot_single_year_map(gdf, column, year, vmin, vmax, cmap, title_prefix, frame_filename, add_basemap=True):
+def plot_single_year_map(cube, column, year, vmin, vmax, cmap, title_prefix, frame_filename, add_basemap=True):
     """绘制用于GIF的单帧地图。(修正 legend_kwds - 移除 loc)"""
     fig, ax = plt.subplots(1, 1, figsize=(16, 10))
-    data_to_plot = gdf[gdf['Year'] == year].copy()
+    data_to_plot = cube.year(year) # 按年份切片指标数组，几何不复制
 
     if data_to_plot.empty or data_to_plot[column].isnull().all():
         print(f"警告: {year} 年的 {column} 没有有效数据。绘制空白帧。")
@@ -254,9 +238,9 @@ def plot_3d_bar_chart(labels, values, z_label, title, filename):
 
 # 1. 按大洲/地区/国家对比 2018 vs 2022 人均数据 (绘制全球国家地图)
 print("\n绘制全球人均数据地图 (2018 & 2022)...")
-for year in ['2018', '2022']:
+for year in [2018, 2022]:
     for metric_col, metric_name in metrics_to_plot.items():
-        plot_choropleth(merged_gdf, metric_col, year,
+        plot_choropleth(country_cube, metric_col, year,
                         f'Global {metric_name}',
                         f'global_{metric_col.replace(" ", "_").replace("/", "per").replace("(","").replace(")","").replace("%","pct")}_{year}.png',
                         cmap='OrRd' if 'Generated' in metric_col else 'YlGnBu') # 产生用红色系，EEE用蓝色系
@@ -264,18 +248,18 @@ for year in ['2018', '2022']:
 # 2. 中国统计区域 (大陆、港、澳、台) 2018 vs 2022 人均数据
 print("\n绘制大中华区人均数据地图 (2018 & 2022)...")
 greater_china_names = ["China", "China, Hong Kong Special Administrative Region", "China, Macao Special Administrative Region", "Taiwan"]
-# 在合并后的 GeoDataFrame 中筛选这些区域
-greater_china_gdf = merged_gdf[merged_gdf['Name'].isin(greater_china_names)]
+# 在几何表中筛选这些区域
+greater_china_cube = country_cube.subset(country_cube.world['Name'].isin(greater_china_names))
 
 # 由于区域太少，地图效果可能不好，但还是按要求绘制
 # 为了突出显示，我们将只绘制这几个区域，背景为灰色
-for year in ['2018', '2022']:
+for year in [2018, 2022]:
     for metric_col, metric_name in metrics_to_plot.items():
         fig, ax = plt.subplots(1, 1, figsize=(10, 8))
         # 绘制底图 (所有国家，浅灰色)
         world.plot(ax=ax, color='lightgrey', edgecolor='white', linewidth=0.5)
         
-        data_to_plot = greater_china_gdf[greater_china_gdf['Year'] == year]
+        data_to_plot = greater_china_cube.year(year)
         
         if not data_to_plot.empty and not data_to_plot[metric_col].isnull().all():
              data_to_plot.plot(column=metric_col,
@@ -288,12 +272,12 @@ for year in ['2018', '2022']:
              # 添加标签
              for idx, row in data_to_plot.iterrows():
                  # 检查坐标是否存在
-                 if not pd.isna(row.geometry.centroid.x) and not pd.isna(row.geometry.centroid.y):
-                     plt.text(row.geometry.centroid.x, row.geometry.centroid.y,
-                              f"{row['Name_mapped']}\n{row[metric_col]:.1f}", # 显示名称和数值
+                 if not pd.isna(row['label_x']) and not pd.isna(row['label_y']): # 标注点已预先计算
+                     plt.text(row['label_x'], row['label_y'],
+                              f"{row[CORRECT_NAME_COLUMN]}\n{row[metric_col]:.1f}", # 显示名称和数值
                               fontsize=8, ha='center', color='black')
                  else:
-                     print(f"警告: {row['Name_mapped']} 的几何中心无效，无法添加标签。")
+                     print(f"警告: {row[CORRECT_NAME_COLUMN]} 的几何中心无效，无法添加标签。")
 
         ax.set_axis_off()
         ax.set_title(f'Greater China {metric_name} ({year})', fontsize=14)
@@ -325,20 +309,20 @@ eu_countries_in_world_data = [
 ]
 entities_to_compare_eu = ['China', 'United States'] + eu_countries_in_world_data 
 
-# <<< 修改：使用 CORRECT_NAME_COLUMN 进行筛选 >>>
-compare_eu_gdf = merged_gdf[merged_gdf[CORRECT_NAME_COLUMN].isin(entities_to_compare_eu) | merged_gdf['Name_mapped'].isin(entities_to_compare_eu)]
+# 按实体键筛选 (名称的不同写法都解析到同一实体)
+compare_eu_cube = country_cube.subset(country_cube.world['Entity'].isin(entity_keys(entities_to_compare_eu)))
 
 # 检查筛选结果
-if compare_eu_gdf.empty:
+if len(compare_eu_cube) == 0:
     print(f"警告: 筛选中、美、欧数据后为空，请检查 '{CORRECT_NAME_COLUMN}' 列中的名称和 'entities_to_compare_eu' 列表是否匹配。")
 else:
-    print(f"筛选到 {len(compare_eu_gdf['geometry'].unique())} 个中、美、欧的地理实体。") # 打印唯一地理实体数量
+    print(f"筛选到 {len(compare_eu_cube)} 个中、美、欧的地理实体。") # 几何表每个实体一行
 
 # 绘图循环 (保持不变)
-for year in ['2018', '2022']:
+for year in [2018, 2022]:
     for metric_col, metric_name in metrics_to_plot.items():
         # ... (调用 plot_choropleth 的代码不变) ...
-        plot_choropleth(compare_eu_gdf, metric_col, year,
+        plot_choropleth(compare_eu_cube, metric_col, year,
                         f'China vs USA vs EU {metric_name}',
                         f'compare_chn_us_eu_{metric_col.replace(" ", "_").replace("/", "per").replace("(","").replace(")","").replace("%","pct")}_{year}.png',
                         cmap='coolwarm', 
@@ -346,17 +330,15 @@ for year in ['2018', '2022']:
 
 # 4. 中日韩三国对比 2018 vs 2022 人均数据
 print("\n绘制 中日韩 人均数据地图 (2018 & 2022)...")
-# 确保 cjk_names_mapped 使用的是与 CORRECT_NAME_COLUMN 或 Name_mapped 中匹配的名称
-cjk_names_mapped = ["China", "Japan", "South Korea"] # 假设这些名称在 CORRECT_NAME_COLUMN 或 Name_mapped 中存在
+cjk_names = ["China", "Japan", "South Korea"] # 任意常见写法均可，经 entity_keys 解析为实体键
 
-# <<< 修改：使用 CORRECT_NAME_COLUMN 进行筛选 >>>
-cjk_gdf = merged_gdf[merged_gdf[CORRECT_NAME_COLUMN].isin(cjk_names_mapped) | merged_gdf['Name_mapped'].isin(cjk_names_mapped)]
+cjk_cube = country_cube.subset(country_cube.world['Entity'].isin(entity_keys(cjk_names)))
 
 # 检查筛选结果
-if cjk_gdf.empty:
-    print(f"警告: 筛选中、日、韩数据后为空，请检查 '{CORRECT_NAME_COLUMN}' 列中的名称和 'cjk_names_mapped' 列表是否匹配。")
+if len(cjk_cube) == 0:
+    print(f"警告: 筛选中、日、韩数据后为空，请检查 '{CORRECT_NAME_COLUMN}' 列中的名称和 'cjk_names' 列表是否匹配。")
 else:
-     print(f"筛选到 {len(cjk_gdf['geometry'].unique())} 个中、日、韩的地理实体。")
+     print(f"筛选到 {len(cjk_cube)} 个中、日、韩的地理实体。")
 
 # <<< 新增：绘制大洲和地区对比条形图 >>>
 print("\n--- 开始绘制大洲和地区对比图 ---")
@@ -380,19 +362,19 @@ entities_3d = ['China', 'United States', 'Japan', 'Germany']
 labels_3d = ['China', 'USA', 'Japan', 'Germany', 'EU Avg']
 
 # 计算欧盟2022年平均值
-eu_countries_names_for_avg = [ # 需要使用 ewaste_df 中的原始 Name 或 Name_mapped
+eu_countries_names_for_avg = [ # 按实体键匹配，名称写法不必与数据完全一致
     'Austria', 'Belgium', 'Bulgaria', 'Croatia', 'Cyprus', 'Czechia', 'Denmark', 'Estonia', 'Finland',
     'France', 'Germany', 'Greece', 'Hungary', 'Ireland', 'Italy', 'Latvia', 'Lithuania', 'Luxembourg',
     'Malta', 'Netherlands', 'Poland', 'Portugal', 'Romania', 'Slovakia', 'Slovenia', 'Spain', 'Sweden'
 ]
 # 获取欧盟国家的数据
-eu_data_2022 = ewaste_countries[ewaste_countries['Name_mapped'].isin(eu_countries_names_for_avg) & (ewaste_countries['Year'] == '2022')]
+eu_data_2022 = ewaste_countries[ewaste_countries['Entity'].isin(entity_keys(eu_countries_names_for_avg)) & (ewaste_countries['Year'] == 2022)]
 
 for metric_col, metric_name in metrics_to_plot.items():
     values_3d = []
     # 获取中、美、日、德的数据
-    for entity in entities_3d:
-        val = ewaste_countries[(ewaste_countries['Name_mapped'] == entity) & (ewaste_countries['Year'] == '2022')][metric_col].iloc[0]
+    for entity in entity_keys(entities_3d):
+        val = ewaste_countries[(ewaste_countries['Entity'] == entity) & (ewaste_countries['Year'] == 2022)][metric_col].iloc[0]
         values_3d.append(val)
     
     # 计算欧盟加权平均值 (按人口加权)
@@ -424,9 +406,9 @@ for metric_col, metric_name in metrics_to_plot.items():
     frame_filenames = []
 
     # 1. 计算该指标在所有年份的全局最小值和最大值 (忽略 NaN)
-    # 注意：确保 merged_gdf 包含所有年份的数据
-    valid_years_data = merged_gdf[merged_gdf['Year'].isin(YEARS)][metric_col].dropna()
-    if valid_years_data.empty:
+    valid_years_data = country_cube.metric(metric_col, YEARS) # [实体, 年份] 数组切片
+    valid_years_data = valid_years_data[~np.isnan(valid_years_data)]
+    if valid_years_data.size == 0:
          print(f"  警告: 指标 '{metric_name}' 在年份 {YEARS} 中没有有效数值，跳过 GIF。")
          continue
     global_min = valid_years_data.min()
@@ -441,7 +423,7 @@ for metric_col, metric_name in metrics_to_plot.items():
     for year in YEARS:
         # 使用更安全的、特定于指标和年份的文件名
         frame_path = os.path.join(temp_frame_dir_metric, f'frame_{year}.png') 
-        plot_single_year_map(merged_gdf, metric_col, year,
+        plot_single_year_map(country_cube, metric_col, year,
                              global_min, global_max, # 使用全局范围
                              'OrRd' if 'Generated' in metric_col else 'YlGnBu', # 选择颜色图
                              f'Global {metric_name}',
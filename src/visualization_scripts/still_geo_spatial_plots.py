@@ -4,9 +4,12 @@ import matplotlib.pyplot as plt
 import contextily as ctx # 用于添加底图
 import os # 用于创建输出文件夹
 
+from ewaste_data import build_cube, entity_keys, load_ewaste_data, load_world, split_levels
+
 # --- 配置区域 ---
 # !! 修改为你实际的CSV文件路径 !!
-CSV_FILE_PATH = 'Data/ewaste_data_full_20250402_003307.csv'
+SNAPSHOT_DIR = 'Data/snapshots_full' # data_collector 的快照库，读取其中最新的快照
+CSV_FILE_PATH = 'Data/ewaste_data_full_20250402_003307.csv' # 快照库不存在时使用
 OUTPUT_DIR = 'geospatial_plots'
 
 # 确保输出目录存在
@@ -23,17 +26,12 @@ metrics_to_plot = {
 
 print("Loading data...")
 try:
-    ewaste_df = pd.read_csv(CSV_FILE_PATH)
-except FileNotFoundError:
-    print(f"错误: CSV 文件未找到于 {CSV_FILE_PATH}")
+    # 指标列已转换为数字 ('n/a' 为 NaN)，Year 为整数，Entity 为国家的整数实体键
+    ewaste_df = load_ewaste_data(SNAPSHOT_DIR, CSV_FILE_PATH)
+except FileNotFoundError as e:
+    print(f"错误: {e}")
     exit()
 
-# 清理数据：将 'n/a' 替换为 NaN，并将指标列转换为数字
-for col in metrics_to_plot.keys():
-    if col in ewaste_df.columns:
-        ewaste_df[col] = pd.to_numeric(ewaste_df[col], errors='coerce') # coerce会将无法转换的变成NaN
-ewaste_df['Year'] = ewaste_df['Year'].astype(str) # 确保年份是字符串
-
 # 加载世界地图形状文件 (geopandas自带)
 # world = gpd.read_file(gpd.datasets.get_path('naturalearth_lowres')) # <<< 这是旧代码，注释掉或删除
 
@@ -41,8 +39,13 @@ ewaste_df['Year'] = ewaste_df['Year'].astype(str) # 确保年份是字符串
 # !! 将下面的路径替换为你解压后的 ne_110m_admin_0_countries.shp 文件的实际路径 !!
 WORLD_SHP_PATH = 'Data/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp' # <<< 确保这是你正确的路径
 
+# --- !! 查看下面打印出的列名，并将 CORRECT_NAME_COLUMN 的值修改为实际的国家名称列名 !! ---
+# 常见可能性: 'ADMIN', 'NAME', 'NAME_EN', 'NAME_LONG', 'SOVEREIGNT', 'GU_A3' 等
+CORRECT_NAME_COLUMN = 'ADMIN' # <<< 在这里修改为你找到的正确列名！
+
 try:
-    world = gpd.read_file(WORLD_SHP_PATH)
+    # 已去掉南极洲并加上 Entity、标注点 (label_x/label_y) 与外包框；第一次运行后从 GeoParquet 缓存读取
+    world = load_world(WORLD_SHP_PATH, name_column=CORRECT_NAME_COLUMN)
     print(f"成功加载 Shapefile: {WORLD_SHP_PATH}")
     print("Shapefile 的列名是:")
     print(world.columns) # <<< 打印列名，方便你确认正确的国家名称列
@@ -50,11 +53,6 @@ except Exception as e:
     print(f"错误: 无法加载 Shapefile '{WORLD_SHP_PATH}'. 请检查路径是否正确以及文件是否完整。错误信息: {e}")
     exit()
 
-# --- !! 在这里暂停一下，查看上面打印出的列名 !! ---
-# --- !! 并将下面 CORRECT_NAME_COLUMN 的值修改为实际的国家名称列名 !! ---
-# 常见可能性: 'ADMIN', 'NAME', 'NAME_EN', 'NAME_LONG', 'SOVEREIGNT', 'GU_A3' 等
-CORRECT_NAME_COLUMN = 'ADMIN' # <<< 在这里修改为你找到的正确列名！
-
 # 检查选择的列名是否存在
 if CORRECT_NAME_COLUMN not in world.columns:
     print(f"错误: 您选择的国家名称列 '{CORRECT_NAME_COLUMN}' 不存在于 Shapefile 中。")
@@ -64,38 +62,16 @@ else:
      print(f"使用 Shapefile 中的 '{CORRECT_NAME_COLUMN}' 列作为国家名称进行匹配。")
 
 
-# --- 后续处理，使用正确的列名 ---
-# 移除南极洲
-try:
-    world = world[(world[CORRECT_NAME_COLUMN] != "Antarctica")]
-except KeyError:
-     print(f"警告: 无法基于列 '{CORRECT_NAME_COLUMN}' 筛选南极洲。请确保该列包含 'Antarctica' 值或调整筛选逻辑。")
-
-# --- 数据准备 (Name mapping for ewaste_df, 保持不变) ---
-name_mapping = {
-    "United States of America": "United States", "Russian Federation": "Russia",
-    "Republic of Korea": "South Korea", "Iran (Islamic Republic of)": "Iran",
-    "Bolivia (Plurinational State of)": "Bolivia", "Venezuela (Bolivarian Republic of)": "Venezuela",
-    "Viet Nam": "Vietnam", "Syrian Arab Republic": "Syria",
-    "United Republic of Tanzania": "Tanzania", "The former Yugoslav Republic of Macedonia": "North Macedonia",
-    "Swaziland": "Eswatini", "Czech Republic": "Czechia",
-    "Lao People's Democratic Republic": "Laos"
-    # ... 您可能需要添加更多 ...
-}
-# 应用映射到 ewaste_df 的新列 (这一步仍然是需要的)
-ewaste_df['Name_mapped'] = ewaste_df['Name'].replace(name_mapping)
-
-
 # --- 合并数据，使用正确的列名 ---
-ewaste_countries = ewaste_df[ewaste_df['Category'] == 'Country'].copy()
+ewaste_countries = split_levels(ewaste_df)['Country']
 print("Merging geospatial and e-waste data...")
 try:
-    # 使用 world 数据框中的 CORRECT_NAME_COLUMN 和 ewaste_df 数据框中的 Name_mapped 进行合并
-    merged_gdf = world.merge(ewaste_countries, left_on=CORRECT_NAME_COLUMN, right_on='Name_mapped', how='left')
+    # 按整数实体键 (ISO3) 连接；几何每个实体一份，指标为 [实体, 年份, 指标] 数组，不再每年复制一行
+    country_cube = build_cube(world, ewaste_countries)
     print("数据合并成功。")
-    # 可以在这里检查一下合并后的数据有多少行匹配成功
-    print(f"合并后非空匹配行数: {merged_gdf['Name'].notna().sum()}")
-    print(f"合并后总行数: {len(merged_gdf)}")
+    # 可以在这里检查一下合并后有多少国家匹配成功
+    print(f"合并后有数据的国家数: {int(country_cube.present.any(axis=1).sum())}")
+    print(f"合并后总地理实体数: {len(country_cube)}")
 except KeyError as e:
      print(f"错误: 合并数据时出错。请检查列名是否正确。错误信息: {e}")
      exit()
@@ -109,12 +85,12 @@ except Exception as e:
 
 # --- 定义绘图函数 ---
 
-def plot_choropleth(gdf, column, year, title, filename, cmap='viridis', add_basemap=True, scheme='Quantiles', k=7):
+def plot_choropleth(cube, column, year, title, filename, cmap='viridis', add_basemap=True, scheme='Quantiles', k=7):
     """绘制分级统计地图"""
     fig, ax = plt.subplots(1, 1, figsize=(16, 10))
     
-    # 筛选特定年份的数据
-    data_to_plot = gdf[gdf['Year'] == year].copy()
+    # 取特定年份的数据 (按年份切片指标数组，几何不复制)
+    data_to_plot = cube.year(year)
     
     if data_to_plot.empty or data_to_plot[column].isnull().all():
         print(f"警告: {year} 年的 {column} 没有有效数据可绘制地图。将绘制空白世界地图。")
@@ -163,9 +139,9 @@ def plot_choropleth(gdf, column, year, title, filename, cmap='viridis', add_base
 
 # 1. 按大洲/地区/国家对比 2018 vs 2022 人均数据 (绘制全球国家地图)
 print("\n绘制全球人均数据地图 (2018 & 2022)...")
-for year in ['2018', '2022']:
+for year in [2018, 2022]:
     for metric_col, metric_name in metrics_to_plot.items():
-        plot_choropleth(merged_gdf, metric_col, year,
+        plot_choropleth(country_cube, metric_col, year,
                         f'Global {metric_name}',
                         f'global_{metric_col.replace(" ", "_").replace("/", "per").replace("(","").replace(")","").replace("%","pct")}_{year}.png',
                         cmap='OrRd' if 'Generated' in metric_col else 'YlGnBu') # 产生用红色系，EEE用蓝色系
@@ -173,18 +149,18 @@ for year in ['2018', '2022']:
 # 2. 中国统计区域 (大陆、港、澳、台) 2018 vs 2022 人均数据
 print("\n绘制大中华区人均数据地图 (2018 & 2022)...")
 greater_china_names = ["China", "China, Hong Kong Special Administrative Region", "China, Macao Special Administrative Region", "Taiwan"]
-# 在合并后的 GeoDataFrame 中筛选这些区域
-greater_china_gdf = merged_gdf[merged_gdf['Name'].isin(greater_china_names)]
+# 在几何表中筛选这些区域
+greater_china_cube = country_cube.subset(country_cube.world['Name'].isin(greater_china_names))
 
 # 由于区域太少，地图效果可能不好，但还是按要求绘制
 # 为了突出显示，我们将只绘制这几个区域，背景为灰色
-for year in ['2018', '2022']:
+for year in [2018, 2022]:
     for metric_col, metric_name in metrics_to_plot.items():
         fig, ax = plt.subplots(1, 1, figsize=(10, 8))
         # 绘制底图 (所有国家，浅灰色)
         world.plot(ax=ax, color='lightgrey', edgecolor='white', linewidth=0.5)
         
-        data_to_plot = greater_china_gdf[greater_china_gdf['Year'] == year]
+        data_to_plot = greater_china_cube.year(year)
         
         if not data_to_plot.empty and not data_to_plot[metric_col].isnull().all():
              data_to_plot.plot(column=metric_col,
@@ -197,12 +173,12 @@ for year in ['2018', '2022']:
              # 添加标签
              for idx, row in data_to_plot.iterrows():
                  # 检查坐标是否存在
-                 if not pd.isna(row.geometry.centroid.x) and not pd.isna(row.geometry.centroid.y):
-                     plt.text(row.geometry.centroid.x, row.geometry.centroid.y,
-                              f"{row['Name_mapped']}\n{row[metric_col]:.1f}", # 显示名称和数值
+                 if not pd.isna(row['label_x']) and not pd.isna(row['label_y']): # 标注点已预先计算
+                     plt.text(row['label_x'], row['label_y'],
+                              f"{row[CORRECT_NAME_COLUMN]}\n{row[metric_col]:.1f}", # 显示名称和数值
                               fontsize=8, ha='center', color='black')
                  else:
-                     print(f"警告: {row['Name_mapped']} 的几何中心无效，无法添加标签。")
+                     print(f"警告: {row[CORRECT_NAME_COLUMN]} 的几何中心无效，无法添加标签。")
 
         ax.set_axis_off()
         ax.set_title(f'Greater China {metric_name} ({year})', fontsize=14)
@@ -234,20 +210,20 @@ eu_countries_in_world_data = [
 ]
 entities_to_compare_eu = ['China', 'United States'] + eu_countries_in_world_data 
 
-# <<< 修改：使用 CORRECT_NAME_COLUMN 进行筛选 >>>
-compare_eu_gdf = merged_gdf[merged_gdf[CORRECT_NAME_COLUMN].isin(entities_to_compare_eu) | merged_gdf['Name_mapped'].isin(entities_to_compare_eu)]
+# 按实体键筛选 (名称的不同写法都解析到同一实体)
+compare_eu_cube = country_cube.subset(country_cube.world['Entity'].isin(entity_keys(entities_to_compare_eu)))
 
 # 检查筛选结果
-if compare_eu_gdf.empty:
+if len(compare_eu_cube) == 0:
     print(f"警告: 筛选中、美、欧数据后为空，请检查 '{CORRECT_NAME_COLUMN}' 列中的名称和 'entities_to_compare_eu' 列表是否匹配。")
 else:
-    print(f"筛选到 {len(compare_eu_gdf['geometry'].unique())} 个中、美、欧的地理实体。") # 打印唯一地理实体数量
+    print(f"筛选到 {len(compare_eu_cube)} 个中、美、欧的地理实体。") # 几何表每个实体一行
 
 # 绘图循环 (保持不变)
-for year in ['2018', '2022']:
+for year in [2018, 2022]:
     for metric_col, metric_name in metrics_to_plot.items():
         # ... (调用 plot_choropleth 的代码不变) ...
-        plot_choropleth(compare_eu_gdf, metric_col, year,
+        plot_choropleth(compare_eu_cube, metric_col, year,
                         f'China vs USA vs EU {metric_name}',
                         f'compare_chn_us_eu_{metric_col.replace(" ", "_").replace("/", "per").replace("(","").replace(")","").replace("%","pct")}_{year}.png',
                         cmap='coolwarm', 
@@ -255,25 +231,23 @@ for year in ['2018', '2022']:
 
 # 4. 中日韩三国对比 2018 vs 2022 人均数据
 print("\n绘制 中日韩 人均数据地图 (2018 & 2022)...")
-# 确保 cjk_names_mapped 使用的是与 CORRECT_NAME_COLUMN 或 Name_mapped 中匹配的名称
-cjk_names_mapped = ["China", "Japan", "South Korea"] # 假设这些名称在 CORRECT_NAME_COLUMN 或 Name_mapped 中存在
+cjk_names = ["China", "Japan", "South Korea"] # 任意常见写法均可，经 entity_keys 解析为实体键
 
-# <<< 修改：使用 CORRECT_NAME_COLUMN 进行筛选 >>>
-cjk_gdf = merged_gdf[merged_gdf[CORRECT_NAME_COLUMN].isin(cjk_names_mapped) | merged_gdf['Name_mapped'].isin(cjk_names_mapped)]
+cjk_cube = country_cube.subset(country_cube.world['Entity'].isin(entity_keys(cjk_names)))
 
 # 检查筛选结果
-if cjk_gdf.empty:
-    print(f"警告: 筛选中、日、韩数据后为空，请检查 '{CORRECT_NAME_COLUMN}' 列中的名称和 'cjk_names_mapped' 列表是否匹配。")
+if len(cjk_cube) == 0:
+    print(f"警告: 筛选中、日、韩数据后为空，请检查 '{CORRECT_NAME_COLUMN}' 列中的名称和 'cjk_names' 列表是否匹配。")
 else:
-     print(f"筛选到 {len(cjk_gdf['geometry'].unique())} 个中、日、韩的地理实体。")
+     print(f"筛选到 {len(cjk_cube)} 个中、日、韩的地理实体。")
 
 # 绘图循环 (修改了 plot_choropleth 调用为原来的专用绘图逻辑)
-for year in ['2018', '2022']:
+for year in [2018, 2022]:
     for metric_col, metric_name in metrics_to_plot.items():
         fig, ax = plt.subplots(1, 1, figsize=(10, 8))
         world.plot(ax=ax, color='lightgrey', edgecolor='white', linewidth=0.5)
         
-        data_to_plot = cjk_gdf[cjk_gdf['Year'] == year]
+        data_to_plot = cjk_cube.year(year)
         
         if not data_to_plot.empty and not data_to_plot[metric_col].isnull().all():
             data_to_plot.plot(column=metric_col, ax=ax, legend=True, cmap='viridis',
@@ -282,8 +256,8 @@ for year in ['2018', '2022']:
             for idx, row in data_to_plot.iterrows():
                  # 使用 CORRECT_NAME_COLUMN 显示标签
                  country_label = row[CORRECT_NAME_COLUMN] 
-                 if not pd.isna(row.geometry.centroid.x) and not pd.isna(row.geometry.centroid.y):
-                     plt.text(row.geometry.centroid.x, row.geometry.centroid.y,
+                 if not pd.isna(row['label_x']) and not pd.isna(row['label_y']): # 标注点已预先计算
+                     plt.text(row['label_x'], row['label_y'],
                               f"{country_label}\n{row[metric_col]:.1f}",
                               fontsize=9, ha='center', color='black', weight='bold')
                  else:
@@ -306,13 +280,13 @@ for year in ['2018', '2022']:
 
 # ... (后续代码不变) ...
 
-for year in ['2018', '2022']:
+for year in [2018, 2022]:
     for metric_col, metric_name in metrics_to_plot.items():
         fig, ax = plt.subplots(1, 1, figsize=(10, 8))
         # 绘制底图 (所有国家，浅灰色)
         world.plot(ax=ax, color='lightgrey', edgecolor='white', linewidth=0.5)
         
-        data_to_plot = cjk_gdf[cjk_gdf['Year'] == year]
+        data_to_plot = cjk_cube.year(year)
         
         if not data_to_plot.empty and not data_to_plot[metric_col].isnull().all():
             data_to_plot.plot(column=metric_col,
@@ -326,8 +300,8 @@ for year in ['2018', '2022']:
             for idx, row in data_to_plot.iterrows():
                  # 使用 CORRECT_NAME_COLUMN 显示标签
                  # country_label = row[CORRECT_NAME_COLUMN] # 这行可以保留或者直接用下面的方式
-                 if not pd.isna(row.geometry.centroid.x) and not pd.isna(row.geometry.centroid.y):
-                     plt.text(row.geometry.centroid.x, row.geometry.centroid.y,
+                 if not pd.isna(row['label_x']) and not pd.isna(row['label_y']): # 标注点已预先计算
+                     plt.text(row['label_x'], row['label_y'],
                               # f"{row['name']}\n{row[metric_col]:.1f}", # <<< 旧代码，错误发生在这里
                               f"{row[CORRECT_NAME_COLUMN]}\n{row[metric_col]:.1f}", # <<< 修改：使用 CORRECT_NAME_COLUMN
                               fontsize=9, ha='center', color='black', weight='bold')
@@ -0,0 +1,186 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class WorkQueue:
+    """多进程 / 多主机共享的抓取工作队列 (SQLite，带租约)
+
+    队列中有两种单元：
+      - entity (类别, 名称)：请求详情页，完成时把其年份单元一并加入队列；
+      - year (类别, 名称, 年份)：请求并解析一个年份页面，完成时保存提取出的记录。
+    worker 用 lease() 领取单元并持有 lease_seconds 秒的租约；租约到期仍未完成的单元
+    (worker 崩溃或被杀死) 会重新发给其他 worker，最多尝试 max_attempts 次后标记为失败。
+    文件可放在多台主机共享的文件系统上 (使用回滚日志而不是 WAL，不依赖共享内存)。
+    results() 按 (项目在站点上的顺序, 年份在详情页上的顺序) 合并，与 collect_data 的顺序一致。
+    """
+    def __init__(self, path, lease_seconds=300.0, max_attempts=5):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS units (
+                   seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                   kind TEXT NOT NULL,
+                   entity_seq INTEGER NOT NULL,
+                   position INTEGER NOT NULL,
+                   category TEXT NOT NULL,
+                   name TEXT NOT NULL,
+                   year TEXT NOT NULL,
+                   url TEXT NOT NULL,
+                   state TEXT NOT NULL DEFAULT 'pending',
+                   owner TEXT,
+                   lease_expires REAL,
+                   attempts INTEGER NOT NULL DEFAULT 0,
+                   reissued INTEGER NOT NULL DEFAULT 0,
+                   record TEXT,
+                   finished_at REAL,
+                   UNIQUE (category, name, year)
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS units_state ON units (state, seq)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE：立即获取写锁，多个进程同时领取时不会拿到同一个单元"""
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    # --- 初始化 ---
+    def seed(self, entities):
+        """清空队列并写入项目单元：entities 为 [(类别, 名称, 详情页URL)]，顺序即最终输出顺序"""
+        with self._lock:
+            self._transaction()
+            try:
+                self._conn.execute("DELETE FROM units")
+                self._conn.executemany(
+                    "INSERT INTO units (kind, entity_seq, position, category, name, year, url) "
+                    "VALUES ('entity', ?, -1, ?, ?, '', ?)",
+                    [(i, category, name, url) for i, (category, name, url) in enumerate(entities)]
+                )
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seeded', ?)", (str(time.time()),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def is_seeded(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM meta WHERE key = 'seeded'").fetchone() is not None
+
+    def unseed(self):
+        """协调进程重新初始化前清除 seeded 标记，使先加入的 worker 等待新的单元而不是直接退出"""
+        with self._lock:
+            self._conn.execute("DELETE FROM meta WHERE key = 'seeded'")
+            self._conn.commit()
+
+    # --- worker 接口 ---
+    def lease(self, owner):
+        """领取一个待处理 (或租约已过期) 的单元，返回 dict；暂时没有可领取的单元时返回 None"""
+        with self._lock:
+            self._transaction()
+            try:
+                while True:
+                    now = time.time()
+                    row = self._conn.execute(
+                        "SELECT seq, kind, entity_seq, category, name, year, url, state, attempts FROM units "
+                        "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) ORDER BY seq LIMIT 1",
+                        (now,)
+                    ).fetchone()
+                    if row is None:
+                        self._conn.execute("COMMIT")
+                        return None
+                    seq, kind, entity_seq, category, name, year, url, state, attempts = row
+                    if attempts >= self.max_attempts:
+                        self._conn.execute("UPDATE units SET state = 'failed', owner = NULL WHERE seq = ?", (seq,))
+                        continue
+                    self._conn.execute(
+                        "UPDATE units SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                        "reissued = reissued + ? WHERE seq = ?",
+                        (owner, now + self.lease_seconds, 1 if state == 'leased' else 0, seq)
+                    )
+                    self._conn.execute("COMMIT")
+                    return {'seq': seq, 'kind': kind, 'entity_seq': entity_seq, 'category': category,
+                            'name': name, 'year': year, 'url': url}
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def complete(self, seq, record=None, year_links=None):
+        """完成一个单元：年份单元保存记录 (无有效数据时为 None)；项目单元同时加入其年份单元
+
+        租约过期后被重新发放的单元可能被完成两次，只有第一次生效 (两次的结果相同)。
+        """
+        payload = json.dumps(record, ensure_ascii=False) if record else None
+        with self._lock:
+            self._transaction()
+            try:
+                row = self._conn.execute(
+                    "SELECT entity_seq, category, name, state FROM units WHERE seq = ?", (seq,)
+                ).fetchone()
+                if row is None or row[3] == 'done':
+                    self._conn.execute("COMMIT")
+                    return False
+                entity_seq, category, name, _ = row
+                if year_links:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO units (kind, entity_seq, position, category, name, year, url) "
+                        "VALUES ('year', ?, ?, ?, ?, ?, ?)",
+                        [(entity_seq, pos, category, name, year, url) for pos, (year, url) in enumerate(year_links)]
+                    )
+                self._conn.execute(
+                    "UPDATE units SET state = 'done', owner = NULL, record = ?, finished_at = ? WHERE seq = ?",
+                    (payload, time.time(), seq)
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def release(self, seq):
+        """获取失败：立即放回队列，由任意 worker 重试 (计入尝试次数)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE units SET state = 'pending', owner = NULL, lease_expires = NULL "
+                "WHERE seq = ? AND state = 'leased'", (seq,)
+            )
+
+    def is_finished(self):
+        """是否已没有待处理或处理中的单元；协调进程尚未写入单元 (没有 seeded 标记) 时返回 False"""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'seeded'").fetchone() is None:
+                return False
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM units WHERE state IN ('pending', 'leased')"
+            ).fetchone()
+        return row[0] == 0
+
+    # --- 合并 ---
+    def results(self):
+        """按 collect_data 的顺序返回全部有效记录"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM units WHERE kind = 'year' AND state = 'done' AND record IS NOT NULL "
+                "ORDER BY entity_seq, position"
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT kind || ':' || state, COUNT(*) FROM units GROUP BY kind, state"
+            ).fetchall())
+            reissued = self._conn.execute("SELECT COALESCE(SUM(reissued), 0) FROM units").fetchone()[0]
+        return dict(sorted(counts.items()), reissued=reissued)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()